@@ -1,32 +1,36 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends, Request
 from pydantic import BaseModel, EmailStr
-import random
-import time
-
-router = APIRouter()
-
-# In-memory OTP storage with expiry (use Redis in production)
-# File-based OTP storage for persistence across reloads
-import json
 import os
+import random
+from services.otp_store import otp_store, OTP_TTL_SECONDS, OTP_MISSING, OTP_EXPIRED, OTP_INVALID
+from services.rate_limiter import RateLimiter, parse_rate, retry_after_header, client_ip
 
-OTP_FILE = "otp_store.json"
+# Per client IP across all auth endpoints, and per email for each endpoint
+ip_limiter = RateLimiter('auth_ip', *parse_rate(os.getenv("AUTH_RATE_PER_IP", "30/600")))
+email_limiter = RateLimiter('auth_email', *parse_rate(os.getenv("AUTH_RATE_PER_EMAIL", "5/600")))
 
-def load_otp_store():
-    if os.path.exists(OTP_FILE):
+async def auth_rate_limit(request: Request):
+    """Refuse with 429 (and Retry-After) once an IP or email exceeds its auth request rate"""
+    allowed, retry_after = await ip_limiter.acheck(f"ip:{client_ip(request)}")
+    if not allowed:
+        raise HTTPException(status_code=429, detail="Too many requests. Please try again later.",
+                            headers=retry_after_header(retry_after))
+    
+    email = None
+    if request.method == "POST":
         try:
-            with open(OTP_FILE, "r") as f:
-                return json.load(f)
-        except:
-            return {}
-    return {}
+            body = await request.json()
+            email = body.get("email") if isinstance(body, dict) else None
+        except Exception:
+            pass
+    if isinstance(email, str) and email.strip():
+        allowed, retry_after = await email_limiter.acheck(f"{request.url.path}:{email.strip().lower()}")
+        if not allowed:
+            raise HTTPException(status_code=429, detail="Too many requests for this email. Please try again later.",
+                                headers=retry_after_header(retry_after))
 
-def save_otp_store(store):
-    try:
-        with open(OTP_FILE, "w") as f:
-            json.dump(store, f)
-    except:
-        pass
+# The OTP sweeper is started and stopped by the app lifespan (main.py)
+router = APIRouter(dependencies=[Depends(auth_rate_limit)])
 
 class SendOTPRequest(BaseModel):
     email: EmailStr
@@ -39,18 +43,11 @@ class VerifyOTPRequest(BaseModel):
 async def send_reset_otp(request: SendOTPRequest):
     """Generate and return OTP for password reset"""
     try:
-        store = load_otp_store()
-        
         # Generate 6-digit OTP
         otp = str(random.randint(100000, 999999))
         
         # Store OTP with 10 minute expiry
-        store[request.email] = {
-            "otp": otp,
-            "expires": time.time() + 600  # 10 minutes
-        }
-        
-        save_otp_store(store)
+        await otp_store.aput(request.email, otp, OTP_TTL_SECONDS)
         
         # In production, send OTP via email service (SendGrid, AWS SES, etc.)
         # For now, return it in response for testing
@@ -66,27 +63,15 @@ async def send_reset_otp(request: SendOTPRequest):
 async def verify_reset_otp(request: VerifyOTPRequest):
     """Verify OTP - returns success if valid"""
     try:
-        store = load_otp_store()
-        
-        # Check if OTP exists
-        stored = store.get(request.email)
-        if not stored:
+        # Check, and consume on success or expiry, in one step
+        outcome = await otp_store.averify(request.email, request.otp)
+        if outcome == OTP_MISSING:
             raise HTTPException(status_code=400, detail="No OTP found for this email")
-        
-        # Check expiry
-        if time.time() > stored["expires"]:
-            del store[request.email]
-            save_otp_store(store)
+        if outcome == OTP_EXPIRED:
             raise HTTPException(status_code=400, detail="OTP has expired")
-        
-        # Verify OTP
-        if stored["otp"] != request.otp:
+        if outcome == OTP_INVALID:
             raise HTTPException(status_code=400, detail="Invalid OTP")
         
-        # Clear OTP after successful verification
-        del store[request.email]
-        save_otp_store(store)
-        
         return {"message": "OTP verified successfully", "verified": True}
     except HTTPException:
         raise
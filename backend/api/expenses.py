@@ -1,31 +1,104 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Literal
+from datetime import date
 from services.nlp_service import NLPService
 from services.expense_analyzer import ExpenseAnalyzer
+from services.dataset_cache import dataset_cache, dataset_scope
+from services.aggregate_store import aggregate_store
+from services.rollup_engine import RollupCube
+from services.intent_router import intent_router
+from services.llm_gateway import llm_gateway
+from services.realtime_rooms import room_publisher, identity_rooms, user_room, group_room
+from services.supabase_auth import Identity, optional_identity, require_identity
+from services.settlement import GroupSettlement
+from services.forecast import SpendingForecast
+from models.expense import ExpenseList
 
 router = APIRouter(tags=["expenses"])
 
 class ParseRequest(BaseModel):
     text: str
+    # Signed-in callers' parsed rows are pushed to their realtime room, or to this group's
+    group_name: str = None
 
 class ChatRequest(BaseModel):
     text: str
     user_id: str = None
     user_email: str = None
     user_name: str = None
-    expenses_data: list = []
+    expenses_data: ExpenseList = []
+    group_name: str = None
+    group_expenses_data: ExpenseList = []
+
+class CategorizeRequest(BaseModel):
+    items: List[str]
+
+# Aggregates belong to the signed-in caller, or to one of their groups (by id, or by name if unique)
+class AggregatesRequest(BaseModel):
+    group_name: str = None
+    group_id: str = None
+    expenses_data: ExpenseList = None
+
+class AggregateEventRequest(BaseModel):
+    group_name: str = None
+    group_id: str = None
+    op: Literal['add', 'update', 'delete']
+    expense: Dict[str, Any]
+
+class RollupRequest(BaseModel):
+    user_id: str = None
+    group_name: str = None
+    expenses_data: ExpenseList = []
+    grain: Literal['day', 'week', 'month'] = 'month'
+    by: Literal['category', 'counterparty'] = 'category'
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+
+class SettlementRequest(BaseModel):
+    group_name: str = None
+    user_id: str = None
+    expenses_data: ExpenseList = []
+    members: Optional[List[str]] = None
+
+class ForecastRequest(BaseModel):
+    user_id: str = None
     group_name: str = None
-    group_expenses_data: list = []
+    expenses_data: ExpenseList = []
+    today: Optional[date] = None
+
+def verified_scope(identity: Identity, group_name: str = None, group_id: str = None) -> str:
+    """Aggregate scope (and realtime room) of a signed-in caller: their own, or a group they belong to"""
+    if not (group_name or group_id):
+        return user_room(identity.user_id)
+    group_ids = identity.group_ids(group_name, group_id)
+    if not group_ids:
+        raise HTTPException(status_code=403, detail="Not a member of that group")
+    if len(group_ids) > 1:
+        raise HTTPException(status_code=400, detail="Several of your groups have that name; send group_id")
+    return group_room(group_ids[0])
 
 # Initialize services
 nlp_service = NLPService()
 expense_analyzer = ExpenseAnalyzer()
 
 @router.post("/parse")
-async def parse_expense(request: ParseRequest):
+async def parse_expense(request: ParseRequest, identity: Optional[Identity] = Depends(optional_identity)):
     """Parse expense text and return structured expense data"""
-    return await nlp_service.parse_expense(request.text)
+    result = await nlp_service.parse_expense(request.text)
+    if identity is not None and result.get("expenses"):
+        for room in identity_rooms(identity, request.group_name):
+            room_publisher.publish(room, 'parsed', result["expenses"])
+    return result
+
+@router.post("/categorize")
+async def categorize_items(request: CategorizeRequest, identity: Identity = Depends(require_identity)):
+    """Categories for many items in one model call (signed-in users); decisions are learned by the parser"""
+    rag_service = nlp_service.rag_service
+    if rag_service is None:
+        raise HTTPException(status_code=503, detail="Categorization service unavailable")
+    categories = await rag_service.categorize_batch(request.items)
+    return {"categories": categories}
 
 @router.post("/chat")
 async def chat_about_expenses(request: ChatRequest):
@@ -34,4 +107,70 @@ async def chat_about_expenses(request: ChatRequest):
     print(f"[API] Expenses data count: {len(request.expenses_data)}")
     result = await nlp_service.chat_about_expenses(request)
     print(f"[API] Response: {result.get('reply', '')[:100]}...")
-    return result
\ No newline at end of file
+    return result
+
+@router.get("/chat/routing")
+async def get_chat_routing():
+    """Share of chat questions answered locally vs by the LLM"""
+    return intent_router.stats()
+
+@router.get("/llm/metrics")
+async def get_llm_metrics():
+    """Per-model LLM call counts, latency histogram, token usage and error/429 rates"""
+    return llm_gateway.stats()
+
+@router.post("/aggregates")
+async def get_aggregates(request: AggregatesRequest, identity: Identity = Depends(require_identity)):
+    """Running totals by category, month and counterparty (synced with expenses_data if sent)"""
+    scope = verified_scope(identity, request.group_name, request.group_id)
+    if request.expenses_data is not None:
+        frame = dataset_cache.get_frame(scope, request.expenses_data)
+        aggregates = aggregate_store.sync(scope, frame.rows, frame.fingerprint)
+    else:
+        aggregates = aggregate_store.get(scope)
+    return {"scope": scope, **aggregates.summary()}
+
+@router.post("/aggregates/events")
+async def apply_aggregate_event(request: AggregateEventRequest, identity: Identity = Depends(require_identity)):
+    """Apply an expense add/update/delete to the running totals and return what changed"""
+    if request.op == 'delete' and request.expense.get('id') is None:
+        raise HTTPException(status_code=400, detail="Delete events require an expense id")
+    scope = verified_scope(identity, request.group_name, request.group_id)
+    try:
+        changed = aggregate_store.apply_event(scope, request.op, request.expense)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    # The scope is also the room of everyone watching it
+    room_publisher.publish(scope, request.op, [request.expense], changed)
+    return {"scope": scope, "op": request.op, **changed}
+
+@router.post("/forecast")
+async def get_forecast(request: ForecastRequest):
+    """Month-to-date projection, per-category run rates and a next-month forecast"""
+    scope = dataset_scope(request.user_id, request.group_name)
+    frame = dataset_cache.get_frame(scope, request.expenses_data)
+    forecast = SpendingForecast(frame, request.today) if request.today else SpendingForecast.of(frame)
+    return {"scope": scope, **forecast.to_dict()}
+
+@router.post("/settlement")
+async def get_settlement(request: SettlementRequest):
+    """Member balances for equally shared group expenses and the transfers that settle them"""
+    scope = dataset_scope(request.user_id, request.group_name)
+    frame = dataset_cache.get_frame(scope, request.expenses_data)
+    settlement = GroupSettlement(frame, request.members) if request.members else GroupSettlement.of(frame)
+    label = f"group '{request.group_name}'" if request.group_name else "the group"
+    return {"scope": scope, **settlement.to_dict(), "summary": settlement.describe(label)}
+
+@router.post("/rollups")
+async def get_rollups(request: RollupRequest):
+    """Daily/weekly/monthly expense totals by category or counterparty, plus period-over-period comparison"""
+    scope = dataset_scope(request.user_id, request.group_name)
+    frame = dataset_cache.get_frame(scope, request.expenses_data)
+    cube = RollupCube.of(frame)
+    return {
+        "scope": scope,
+        "grain": request.grain,
+        "by": request.by,
+        "series": cube.series(request.grain, request.by, request.start_date, request.end_date),
+        "comparison": cube.compare('month' if request.grain == 'day' else request.grain)
+    }
@@ -1,54 +1,73 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, APIRouter, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
+import json
+import asyncio
 import os
 from dotenv import load_dotenv
-from api.expenses import router as expenses_router
+from api.expenses import router as expenses_router, nlp_service, expense_analyzer
 from api.auth import router as auth_router
+from services.connection_manager import connection_manager, CLOSE_POLICY_VIOLATION
+from services.realtime_rooms import room_publisher, ENCODINGS, user_room, identity_rooms
+from services.supabase_auth import supabase_auth, bearer_token
+from services.rate_limiter import client_ip
+from services.llm_gateway import llm_gateway
+from services.otp_store import otp_sweeper
+from services.warmup import build_warmup
 
 load_dotenv(override=True)
 
-app = FastAPI(
-    title="Personal Finance Manager API",
-    description="A minimalist personal finance manager with NLP-powered expense tracking",
-    version="1.0.0"
-)
+# WebSocket connection manager (shared with the API routes that publish to rooms)
+manager = connection_manager
 
-# WebSocket connection manager
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: list[WebSocket] = []
+router = APIRouter()
 
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
-
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
-
-    async def broadcast(self, message: str):
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message)
-            except:
-                pass
-
-manager = ConnectionManager()
-
-# CORS middleware - must be before routes
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=False,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background work and warm up once per process; stop it all on shutdown"""
+    # The Gemini client loads after the required steps, in the background (LLM_WARMUP=0 to skip)
+    warmup = app.state.warmup = build_warmup(nlp_service, expense_analyzer, llm_gateway,
+                                             warm_llm=os.getenv("LLM_WARMUP", "1") != "0")
+    warmup_task = asyncio.create_task(warmup.run())
+    otp_sweeper.start()
+    try:
+        yield
+    finally:
+        warmup_task.cancel()
+        try:
+            await warmup_task
+        except asyncio.CancelledError:
+            pass
+        await otp_sweeper.stop()
+        await manager.close_all()
 
-# Include routers
-app.include_router(expenses_router, prefix="/api/expenses")
-app.include_router(expenses_router, tags=["expenses-legacy"])  # Legacy routes without prefix
-app.include_router(auth_router, prefix="/api/auth", tags=["auth"])
+def create_app() -> FastAPI:
+    app = FastAPI(
+        title="Personal Finance Manager API",
+        description="A minimalist personal finance manager with NLP-powered expense tracking",
+        version="1.0.0",
+        lifespan=lifespan
+    )
+    
+    # CORS middleware - must be before routes
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=False,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    
+    # Include routers
+    app.include_router(router)
+    app.include_router(expenses_router, prefix="/api/expenses")
+    # Legacy routes without prefix; served, but kept out of the OpenAPI schema
+    app.include_router(expenses_router, tags=["expenses-legacy"], include_in_schema=False)
+    app.include_router(auth_router, prefix="/api/auth", tags=["auth"])
+    return app
 
-@app.get("/")
+@router.get("/")
 async def root():
     """Root endpoint"""
     return {
@@ -57,7 +76,7 @@ async def root():
         "features": ["multi-category queries", "combined totals"]
     }
 
-@app.get("/health")
+@router.get("/health")
 async def health_check():
     """Health check endpoint"""
     return {
@@ -66,17 +85,98 @@ async def health_check():
         "version": "2.0-multi-category-fix"
     }
 
-@app.websocket("/ws")
+@router.get("/ready")
+async def readiness_check(request: Request):
+    """Readiness: 200 once the required warmup steps have succeeded, else 503 with progress and any failed step"""
+    warmup = getattr(request.app.state, "warmup", None)
+    if warmup is None:
+        # Served without lifespan events (e.g. a bare ASGI adapter): nothing to wait for
+        return {"ready": True, "steps": {}}
+    status = warmup.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+@router.get("/ws/metrics")
+async def websocket_metrics():
+    """Live connections, send queue depths and dropped/slow-client counters"""
+    return {**manager.stats(), "rooms_push": room_publisher.stats(), "auth": supabase_auth.stats()}
+
+def _parse_message(data: str):
+    """JSON object messages (heartbeat replies, room commands) as a dict, else None"""
+    if not data.startswith("{"):
+        return None
+    try:
+        message = json.loads(data)
+    except ValueError:
+        return None
+    return message if isinstance(message, dict) else None
+
+def _room_command(command: dict):
+    """{"action": "join"|"leave", "group_id"? | "group_name"?} -> (action, group_id, group_name), else None"""
+    if command.get("action") not in ("join", "leave"):
+        return None
+    if not (command.get("group_id") or command.get("group_name")):
+        return None
+    return command["action"], command.get("group_id"), command.get("group_name")
+
+@router.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+    # ?access_token=<Supabase access token> joins the user's room, plus ?group_id= / ?group_name=
+    # if they are a member; ?encoding=binary for compressed frames. Without a token: broadcasts only
+    params = websocket.query_params
+    token = bearer_token(websocket)
+    identity = await supabase_auth.identify(token) if token else None
+    if token and identity is None:
+        # A bad or expired token is refused, not downgraded to anonymous
+        await websocket.close(code=CLOSE_POLICY_VIOLATION)
+        return
+    rooms = []
+    if identity is not None:
+        rooms.append(user_room(identity.user_id))
+        if params.get("group_id") or params.get("group_name"):
+            rooms += identity_rooms(identity, params.get("group_name"), params.get("group_id"))
+    encoding = params.get("encoding", "json")
+    user_key = f"user:{identity.user_id}" if identity is not None else f"ip:{client_ip(websocket)}"
+    connection = await manager.connect(websocket, rooms, encoding if encoding in ENCODINGS else "json", user_key)
+    if connection is None:
+        return
     try:
         while True:
             data = await websocket.receive_text()
-            await manager.broadcast(f"Message: {data}")
+            message = _parse_message(data)
+            if message is not None and message.get("type") == "pong":
+                manager.touch(websocket, activity=False)
+                continue
+            manager.touch(websocket)
+            command = _room_command(message) if message is not None else None
+            if command is not None:
+                action, group_id, group_name = command
+                rooms = []
+                if identity is not None:
+                    if action == "join":
+                        # Membership may have changed since connecting
+                        identity.groups = await supabase_auth.memberships(identity.user_id, refresh=True)
+                    rooms = identity_rooms(identity, group_name, group_id)
+                if not rooms:
+                    await manager.send(websocket, json.dumps({"type": "error", "action": action,
+                                                              "error": "not a member of that group"}))
+                    continue
+                for room in rooms:
+                    (manager.join if action == "join" else manager.leave)(websocket, room)
+                await manager.send(websocket, json.dumps({"type": action, "rooms": rooms}))
+            elif connection.rooms:
+                # Chat-style messages stay within the sender's rooms
+                manager.publish(connection.rooms, lambda encoding: f"Message: {data}")
+            else:
+                await manager.broadcast(f"Message: {data}")
     except WebSocketDisconnect:
+        pass
+    finally:
         manager.disconnect(websocket)
 
+app = create_app()
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.environ.get("PORT", 8000))
-    uvicorn.run("main:app", host="0.0.0.0", port=port, reload=True)
\ No newline at end of file
+    # Auto-reload is for development only: use dev.py
+    uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
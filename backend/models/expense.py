@@ -0,0 +1,138 @@
+import sys
+from datetime import datetime, date
+from typing import List, Dict, Any, Optional, Iterable, Annotated
+from pydantic import AfterValidator
+
+
+def parse_day_ordinal(date_val) -> int:
+    """Convert a date/datetime value or string into a day ordinal (0 if unparseable)"""
+    if not date_val:
+        return 0
+    try:
+        if isinstance(date_val, str):
+            # Extract date part if it's a datetime string
+            date_part = date_val.split('T')[0] if 'T' in date_val else date_val.split(' ')[0]
+            try:
+                return date.fromisoformat(date_part).toordinal()
+            except ValueError:
+                return datetime.strptime(date_part, '%Y-%m-%d').toordinal()
+        if isinstance(date_val, (datetime, date)):
+            return date_val.toordinal()
+        return datetime.fromisoformat(str(date_val)).toordinal()
+    except (ValueError, TypeError):
+        return 0
+
+
+def _intern(value) -> Optional[str]:
+    """Strip and intern a repeated string field (None/empty stays None)"""
+    if value is None:
+        return None
+    value = str(value).strip()
+    return sys.intern(value) if value else None
+
+
+def _to_amount(value):
+    """Validate an amount, keeping integral values as int"""
+    if value is None or value == '':
+        return 0
+    if isinstance(value, bool):
+        raise ValueError(f"invalid amount: {value!r}")
+    if isinstance(value, str):
+        try:
+            value = float(value)
+        except ValueError:
+            raise ValueError(f"invalid amount: {value!r}")
+    if not isinstance(value, (int, float)):
+        raise ValueError(f"invalid amount: {value!r}")
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+class Expense:
+    """Compact, validated expense record
+
+    Rows arrive from the frontend as loose Supabase dicts. They are decoded
+    once at the API edge: category and date are normalized, repeated strings
+    are interned and the record uses __slots__, so downstream consumers read
+    plain attributes instead of re-validating with .get(...) or ''.
+    """
+
+    __slots__ = (
+        'id', 'amount', 'item', 'category', 'category_key', 'remarks',
+        'paid_by', 'date', 'day_ordinal', 'created_at', 'updated_at',
+        'user_id', 'group_id', 'added_by'
+    )
+
+    def __init__(self, amount=0, item: str = '', category: str = 'Other', remarks: str = '',
+                 paid_by: Optional[str] = None, date: Optional[str] = None, day_ordinal: int = 0,
+                 id=None, created_at: Optional[str] = None, updated_at: Optional[str] = None,
+                 user_id: Optional[str] = None, group_id: Optional[str] = None, added_by: Optional[str] = None):
+        self.id = id
+        self.amount = amount
+        self.item = item
+        self.category = category
+        self.category_key = sys.intern(category.lower())
+        self.remarks = remarks
+        self.paid_by = paid_by
+        self.date = date
+        self.day_ordinal = day_ordinal
+        self.created_at = created_at
+        self.updated_at = updated_at
+        self.user_id = user_id
+        self.group_id = group_id
+        self.added_by = added_by
+
+    @classmethod
+    def from_dict(cls, row: Dict[str, Any]) -> 'Expense':
+        """Validate and normalize a raw expense row"""
+        if not isinstance(row, dict):
+            raise ValueError(f"expense row must be an object, got {type(row).__name__}")
+
+        created_at = row.get('created_at')
+        day_ordinal = parse_day_ordinal(row.get('date') or created_at)
+        return cls(
+            id=row.get('id'),
+            amount=_to_amount(row.get('amount')),
+            item=_intern(row.get('item')) or '',
+            category=_intern(row.get('category')) or 'Other',
+            remarks=_intern(row.get('remarks')) or '',
+            paid_by=_intern(row.get('paid_by')),
+            date=sys.intern(date.fromordinal(day_ordinal).isoformat()) if day_ordinal else None,
+            day_ordinal=day_ordinal,
+            created_at=created_at,
+            updated_at=row.get('updated_at'),
+            user_id=_intern(row.get('user_id')),
+            group_id=_intern(row.get('group_id')),
+            added_by=_intern(row.get('added_by'))
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'amount': self.amount,
+            'item': self.item,
+            'category': self.category,
+            'remarks': self.remarks,
+            'paid_by': self.paid_by,
+            'date': self.date,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
+            'user_id': self.user_id,
+            'group_id': self.group_id,
+            'added_by': self.added_by
+        }
+
+    def __repr__(self) -> str:
+        return f"Expense(id={self.id!r}, amount={self.amount!r}, item={self.item!r}, category={self.category!r}, date={self.date!r})"
+
+
+def parse_expenses(rows: Iterable) -> List[Expense]:
+    """Batch-decode raw rows into Expense records (records pass through unchanged)"""
+    if not rows:
+        return []
+    return [row if isinstance(row, Expense) else Expense.from_dict(row) for row in rows]
+
+
+# Request field type: validates and decodes a JSON list of rows into Expense records
+ExpenseList = Annotated[list, AfterValidator(parse_expenses)]
@@ -0,0 +1,283 @@
+import os
+from datetime import date
+from typing import List, Dict, Any, Optional, Iterable
+
+from models.expense import Expense, parse_expenses
+from utils.lru_cache import MemoryBoundedLRU
+from services.counterparty_ledger import CounterpartyLedger
+
+# Per stored row: the Expense record (strings are mostly interned and shared),
+# its key and the dict slot; measured at ~210 bytes, rounded up for unique text
+ROW_BYTES = 384
+
+
+def _month_key(day_ordinal: int) -> Optional[str]:
+    if not day_ordinal:
+        return None
+    d = date.fromordinal(day_ordinal)
+    return f"{d.year:04d}-{d.month:02d}"
+
+
+def _row_version(exp: Expense) -> tuple:
+    """Everything an aggregate depends on, so edits are detected even without updated_at"""
+    return (exp.updated_at or exp.created_at, exp.amount, exp.category_key, exp.paid_by, exp.day_ordinal)
+
+
+def _row_keys(records: Iterable[Expense]):
+    """Stable per-row keys: the row id, or content plus occurrence for unsaved rows"""
+    occurrences: Dict[tuple, int] = {}
+    for exp in records:
+        if exp.id is not None:
+            yield exp.id, exp
+        else:
+            content = (exp.amount, exp.item, exp.category, exp.day_ordinal, exp.paid_by, exp.remarks)
+            n = occurrences.get(content, 0)
+            occurrences[content] = n + 1
+            yield ('row',) + content + (n,), exp
+
+
+class ScopeAggregates:
+    """Running totals for one user or group, updated in O(1) per row change"""
+
+    def __init__(self):
+        self.rows: Dict[Any, Expense] = {}
+        self.fingerprint: Optional[str] = None
+        self.totals = {
+            'expense': 0, 'expense_count': 0,
+            'income': 0, 'income_count': 0,
+            'loans_given': 0, 'loans_given_count': 0,
+            'loans_received': 0, 'loans_received_count': 0
+        }
+        # key -> [amount, count]; expenses only (no income or loans)
+        self.by_category: Dict[str, list] = {}
+        self.by_month: Dict[str, list] = {}
+        # Per-person paid/given/taken, keyed by canonical name
+        self.ledger = CounterpartyLedger()
+        # day ordinal -> number of rows on that day
+        self.days: Dict[int, int] = {}
+
+    def _bump(self, table: Dict[str, list], key: str, amount, sign: int):
+        entry = table.get(key)
+        if entry is None:
+            entry = table[key] = [0, 0]
+        entry[0] += sign * amount
+        entry[1] += sign
+        if entry[1] <= 0:
+            del table[key]
+
+    def _apply(self, exp: Expense, sign: int) -> Dict[str, Any]:
+        """Add (sign=1) or remove (sign=-1) one row; returns the aggregate keys it touched"""
+        amount = exp.amount
+        is_loan = exp.category_key == 'loan'
+        is_income = exp.category_key == 'income'
+        touched: Dict[str, Any] = {}
+
+        if amount > 0 and not is_income and not is_loan:
+            self.totals['expense'] += sign * amount
+            self.totals['expense_count'] += sign
+            self._bump(self.by_category, exp.category_key, amount, sign)
+            touched['category'] = exp.category_key
+            month = _month_key(exp.day_ordinal)
+            if month:
+                self._bump(self.by_month, month, amount, sign)
+                touched['month'] = month
+        if amount < 0 or is_income:
+            self.totals['income'] += sign * abs(amount)
+            self.totals['income_count'] += sign
+        if is_loan and amount > 0:
+            self.totals['loans_given'] += sign * amount
+            self.totals['loans_given_count'] += sign
+        elif is_loan and amount < 0:
+            self.totals['loans_received'] += sign * abs(amount)
+            self.totals['loans_received_count'] += sign
+
+        key = self.ledger.apply(exp, sign)
+        if key is not None:
+            touched['counterparty'] = key
+
+        if exp.day_ordinal:
+            self.days[exp.day_ordinal] = self.days.get(exp.day_ordinal, 0) + sign
+            if self.days[exp.day_ordinal] <= 0:
+                del self.days[exp.day_ordinal]
+
+        return touched
+
+    # ---------- Row events ----------
+
+    @staticmethod
+    def _merge_touched(*touched_dicts) -> Dict[str, List[str]]:
+        merged: Dict[str, List[str]] = {}
+        for touched in touched_dicts:
+            for name, key in touched.items():
+                keys = merged.setdefault(name, [])
+                if key not in keys:
+                    keys.append(key)
+        return merged
+
+    def add(self, key, exp: Expense) -> Dict[str, List[str]]:
+        if key in self.rows:
+            return self.update(key, exp)
+        self.rows[key] = exp
+        return self._merge_touched(self._apply(exp, 1))
+
+    def update(self, key, exp: Expense) -> Dict[str, List[str]]:
+        old = self.rows.get(key)
+        removed = self._apply(old, -1) if old is not None else {}
+        self.rows[key] = exp
+        return self._merge_touched(removed, self._apply(exp, 1))
+
+    def delete(self, key) -> Dict[str, List[str]]:
+        old = self.rows.pop(key, None)
+        return self._merge_touched(self._apply(old, -1)) if old is not None else {}
+
+    def sync(self, records: List[Expense], fingerprint: Optional[str] = None) -> int:
+        """Bring the aggregates in line with a full dataset, touching only changed rows"""
+        changed = 0
+        seen = set()
+        for key, exp in _row_keys(records):
+            seen.add(key)
+            old = self.rows.get(key)
+            if old is None:
+                self.add(key, exp)
+                changed += 1
+            elif _row_version(old) != _row_version(exp):
+                self.update(key, exp)
+                changed += 1
+        for key in [k for k in self.rows if k not in seen]:
+            self.delete(key)
+            changed += 1
+        self.fingerprint = fingerprint
+        return changed
+
+    # ---------- Reads ----------
+
+    def values_for(self, touched: Dict[str, List[str]]) -> Dict[str, Any]:
+        """Current values of the aggregates named in a touched-keys dict"""
+        def entries(table, keys):
+            return [{'key': k, 'total': table[k][0] if k in table else 0, 'count': table[k][1] if k in table else 0} for k in keys]
+
+        values: Dict[str, Any] = {'totals': dict(self.totals)}
+        if 'category' in touched:
+            values['categories'] = entries(self.by_category, touched['category'])
+        if 'month' in touched:
+            values['months'] = entries(self.by_month, touched['month'])
+        if 'counterparty' in touched:
+            values['counterparties'] = [self.ledger.balance(key=k) for k in touched['counterparty']]
+        return values
+
+    def estimated_bytes(self) -> int:
+        """Rough memory footprint for the store's byte budget; the kept rows dominate"""
+        table_entries = len(self.by_category) + len(self.by_month) + len(self.days) + len(self.ledger.entries)
+        return len(self.rows) * ROW_BYTES + table_entries * 256 + 4096
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'totals': dict(self.totals),
+            'net_balance': self.totals['income'] - self.totals['expense'],
+            'net_loan': self.totals['loans_given'] - self.totals['loans_received'],
+            'categories': {k: {'total': v[0], 'count': v[1]} for k, v in self.by_category.items()},
+            'months': {k: {'total': v[0], 'count': v[1]} for k, v in sorted(self.by_month.items())},
+            'counterparties': {b['key']: b for b in self.ledger.balances()},
+            'days_tracked': (max(self.days) - min(self.days) + 1) if self.days else 0,
+            'row_count': len(self.rows)
+        }
+
+    def to_analysis(self, recent_expenses: List[Expense]) -> Dict[str, Any]:
+        """Same shape as ExpenseAnalyzer.analyze_expenses, read from the running totals"""
+        t = self.totals
+        categories = {k: v[0] for k, v in self.by_category.items()}
+        days_count = (max(self.days) - min(self.days) + 1) if self.days else 1
+        return {
+            'total': t['expense'],
+            'count': t['expense_count'],
+            'categories': categories,
+            'recent_expenses': recent_expenses,
+            'top_categories': sorted(categories.items(), key=lambda x: x[1], reverse=True)[:5],
+            'average_per_day': round(t['expense'] / days_count, 2),
+            'days_tracked': days_count,
+            'total_income': t['income'],
+            'income_count': t['income_count'],
+            'net_balance': t['income'] - t['expense'],
+            'total_loans_given': t['loans_given'],
+            'total_loans_received': t['loans_received'],
+            'loan_given_count': t['loans_given_count'],
+            'loan_received_count': t['loans_received_count'],
+            'net_loan': t['loans_given'] - t['loans_received']
+        }
+
+
+class AggregateStore:
+    """Per-scope running aggregates, kept current by row events or dataset diffs
+
+    Chat requests carry the whole dataset; syncing diffs it against the
+    stored rows so aggregation work is proportional to what changed, not to
+    history length. rebuild() recomputes from scratch for verification.
+    """
+
+    def __init__(self, max_scopes: int = None, max_mb: int = None):
+        max_scopes = max_scopes or int(os.getenv("AGGREGATE_STORE_MAX_SCOPES", 1024))
+        max_mb = max_mb or int(os.getenv("AGGREGATE_STORE_MAX_MB", 64))
+        self._scopes = MemoryBoundedLRU(max_entries=max_scopes, max_bytes=max_mb * 1024 * 1024)
+
+    def get(self, scope: str) -> ScopeAggregates:
+        aggregates = self._scopes.get(scope)
+        if aggregates is None:
+            aggregates = ScopeAggregates()
+            self._store(scope, aggregates)
+        return aggregates
+
+    def _store(self, scope: str, aggregates: ScopeAggregates):
+        # Re-put after every change so the byte budget tracks the scope's current size
+        self._scopes.put(scope, aggregates, aggregates.estimated_bytes())
+
+    def sync(self, scope: str, rows, fingerprint: Optional[str] = None) -> ScopeAggregates:
+        """Apply the difference between the stored rows and this dataset (no-op for a known fingerprint)"""
+        aggregates = self.get(scope)
+        if fingerprint is None or aggregates.fingerprint != fingerprint:
+            aggregates.sync(parse_expenses(rows), fingerprint)
+            self._store(scope, aggregates)
+        return aggregates
+
+    def rebuild(self, scope: str, rows) -> ScopeAggregates:
+        """Discard and recompute a scope's aggregates from the full dataset"""
+        aggregates = ScopeAggregates()
+        aggregates.sync(parse_expenses(rows))
+        self._store(scope, aggregates)
+        return aggregates
+
+    def verify(self, scope: str, rows) -> bool:
+        """True if the incrementally maintained aggregates match a from-scratch rebuild"""
+        def comparable(summary):
+            # Display names depend on event order; the numbers must not
+            for party in summary['counterparties'].values():
+                party.pop('name', None)
+            return summary
+
+        fresh = ScopeAggregates()
+        fresh.sync(parse_expenses(rows))
+        return comparable(self.get(scope).summary()) == comparable(fresh.summary())
+
+    def apply_event(self, scope: str, op: str, row: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply one add/update/delete event and return the changed aggregate values"""
+        aggregates = self.get(scope)
+        if op == 'delete':
+            touched = aggregates.delete(row.get('id'))
+        else:
+            exp = Expense.from_dict(row)
+            key = exp.id if exp.id is not None else next(_row_keys([exp]))[0]
+            touched = aggregates.update(key, exp) if op == 'update' else aggregates.add(key, exp)
+        # The dataset no longer matches any fingerprint seen in a chat request
+        aggregates.fingerprint = None
+        self._store(scope, aggregates)
+        return aggregates.values_for(touched)
+
+    def stats(self):
+        return self._scopes.stats()
+
+    def analysis(self, scope: str, frame) -> Dict[str, Any]:
+        """analyze_expenses-compatible result for a cached frame, read from the aggregates"""
+        aggregates = self.sync(scope, frame.rows, frame.fingerprint)
+        return aggregates.to_analysis(frame.select(frame.expense_mask(), limit=5))
+
+
+aggregate_store = AggregateStore()
@@ -0,0 +1,154 @@
+import os
+import re
+import json
+import time
+import threading
+from typing import Dict, Optional, Iterable
+
+# Relative paths are resolved against the backend directory, not the working directory
+LEXICON_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                            os.getenv("LEARNED_LEXICON_FILE", "learned_lexicon.json"))
+# How often (seconds) the file is checked for entries learned by other workers
+REFRESH_SECONDS = 5.0
+
+# Categories the model may assign; anything else is not learned
+KNOWN_CATEGORIES = ['Food', 'Transport', 'Groceries', 'Shopping', 'Utilities', 'Entertainment', 'Rent', 'Loan',
+                    'Income', 'Medical', 'Education', 'Travel', 'Electronics', 'Personal Care', 'Fitness', 'Other']
+_CATEGORY_BY_KEY = {c.lower(): c for c in KNOWN_CATEGORIES}
+
+# Decisions that depend on who or why rather than on the item itself
+UNLEARNABLE = {'Other', 'Loan', 'Income'}
+
+
+def normalize_item(item: str) -> str:
+    return re.sub(r'\s+', ' ', (item or '').lower()).strip()
+
+
+def canonical_category(category: str) -> Optional[str]:
+    """The KNOWN_CATEGORIES spelling of a model answer ("electronics." -> "Electronics"), or None"""
+    return _CATEGORY_BY_KEY.get(normalize_item(category).strip('."\''))
+
+
+class LearnedLexicon:
+    """item -> category decisions made by the model, kept across restarts
+
+    ExpenseParser consults it before its keyword lists, so an item the model
+    has categorized once is categorized by the regex fast path from then on.
+    Lookups are dict reads; the JSON file is rewritten atomically on learn()
+    and re-read when another process has changed it.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or LEXICON_FILE
+        self._lock = threading.Lock()
+        self._entries: Dict[str, str] = {}
+        # Word counts of the learned phrases, most first, for descriptions that contain one ("new rice cooker")
+        self._lengths: list = []
+        self._mtime = None
+        self._checked = 0.0
+        self._load()
+
+    def _load(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path, 'r') as f:
+                entries = json.load(f)
+        except Exception as e:
+            print(f"[LEXICON] Could not load {self.path}: {e}")
+            return
+        with self._lock:
+            self._entries = {normalize_item(k): v for k, v in entries.items() if canonical_category(v)}
+            self._index()
+            self._mtime = mtime
+        print(f"[LEXICON] Loaded {len(self._entries)} learned items")
+
+    def _index(self):
+        self._lengths = sorted({phrase.count(' ') + 1 for phrase in self._entries}, reverse=True)
+
+    def refresh(self):
+        """Pick up entries written by other processes (checked at most every REFRESH_SECONDS)"""
+        now = time.monotonic()
+        if now - self._checked >= REFRESH_SECONDS:
+            self._checked = now
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, item: str) -> Optional[str]:
+        """Learned category of exactly this item"""
+        self.refresh()
+        return self._entries.get(normalize_item(item))
+
+    def category_for(self, description: str) -> Optional[str]:
+        """Learned category of the item, or of the learned item with the most words the description contains
+
+        Each run of words of a learned length is one dict lookup, so the cost
+        follows the description's length, not the size of the lexicon.
+        """
+        description = normalize_item(description)
+        if not description:
+            return None
+        category = self.get(description)
+        if category:
+            return category
+        words = description.split(' ')
+        entries = self._entries
+        for n in self._lengths:
+            for start in range(len(words) - n + 1):
+                category = entries.get(' '.join(words[start:start + n]))
+                if category:
+                    return category
+        return None
+
+    def learn(self, item: str, category: str) -> bool:
+        return self.learn_many({item: category}) > 0
+
+    def learn_many(self, decisions: Dict[str, str]) -> int:
+        """Store item -> category decisions; returns how many were new or changed"""
+        changed = 0
+        with self._lock:
+            for item, category in decisions.items():
+                item = normalize_item(item)
+                category = canonical_category(category)
+                if not item or not category or category in UNLEARNABLE:
+                    continue
+                if self._entries.get(item) != category:
+                    self._entries[item] = category
+                    changed += 1
+            if changed:
+                self._index()
+                self._save()
+        if changed:
+            print(f"[LEXICON] Learned {changed} item(s); {len(self._entries)} total")
+        return changed
+
+    def unknown(self, items: Iterable[str]) -> list:
+        """Distinct normalized items without a learned category, in order"""
+        seen = set()
+        result = []
+        for item in items:
+            item = normalize_item(item)
+            if item and item not in seen and item not in self._entries:
+                seen.add(item)
+                result.append(item)
+        return result
+
+    def _save(self):
+        # Write-then-rename so a concurrent reader never sees a partial file
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, 'w') as f:
+                json.dump(self._entries, f, indent=1, sort_keys=True)
+            os.replace(tmp, self.path)
+            self._mtime = os.path.getmtime(self.path)
+        except Exception as e:
+            print(f"[LEXICON] Could not save {self.path}: {e}")
+
+
+learned_lexicon = LearnedLexicon()
@@ -0,0 +1,363 @@
+import os
+import json
+import time
+import asyncio
+import itertools
+from typing import Dict, Any, Optional, Union, Set, Iterable
+
+from fastapi import WebSocket
+
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", 64))
+WS_SEND_TIMEOUT_SECONDS = float(os.getenv("WS_SEND_TIMEOUT", 10))
+# What happens when a client's queue is full: 'drop_oldest' keeps the newest
+# messages, 'disconnect' closes the slow client so it can reconnect and resync
+WS_SLOW_CONSUMER_POLICY = os.getenv("WS_SLOW_CONSUMER_POLICY", "drop_oldest")
+# Heartbeat: a client quiet for the interval is pinged, and reaped if nothing
+# (pong or any other message) arrives within the pong timeout of that ping
+WS_PING_INTERVAL_SECONDS = float(os.getenv("WS_PING_INTERVAL", 25))
+WS_PONG_TIMEOUT_SECONDS = float(os.getenv("WS_PONG_TIMEOUT", 10))
+# Connections that only answer pings for this long are closed as idle (0 disables)
+WS_IDLE_TIMEOUT_SECONDS = float(os.getenv("WS_IDLE_TIMEOUT", 1800))
+WS_MAX_CONNECTIONS = int(os.getenv("WS_MAX_CONNECTIONS", 2000))
+# Per signed-in user (or per client IP for anonymous clients); sockets over the cap are refused
+WS_MAX_PER_USER = int(os.getenv("WS_MAX_PER_USER", 5))
+
+# Close codes: server or user full, or client too slow (RFC 6455 "try again later"),
+# going away (shutdown, idle), and no heartbeat reply or a bad token (policy violation)
+CLOSE_NORMAL = 1000
+CLOSE_GOING_AWAY = 1001
+CLOSE_POLICY_VIOLATION = 1008
+CLOSE_TRY_AGAIN_LATER = 1013
+
+Message = Union[str, bytes]
+
+_connection_ids = itertools.count(1)
+
+
+class Connection:
+    """One accepted WebSocket with its own bounded send queue and writer task"""
+
+    __slots__ = ('id', 'websocket', 'queue', 'writer', 'connected_at', 'sent', 'dropped', 'rooms', 'encoding',
+                 'user_key', 'last_seen', 'last_activity', 'ping_sent_at')
+
+    def __init__(self, websocket: WebSocket, queue_size: int, encoding: str = 'json', user_key: str = None):
+        self.id = next(_connection_ids)
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.writer: Optional[asyncio.Task] = None
+        self.connected_at = time.time()
+        self.sent = 0
+        self.dropped = 0
+        self.rooms: Set[str] = set()
+        # 'json' (text frames) or 'binary' (zlib-compressed JSON) for room pushes
+        self.encoding = encoding
+        self.user_key = user_key
+        # Anything received (liveness), and anything but a pong (activity)
+        self.last_seen = self.last_activity = time.monotonic()
+        # When the unanswered ping went out; None once anything is received
+        self.ping_sent_at: Optional[float] = None
+
+
+class ConnectionManager:
+    """Tracks live WebSockets and fans messages out without waiting on any client
+
+    broadcast() only enqueues: each connection has a bounded queue drained by
+    its own writer task, so one slow mobile client delays nobody else. A full
+    queue drops that client's oldest message or disconnects it, depending on
+    WS_SLOW_CONSUMER_POLICY; a send that fails or times out removes the
+    connection. Connections are kept in a dict, so disconnect is O(1).
+
+    Connections can join rooms (a signed-in user's own room or a group's);
+    publish() reaches only that room's members.
+
+    A heartbeat task pings quiet clients and reaps half-open sockets (no
+    reply) and idle ones, and connections are capped globally and per
+    user, so memory and fan-out cost follow the number of live clients.
+    """
+
+    def __init__(self, queue_size: int = None, send_timeout: float = None, policy: str = None,
+                 max_connections: int = None, max_per_user: int = None,
+                 ping_interval: float = None, pong_timeout: float = None, idle_timeout: float = None):
+        self.queue_size = queue_size or WS_SEND_QUEUE_SIZE
+        self.send_timeout = send_timeout or WS_SEND_TIMEOUT_SECONDS
+        self.policy = policy or WS_SLOW_CONSUMER_POLICY
+        self.max_connections = max_connections or WS_MAX_CONNECTIONS
+        self.max_per_user = max_per_user or WS_MAX_PER_USER
+        self.ping_interval = ping_interval or WS_PING_INTERVAL_SECONDS
+        self.pong_timeout = pong_timeout or WS_PONG_TIMEOUT_SECONDS
+        self.idle_timeout = WS_IDLE_TIMEOUT_SECONDS if idle_timeout is None else idle_timeout
+        self.connections: Dict[WebSocket, Connection] = {}
+        self.rooms: Dict[str, Set[Connection]] = {}
+        # user key -> that user's connections, oldest first
+        self.by_user: Dict[str, list] = {}
+        self.total_connections = 0
+        self.messages_sent = 0
+        self.messages_dropped = 0
+        self.slow_disconnects = 0
+        self.send_errors = 0
+        self.rejected_full = 0
+        self.rejected_per_user = 0
+        self.reaped_half_open = 0
+        self.reaped_idle = 0
+        self.pings_sent = 0
+        self.pongs_received = 0
+        self._closing: set = set()
+        self._heartbeat: Optional[asyncio.Task] = None
+
+    @property
+    def active_connections(self) -> list:
+        return list(self.connections)
+
+    async def connect(self, websocket: WebSocket, rooms: Iterable[str] = (), encoding: str = 'json',
+                      user_key: str = None) -> Optional[Connection]:
+        """Accept and register a socket; None (socket closed) when the server or the user is full
+
+        A new socket never evicts an existing one: a phone reconnecting over a
+        half-open socket gets in once the heartbeat has reaped the old one.
+        """
+        await websocket.accept()
+        if len(self.connections) >= self.max_connections:
+            self.rejected_full += 1
+            await self._close(websocket, CLOSE_TRY_AGAIN_LATER)
+            return None
+        if user_key is not None and len(self.by_user.get(user_key, ())) >= self.max_per_user:
+            self.rejected_per_user += 1
+            await self._close(websocket, CLOSE_TRY_AGAIN_LATER)
+            return None
+        connection = Connection(websocket, self.queue_size, encoding, user_key)
+        connection.writer = asyncio.create_task(self._write(connection))
+        self.connections[websocket] = connection
+        if user_key is not None:
+            self.by_user.setdefault(user_key, []).append(connection)
+        self.total_connections += 1
+        for room in rooms:
+            self.join(websocket, room)
+        self._ensure_heartbeat()
+        return connection
+
+    def disconnect(self, websocket: WebSocket) -> Optional[Connection]:
+        """Forget a connection and stop its writer; safe to call more than once"""
+        connection = self.connections.pop(websocket, None)
+        if connection is None:
+            return None
+        for room in list(connection.rooms):
+            self._leave(connection, room)
+        if connection.user_key is not None:
+            user_connections = self.by_user.get(connection.user_key)
+            if user_connections is not None:
+                user_connections.remove(connection)
+                if not user_connections:
+                    del self.by_user[connection.user_key]
+        if connection.writer is not None and connection.writer is not asyncio.current_task():
+            connection.writer.cancel()
+        return connection
+
+    # ---------- Rooms ----------
+
+    def join(self, websocket: WebSocket, room: str) -> bool:
+        connection = self.connections.get(websocket)
+        if connection is None:
+            return False
+        connection.rooms.add(room)
+        self.rooms.setdefault(room, set()).add(connection)
+        return True
+
+    def leave(self, websocket: WebSocket, room: str) -> bool:
+        connection = self.connections.get(websocket)
+        return connection is not None and self._leave(connection, room)
+
+    def _leave(self, connection: Connection, room: str) -> bool:
+        if room not in connection.rooms:
+            return False
+        connection.rooms.discard(room)
+        members = self.rooms.get(room)
+        if members is not None:
+            members.discard(connection)
+            if not members:
+                del self.rooms[room]
+        return True
+
+    def room_size(self, room: str) -> int:
+        return len(self.rooms.get(room, ()))
+
+    def publish(self, rooms: Union[str, Iterable[str]], encode) -> int:
+        """Queue a message once for every member of one or more rooms
+
+        encode(encoding) builds the message, at most once per encoding.
+        """
+        if isinstance(rooms, str):
+            members = self.rooms.get(rooms)
+        else:
+            members = set()
+            for room in rooms:
+                members.update(self.rooms.get(room, ()))
+        if not members:
+            return 0
+        encoded: Dict[str, Message] = {}
+        delivered = 0
+        for connection in list(members):
+            message = encoded.get(connection.encoding)
+            if message is None:
+                message = encoded[connection.encoding] = encode(connection.encoding)
+            if self._offer(connection, message):
+                delivered += 1
+        return delivered
+
+    def _offer(self, connection: Connection, message: Message) -> bool:
+        """Queue a message for one connection; False if the connection was dropped as too slow"""
+        try:
+            connection.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            pass
+        if self.policy == 'disconnect':
+            self.slow_disconnects += 1
+            self._drop(connection.websocket, CLOSE_TRY_AGAIN_LATER)
+            return False
+        connection.queue.get_nowait()
+        connection.queue.put_nowait(message)
+        connection.dropped += 1
+        self.messages_dropped += 1
+        return True
+
+    def _drop(self, websocket: WebSocket, code: int):
+        """Disconnect now and close the socket in the background"""
+        self.disconnect(websocket)
+        task = asyncio.create_task(self._close(websocket, code))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    def touch(self, websocket: WebSocket, activity: bool = True):
+        """Record a received message; pongs keep a socket alive but do not count as activity"""
+        connection = self.connections.get(websocket)
+        if connection is None:
+            return
+        now = time.monotonic()
+        connection.last_seen = now
+        connection.ping_sent_at = None
+        if activity:
+            connection.last_activity = now
+        else:
+            self.pongs_received += 1
+
+    # ---------- Heartbeat ----------
+
+    def _ensure_heartbeat(self):
+        if self._heartbeat is None or self._heartbeat.done():
+            self._heartbeat = asyncio.create_task(self._run_heartbeat())
+
+    @property
+    def heartbeat_tick(self) -> float:
+        """Seconds between checks; well under both timeouts, so each is overshot by at most one tick"""
+        return max(1.0, min(self.ping_interval, self.pong_timeout) / 2)
+
+    async def _run_heartbeat(self):
+        while self.connections:
+            await asyncio.sleep(self.heartbeat_tick)
+            self.check_heartbeats()
+
+    def check_heartbeats(self, now: float = None) -> Dict[str, int]:
+        """Reap half-open and idle connections and ping the quiet ones"""
+        now = now or time.monotonic()
+        counts = {'half_open': 0, 'idle': 0, 'pinged': 0}
+        ping = json.dumps({"type": "ping"})
+        for websocket, connection in list(self.connections.items()):
+            if connection.ping_sent_at is not None and now - connection.ping_sent_at > self.pong_timeout:
+                # Pinged and nothing received since: the other end is gone
+                self.reaped_half_open += 1
+                counts['half_open'] += 1
+                self._drop(websocket, CLOSE_POLICY_VIOLATION)
+            elif self.idle_timeout and now - connection.last_activity > self.idle_timeout:
+                self.reaped_idle += 1
+                counts['idle'] += 1
+                self._drop(websocket, CLOSE_GOING_AWAY)
+            elif (connection.ping_sent_at is None and now - connection.last_seen >= self.ping_interval
+                  and self._offer(connection, ping)):
+                connection.ping_sent_at = now
+                self.pings_sent += 1
+                counts['pinged'] += 1
+        if counts['half_open'] or counts['idle']:
+            print(f"[WS] Reaped {counts['half_open']} half-open and {counts['idle']} idle connections")
+        return counts
+
+    async def send(self, websocket: WebSocket, message: Message) -> bool:
+        connection = self.connections.get(websocket)
+        return connection is not None and self._offer(connection, message)
+
+    async def broadcast(self, message: Message, exclude: WebSocket = None) -> int:
+        """Queue a message for every connection; returns how many accepted it"""
+        delivered = 0
+        for connection in list(self.connections.values()):
+            if connection.websocket is not exclude and self._offer(connection, message):
+                delivered += 1
+        return delivered
+
+    async def _write(self, connection: Connection):
+        websocket = connection.websocket
+        try:
+            while True:
+                message = await connection.queue.get()
+                if isinstance(message, bytes):
+                    await asyncio.wait_for(websocket.send_bytes(message), self.send_timeout)
+                else:
+                    await asyncio.wait_for(websocket.send_text(message), self.send_timeout)
+                connection.sent += 1
+                self.messages_sent += 1
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            # Timed out or the socket is gone: stop queueing for it
+            self.send_errors += 1
+            print(f"[WS] Dropping connection {connection.id}: {type(e).__name__}")
+            self.disconnect(websocket)
+            await self._close(websocket, CLOSE_TRY_AGAIN_LATER)
+
+    @staticmethod
+    async def _close(websocket: WebSocket, code: int = CLOSE_NORMAL):
+        try:
+            await websocket.close(code=code)
+        except Exception:
+            pass
+
+    async def close_all(self):
+        """Stop the heartbeat and every writer, and close every socket (shutdown)"""
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+        for websocket in list(self.connections):
+            self.disconnect(websocket)
+            await self._close(websocket, CLOSE_GOING_AWAY)
+
+    def stats(self) -> Dict[str, Any]:
+        depths = [c.queue.qsize() for c in self.connections.values()]
+        now = time.monotonic()
+        return {
+            'connections': len(self.connections),
+            'max_connections': self.max_connections,
+            'users': len(self.by_user),
+            'max_per_user': self.max_per_user,
+            'oldest_silence_seconds': round(max((now - c.last_seen for c in self.connections.values()), default=0), 1),
+            'rooms': len(self.rooms),
+            'room_members_max': max((len(m) for m in self.rooms.values()), default=0),
+            'total_connections': self.total_connections,
+            'queue_depth_total': sum(depths),
+            'queue_depth_max': max(depths) if depths else 0,
+            'queue_size': self.queue_size,
+            'policy': self.policy,
+            'messages_sent': self.messages_sent,
+            'messages_dropped': self.messages_dropped,
+            'slow_disconnects': self.slow_disconnects,
+            'send_errors': self.send_errors,
+            'rejected_full': self.rejected_full,
+            'rejected_per_user': self.rejected_per_user,
+            'reaped_half_open': self.reaped_half_open,
+            'reaped_idle': self.reaped_idle,
+            'pings_sent': self.pings_sent,
+            'pongs_received': self.pongs_received,
+            'ping_interval_seconds': self.ping_interval,
+            'pong_timeout_seconds': self.pong_timeout,
+            'idle_timeout_seconds': self.idle_timeout
+        }
+
+
+connection_manager = ConnectionManager()
@@ -0,0 +1,136 @@
+import os
+import math
+from typing import List, Dict, Any, Tuple
+import numpy as np
+
+from services.expense_frame import ExpenseFrame, to_number
+from services.forecast import month_index
+
+CHARS_PER_TOKEN = 4
+CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKENS", "3000"))
+
+# Lists longer than this are never written out row by row
+MAX_LISTED_ROWS = 100
+TOP_ROWS = 10
+SUBTOTAL_LINES = 12
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token for this kind of text)"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+class ContextSection:
+    """One block of prompt context in decreasing levels of detail
+
+    `variants` is a list of (level, lines) from most to least detailed; the
+    builder uses the most detailed one that still fits. A required section
+    keeps its smallest variant even when the budget is exhausted.
+    """
+
+    __slots__ = ('name', 'priority', 'variants', 'required')
+
+    def __init__(self, name: str, priority: int, variants: List[Tuple[str, List[str]]], required: bool = False):
+        self.name = name
+        self.priority = priority
+        self.variants = [(level, lines) for level, lines in variants if lines]
+        self.required = required
+
+
+class BuiltContext:
+    def __init__(self, text: str, tokens: int, budget: int, levels: Dict[str, str]):
+        self.text = text
+        self.tokens = tokens
+        self.budget = budget
+        # section name -> level used, or 'dropped'
+        self.levels = levels
+
+    def describe(self) -> str:
+        shown = ', '.join(f"{name}={level}" for name, level in self.levels.items())
+        return f"~{self.tokens} tokens of {self.budget} ({shown})"
+
+
+class ContextBuilder:
+    """Assembles prompt context under a token budget
+
+    Sections claim budget in priority order (0 first), each at the most
+    detailed level that fits, and are written out in the order they were
+    added so the prompt layout stays the same. Estimating and choosing is
+    linear in the number of candidate lines, which the section builders keep
+    bounded (MAX_LISTED_ROWS), so cost does not grow with the history.
+    """
+
+    def __init__(self, budget: int = None):
+        self.budget = budget or CONTEXT_TOKEN_BUDGET
+        self.sections: List[ContextSection] = []
+
+    def add(self, section: ContextSection) -> 'ContextBuilder':
+        if section.variants:
+            self.sections.append(section)
+        return self
+
+    def build(self) -> BuiltContext:
+        remaining = self.budget
+        chosen: Dict[int, Tuple[str, List[str]]] = {}
+        order = sorted(range(len(self.sections)), key=lambda i: self.sections[i].priority)
+        for i in order:
+            section = self.sections[i]
+            for n, (level, lines) in enumerate(section.variants):
+                cost = estimate_tokens("\n".join(lines)) + 1
+                if cost <= remaining or (section.required and n == len(section.variants) - 1):
+                    chosen[i] = (level, lines)
+                    remaining -= cost
+                    break
+
+        parts: List[str] = []
+        levels: Dict[str, str] = {}
+        for i, section in enumerate(self.sections):
+            if i in chosen:
+                levels[section.name] = chosen[i][0]
+                parts.extend(chosen[i][1])
+            else:
+                levels[section.name] = 'dropped'
+        text = "\n".join(parts)
+        return BuiltContext(text, estimate_tokens(text), self.budget, levels)
+
+
+def month_subtotals(frame: ExpenseFrame, rows: np.ndarray, limit: int = SUBTOTAL_LINES) -> List[str]:
+    """'  2025-03: Rs.X (N)' lines for the most recent months of the rows, older months folded into one line"""
+    dated = rows[frame.day_ordinals[rows] > 0]
+    lines = []
+    if dated.size:
+        months = month_index(frame.day_ordinals[dated])
+        labels, inverse = np.unique(months, return_inverse=True)
+        totals = np.bincount(inverse, weights=frame.amounts[dated])
+        counts = np.bincount(inverse)
+        for j in range(len(labels) - 1, max(len(labels) - limit, 0) - 1, -1):
+            m = int(labels[j])
+            lines.append(f"  {1970 + m // 12:04d}-{m % 12 + 1:02d}: Rs.{to_number(round(totals[j], 2))} ({counts[j]})")
+        if len(labels) > limit:
+            older = slice(0, len(labels) - limit)
+            lines.append(f"  {len(labels) - limit} earlier months: Rs.{to_number(round(totals[older].sum(), 2))} ({counts[older].sum()})")
+    undated = rows.size - dated.size
+    if undated:
+        lines.append(f"  undated: Rs.{to_number(round(frame.amounts[rows].sum() - frame.amounts[dated].sum(), 2))} ({undated})")
+    return lines
+
+
+def category_subtotals(frame: ExpenseFrame, rows: np.ndarray, limit: int = SUBTOTAL_LINES) -> List[str]:
+    """'  Food: Rs.X (N)' lines, largest first, the rest folded into one line"""
+    codes = frame.category_codes[rows]
+    totals = np.bincount(codes, weights=frame.amounts[rows], minlength=len(frame.category_labels))
+    counts = np.bincount(codes, minlength=len(frame.category_labels))
+    present = counts.nonzero()[0]
+    present = present[np.argsort(-totals[present], kind='stable')]
+    lines = [f"  {frame.category_labels[c]}: Rs.{to_number(round(totals[c], 2))} ({counts[c]})" for c in present[:limit]]
+    if len(present) > limit:
+        rest = present[limit:]
+        lines.append(f"  {len(rest)} other categories: Rs.{to_number(round(totals[rest].sum(), 2))} ({counts[rest].sum()})")
+    return lines
+
+
+def top_rows(frame: ExpenseFrame, rows: np.ndarray, n: int = TOP_ROWS) -> np.ndarray:
+    """The n rows with the largest amounts, largest first"""
+    if rows.size > n:
+        rows = rows[np.argpartition(-np.abs(frame.amounts[rows]), n)[:n]]
+    return rows[np.argsort(-np.abs(frame.amounts[rows]), kind='stable')]
@@ -0,0 +1,169 @@
+import os
+import re
+import json
+import unicodedata
+from typing import List, Dict, Any, Optional
+
+from models.expense import Expense
+
+# Forms of address that are not part of the name ("Hari dai", "Sita didi")
+HONORIFICS = {'dai', 'didi', 'bhai', 'bhaiya', 'bhauju', 'ji', 'sir', 'madam', 'mr', 'mrs', 'ms',
+              'uncle', 'aunty', 'bro', 'sis'}
+
+# Spelling variants that sound the same in transliterated names
+PHONETIC_RULES = [('ph', 'f'), ('bh', 'b'), ('dh', 'd'), ('gh', 'g'), ('kh', 'k'), ('th', 't'),
+                  ('sh', 's'), ('ch', 'c'), ('ee', 'i'), ('oo', 'u'), ('w', 'v'), ('z', 'j'),
+                  ('q', 'k'), ('y', 'i')]
+
+
+def _name_words(text: str) -> List[str]:
+    ascii_text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode().lower()
+    return re.findall(r'[a-z0-9]+', ascii_text)
+
+
+def canonical_key(name: str) -> str:
+    """Normalized phonetic key: "Hari", "hari dai" and "Harry" all map to "hari" """
+    words = _name_words(name or '')
+    words = [w for w in words if w not in HONORIFICS] or words
+    if not words:
+        # Non-Latin names are kept as written
+        return (name or '').strip().lower()
+    key = ''.join(words)
+    previous = None
+    while key != previous:
+        previous = key
+        for pattern, replacement in PHONETIC_RULES:
+            key = key.replace(pattern, replacement)
+        key = re.sub(r'([a-z])\1+', r'\1', key)
+    return key
+
+
+def display_name(name: str) -> str:
+    """Name without forms of address, as written otherwise ("ram dai" -> "ram")"""
+    words = name.split()
+    kept = [w for w in words if w.lower().strip('.') not in HONORIFICS]
+    return ' '.join(kept or words)
+
+
+def counterparty_name(exp: Expense) -> Optional[str]:
+    """Who a row is with: paid_by, or for loans the name in the remarks"""
+    if exp.paid_by:
+        return exp.paid_by
+    if exp.category_key != 'loan':
+        return None
+    remarks = exp.remarks
+    for marker in (' to ', ' from ', ' by '):
+        if marker in remarks:
+            rest = remarks.split(marker)[1].split()
+            if rest:
+                return rest[0]
+    return 'Unknown'
+
+
+class AliasTable:
+    """Extra names for the same person ("Bhai" -> "Ram"), keyed by canonical key"""
+
+    def __init__(self, path: str = None):
+        self._aliases: Dict[str, str] = {}
+        path = path or os.getenv("COUNTERPARTY_ALIASES_FILE")
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    for alias, name in json.load(f).items():
+                        self.add(alias, name)
+            except Exception as e:
+                print(f"[LEDGER] Could not load aliases from {path}: {e}")
+
+    def add(self, alias: str, name: str):
+        self._aliases[canonical_key(alias)] = canonical_key(name)
+
+    def resolve(self, key: str) -> str:
+        return self._aliases.get(key, key)
+
+
+alias_table = AliasTable()
+
+
+class CounterpartyLedger:
+    """Running given/taken/paid balances per person, keyed by canonical name
+
+    Every update is a dict lookup on the canonical key, so adding or removing a
+    row is O(1) and spelling variants of one person share an entry. A positive
+    net means they owe you.
+    """
+
+    def __init__(self, aliases: AliasTable = None):
+        self.aliases = aliases or alias_table
+        # canonical key -> {'name', 'paid', 'given', 'taken', 'count'}
+        self.entries: Dict[str, Dict[str, Any]] = {}
+
+    @classmethod
+    def of(cls, frame) -> 'CounterpartyLedger':
+        """Loan balances of a frame, built on first use"""
+        def build():
+            ledger = cls()
+            for i in frame.is_loan.nonzero()[0]:
+                ledger.apply(frame.rows[i])
+            return ledger
+        return frame.memo('loan_ledger', build)
+
+    def resolve(self, name: str) -> str:
+        return self.aliases.resolve(canonical_key(name))
+
+    def apply(self, exp: Expense, sign: int = 1) -> Optional[str]:
+        """Add (sign=1) or remove (sign=-1) one row; returns the key it touched"""
+        name = counterparty_name(exp)
+        if not name:
+            return None
+        key = self.resolve(name)
+        name = display_name(name)
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self.entries[key] = {'name': name, 'paid': 0, 'given': 0, 'taken': 0, 'count': 0}
+        elif sign > 0:
+            # Show the most recently seen spelling
+            entry['name'] = name
+
+        amount = exp.amount
+        if exp.category_key == 'loan':
+            entry['given' if amount > 0 else 'taken'] += sign * abs(amount)
+        elif amount > 0:
+            entry['paid'] += sign * amount
+        entry['count'] += sign
+        if entry['count'] <= 0:
+            del self.entries[key]
+        return key
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.entries.get(key)
+
+    def balance(self, name: str = None, key: str = None) -> Dict[str, Any]:
+        """given, taken and net (positive: they owe you) for a person by any spelling, or by key"""
+        key = key or self.resolve(name)
+        entry = self.entries.get(key, {'name': name or key, 'paid': 0, 'given': 0, 'taken': 0, 'count': 0})
+        return dict(entry, key=key, net=entry['given'] - entry['taken'])
+
+    def balances(self) -> List[Dict[str, Any]]:
+        return [dict(entry, key=key, net=entry['given'] - entry['taken']) for key, entry in self.entries.items()]
+
+    def mentioned_in(self, text: str) -> List[str]:
+        """Keys of people named in text (single words or two-word names), in order of mention"""
+        words = [w for w in _name_words(text) if w not in HONORIFICS]
+        found = []
+        for i, word in enumerate(words):
+            for candidate in (word, word + words[i + 1] if i + 1 < len(words) else None):
+                if candidate is None:
+                    continue
+                key = self.resolve(candidate)
+                if key in self.entries and key not in found:
+                    found.append(key)
+        return found
+
+    @staticmethod
+    def status(given, taken) -> str:
+        net = given - taken
+        if net > 0:
+            return f"owes you Rs.{net}"
+        if net < 0:
+            return f"you owe Rs.{abs(net)}"
+        return "settled"
@@ -0,0 +1,63 @@
+import os
+import hashlib
+from typing import List, Optional
+
+from models.expense import Expense, parse_expenses
+from services.expense_frame import ExpenseFrame
+from utils.lru_cache import MemoryBoundedLRU
+
+
+def dataset_fingerprint(records: List[Expense]) -> str:
+    """Version key for a dataset: each row's id, timestamps and content
+
+    Rows are edited in place without touching updated_at, so the content an
+    analysis depends on is hashed too (as in aggregate_store._row_version).
+    """
+    keys = [(exp.id, exp.updated_at or exp.created_at, exp.amount, exp.category, exp.day_ordinal,
+             exp.item, exp.remarks, exp.paid_by) for exp in records]
+    return hashlib.blake2b(repr(keys).encode(), digest_size=16).hexdigest()
+
+
+def dataset_scope(user_id: Optional[str] = None, group_name: Optional[str] = None) -> str:
+    """Cache scope: group members share the group's scope, otherwise per user"""
+    if group_name:
+        return f"group:{group_name}"
+    return f"user:{user_id or 'anonymous'}"
+
+
+class DatasetCache:
+    """Keeps one ExpenseFrame per (scope, dataset fingerprint)
+
+    Follow-up questions in a chat session send the exact same rows, so the
+    frame and everything memoized on it (analysis, static RAG context
+    sections) is reused; only query-specific work is recomputed.
+    """
+
+    def __init__(self, max_entries: int = None, max_mb: int = None):
+        max_entries = max_entries or int(os.getenv("DATASET_CACHE_MAX_ENTRIES", 256))
+        max_mb = max_mb or int(os.getenv("DATASET_CACHE_MAX_MB", 64))
+        self._cache = MemoryBoundedLRU(max_entries=max_entries, max_bytes=max_mb * 1024 * 1024)
+
+    def get_frame(self, scope: str, rows) -> ExpenseFrame:
+        """Return the cached frame for this dataset version, building it on a miss"""
+        records = parse_expenses(rows)
+        fingerprint = dataset_fingerprint(records)
+        key = (scope, fingerprint)
+
+        frame = self._cache.get(key)
+        if frame is None:
+            frame = ExpenseFrame(records)
+            frame.fingerprint = fingerprint
+            self._cache.put(key, frame, frame.estimated_bytes())
+        return frame
+
+    def invalidate(self, scope: str):
+        """Drop every cached version for a scope"""
+        for key in [k for k in self._cache.keys() if k[0] == scope]:
+            self._cache.pop(key)
+
+    def stats(self):
+        return self._cache.stats()
+
+
+dataset_cache = DatasetCache()
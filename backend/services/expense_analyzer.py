@@ -1,6 +1,12 @@
 from typing import List, Dict, Any
 from datetime import datetime, timedelta
 import re
+import numpy as np
+from services.expense_frame import ExpenseFrame, to_number
+from services.search_index import InvertedIndex, TrigramIndex
+from services.semantic_index import SemanticIndex
+from services.query_planner import QueryPlanner, QueryResult
+from utils.text_match import mentions
 
 class ExpenseAnalyzer:
     """Advanced expense analysis and query processing"""
@@ -31,9 +37,10 @@ class ExpenseAnalyzer:
             'medical': ['doctor', 'medicine', 'hospital', 'medical', 'health', 'pharmacy'],
             'other': []
         }
+        self.planner = QueryPlanner(self)
 
-    def analyze_expenses(self, expenses_data: List[Dict]) -> Dict[str, Any]:
-        """Comprehensive analysis of expense data"""
+    def analyze_expenses(self, expenses_data) -> Dict[str, Any]:
+        """Comprehensive analysis of expense data (list of rows or a prebuilt ExpenseFrame)"""
         if not expenses_data:
             return {
                 'total': 0,
@@ -47,50 +54,40 @@ class ExpenseAnalyzer:
                 'net_balance': 0
             }
 
+        frame = ExpenseFrame.of(expenses_data)
+        return frame.memo('analysis', lambda: self._analyze_frame(frame))
+
+    def _analyze_frame(self, frame: ExpenseFrame) -> Dict[str, Any]:
         # Separate expenses and income (Exclude loans from expenses)
-        expenses = [exp for exp in expenses_data if exp.get('amount', 0) > 0 and exp.get('category', '').lower() not in ['income', 'loan']]
-        income_transactions = [exp for exp in expenses_data if exp.get('amount', 0) < 0 or exp.get('category', '').lower() == 'income']
-        loan_transactions_given = [exp for exp in expenses_data if exp.get('amount', 0) > 0 and exp.get('category', '').lower() == 'loan']
-        loan_transactions_received = [exp for exp in expenses_data if exp.get('amount', 0) < 0 and exp.get('category', '').lower() == 'loan']
-        
-        total_expenses = sum(exp.get('amount', 0) for exp in expenses)
-        total_income = sum(abs(exp.get('amount', 0)) for exp in income_transactions)
-        total_loans_given = sum(exp.get('amount', 0) for exp in loan_transactions_given)
-        total_loans_received = sum(abs(exp.get('amount', 0)) for exp in loan_transactions_received)
-        
-        expense_count = len(expenses)
-        income_count = len(income_transactions)
-        loan_given_count = len(loan_transactions_given)
-        loan_received_count = len(loan_transactions_received)
-        
+        expenses = frame.expense_mask()
+        income_transactions = (frame.amounts < 0) | frame.is_income_category
+        loan_transactions_given = (frame.amounts > 0) & frame.is_loan
+        loan_transactions_received = (frame.amounts < 0) & frame.is_loan
+
+        total_expenses = frame.total(expenses)
+        total_income = frame.total(income_transactions, absolute=True)
+        total_loans_given = frame.total(loan_transactions_given)
+        total_loans_received = frame.total(loan_transactions_received, absolute=True)
+
+        expense_count = frame.count(expenses)
+        income_count = frame.count(income_transactions)
+        loan_given_count = frame.count(loan_transactions_given)
+        loan_received_count = frame.count(loan_transactions_received)
+
         net_balance = total_income - total_expenses
 
         # Category breakdown (only expenses)
-        categories = {}
-        for exp in expenses:
-            category = exp.get('category', 'Other').lower()
-            categories[category] = categories.get(category, 0) + exp.get('amount', 0)
+        categories = frame.category_totals(expenses)
 
         # Sort categories by amount
         top_categories = sorted(categories.items(), key=lambda x: x[1], reverse=True)[:5]
 
         # Recent expenses (last 5 expenses only)
-        recent_expenses = expenses[:5] if len(expenses) >= 5 else expenses
+        recent_expenses = frame.select(expenses, limit=5)
 
-        # Calculate average per day (assuming data spans multiple days)
-        dates = set()
-        for exp in expenses_data:
-            date_val = exp.get('date') or exp.get('created_at')
-            if date_val:
-                # Handle different date formats
-                if isinstance(date_val, str):
-                    # Extract date part if it's a datetime string
-                    date_part = date_val.split('T')[0] if 'T' in date_val else date_val.split(' ')[0]
-                    dates.add(date_part)
-                else:
-                    dates.add(str(date_val))
-
-        days_count = len(dates) if dates else 1
+        # Average per calendar day over the tracked span; counting only days with
+        # entries overstated the rate for sparse data
+        days_count = frame.day_span() or 1
         average_per_day = total_expenses / days_count if days_count > 0 else 0
 
         return {
@@ -111,14 +108,8 @@ class ExpenseAnalyzer:
             'net_loan': total_loans_given - total_loans_received
         }
 
-    def find_specific_item(self, query: str, expenses_data: List[Dict]) -> Dict[str, Any]:
-        """Find specific item expenses from the data"""
-        if not query:
-            return None
-            
-        query_lower = query.lower()
-        
-        # Extract potential item names from query
+    def extract_item_keywords(self, query_lower: str) -> tuple:
+        """(item keywords, fallback) from a query; fallback is the whole query to try as an item name"""
         item_keywords = []
         words = query_lower.split()
         
@@ -143,80 +134,82 @@ class ExpenseAnalyzer:
         # Also check for direct item mentions
         common_items = ['momo', 'biryani', 'tea', 'coffee', 'lunch', 'dinner', 'grocery', 'petrol', 'taxi', 'rent', 'chicken', 'lassi', 'dahi', 'ghee', 'chiya', 'rice', 'soap', 'water']
         for item in common_items:
-            if item in query_lower and item not in item_keywords:
+            if mentions(query_lower, item) and item not in item_keywords:
                 item_keywords.append(item)
         
-        if not item_keywords:
-            # Fallback: Check if the query itself matches any item in expenses_data (for single word/short queries)
-            clean_query = query_lower.strip()
-            # Ignore if query is just a stop word or too short
-            if len(clean_query) > 2 and clean_query not in stop_words:
-                for expense in expenses_data:
-                    # Check for exact match or strong partial match (word boundary)
-                    item = expense.get('item') or ''
-                    item_lower = item.lower()
-                    if clean_query == item_lower or f" {clean_query} " in f" {item_lower} " or item_lower.startswith(f"{clean_query} ") or item_lower.endswith(f" {clean_query}"):
-                        item_keywords.append(clean_query)
-                        break
-            
-            if not item_keywords:
-                return None
-            
-        # Find matching expenses
-        matching_expenses = []
-        total_amount = 0
-        
-        for expense in expenses_data:
-            item_name = expense.get('item') or ''
-            remarks = expense.get('remarks') or ''
-            
-            # Check if any keyword matches item or remarks
-            for keyword in item_keywords:
-                if keyword in item_name.lower() or keyword in remarks.lower():
-                    matching_expenses.append(expense)
-                    total_amount += expense.get('amount', 0)
-                    break
-        
-        if matching_expenses:
+        # Fallback: the query itself may be an item name (for single word/short queries)
+        clean_query = query_lower.strip()
+        fallback = clean_query if len(clean_query) > 2 and clean_query not in stop_words else None
+        return item_keywords, fallback
+
+    def has_item_named(self, name: str, frame: ExpenseFrame) -> bool:
+        """True if some item is name or contains it as a whole word"""
+        for row in InvertedIndex.of(frame).substring_rows(name, include_remarks=False):
+            item_lower = frame.item_lower[row]
+            # Check for exact match or strong partial match (word boundary)
+            if name == item_lower or f" {name} " in f" {item_lower} " or item_lower.startswith(f"{name} ") or item_lower.endswith(f" {name}"):
+                return True
+        return False
+
+    def match_items(self, item_keywords: List[str], frame: ExpenseFrame, related: bool = True,
+                    whole_words: bool = False) -> Dict[str, Any]:
+        """Expenses whose item or remarks contains any keyword (or, with related, whose item is a synonym of one), or None
+
+        With whole_words a keyword must be a word of the text, so a total for
+        "rice" does not include a "price difference refund".
+        """
+        # Find matching expenses (any keyword in item or remarks) via the trigram or token index
+        if whole_words:
+            matches = InvertedIndex.of(frame).word_summary(item_keywords)
+        else:
+            matches = TrigramIndex.of(frame).keyword_summary(item_keywords)
+        rows = matches['rows']
+        total_amount = matches['total_amount']
+        if related:
+            # Synonyms the substring test misses ("coffee" -> latte, "snacks" -> samosa); look-alike
+            # spellings are not added, they would put "price refund" into a total for rice
+            synonyms = SemanticIndex.of(frame).related_rows(item_keywords)
+            if np.setdiff1d(synonyms, rows).size:
+                rows = np.union1d(rows, synonyms)
+                total_amount = to_number(frame.amounts[rows].sum())
+        
+        if rows.size:
+            # The keywords that found something ("groceries and rent" may only find rent)
+            matched = item_keywords
+            if len(item_keywords) > 1:
+                matched = [k for k in item_keywords if self.match_items([k], frame, related, whole_words)]
             return {
-                'item_name': item_keywords[0],
+                'item_name': matched[0],
+                'keywords': matched,
                 'total_amount': total_amount,
-                'count': len(matching_expenses),
-                'expenses': matching_expenses
+                'count': int(rows.size),
+                'expenses': [frame.rows[i] for i in rows]
             }
         
         return None
 
-    def filter_by_date_range(self, expenses_data: List[Dict], start_date: datetime = None, end_date: datetime = None) -> List[Dict]:
+    def find_specific_item(self, query: str, expenses_data, related: bool = True) -> Dict[str, Any]:
+        """Find specific item expenses from the data"""
+        if not query:
+            return None
+            
+        frame = ExpenseFrame.of(expenses_data)
+        item_keywords, fallback = self.extract_item_keywords(query.lower())
+        
+        if not item_keywords:
+            if not fallback or not self.has_item_named(fallback, frame):
+                return None
+            item_keywords = [fallback]
+            
+        return self.match_items(item_keywords, frame, related)
+
+    def filter_by_date_range(self, expenses_data, start_date: datetime = None, end_date: datetime = None) -> List[Dict]:
         """Filter expenses by date range"""
         if not expenses_data:
             return []
         
-        filtered = []
-        for exp in expenses_data:
-            date_val = exp.get('date') or exp.get('created_at')
-            if not date_val:
-                continue
-            
-            try:
-                # Parse date string
-                if isinstance(date_val, str):
-                    date_part = date_val.split('T')[0] if 'T' in date_val else date_val.split(' ')[0]
-                    exp_date = datetime.strptime(date_part, '%Y-%m-%d')
-                else:
-                    exp_date = datetime.fromisoformat(str(date_val))
-                
-                # Check if within range
-                if start_date and exp_date < start_date:
-                    continue
-                if end_date and exp_date > end_date:
-                    continue
-                
-                filtered.append(exp)
-            except:
-                continue
-        
-        return filtered
+        frame = ExpenseFrame.of(expenses_data)
+        return frame.select(frame.date_mask(start_date, end_date))
     
     def extract_time_period(self, query: str) -> tuple:
         """Extract time period from query and return (start_date, end_date, period_name)"""
@@ -240,7 +233,7 @@ class ExpenseAnalyzer:
         
         # Specific month name
         for month_name, month_num in self.months.items():
-            if month_name in query_lower:
+            if mentions(query_lower, month_name):
                 # Determine year
                 year = now.year
                 if month_num > now.month:
@@ -286,322 +279,27 @@ class ExpenseAnalyzer:
         
         return (None, None, None)
     
+    def _describe_comparison(self, comparison: Dict[str, Any]) -> str:
+        """Sentence for a RollupCube.compare() result"""
+        grain = comparison['grain']
+        current, previous = comparison['current'], comparison['previous']
+        response = (f"This {grain} so far: Rs.{current['total']} ({current['count']} txn) vs "
+                    f"last {grain}: Rs.{previous['total']} ({previous['count']} txn).")
+        if comparison['change_percent'] is not None:
+            direction = 'up' if comparison['change'] >= 0 else 'down'
+            response += f" That's {direction} {abs(comparison['change_percent'])}%."
+        if comparison['categories']:
+            cat, delta = next(iter(comparison['categories'].items()))
+            if delta['change']:
+                sign = '+' if delta['change'] > 0 else '-'
+                response += f" Biggest change: {cat.title()} ({sign}Rs.{abs(delta['change'])})."
+        return response
+    
+    def answer_query(self, query: str, analysis: Dict[str, Any], context: str = "personal", expenses_data=None) -> QueryResult:
+        """Plan and answer a question; the result carries the metric, its numbers and the reply"""
+        frame = ExpenseFrame.of(expenses_data) if expenses_data is not None and len(expenses_data) else None
+        return self.planner.answer(query, analysis, context, frame)
+
     def process_query(self, query: str, analysis: Dict[str, Any], context: str = "personal", expenses_data: List[Dict] = None) -> str:
         """Process natural language queries about expenses with advanced pattern matching"""
-        query_lower = query.lower()
-        
-        # Extract time period if present
-        start_date, end_date, period_name = self.extract_time_period(query_lower)
-        
-        # Filter expenses by date if time period detected
-        if start_date and expenses_data:
-            filtered_expenses = self.filter_by_date_range(expenses_data, start_date, end_date)
-            
-            if not filtered_expenses:
-                return f"You haven't spent anything in {period_name}."
-            
-            # Re-analyze with filtered data
-            analysis = self.analyze_expenses(filtered_expenses)
-            expenses_data = filtered_expenses
-            
-            # Update context to include period
-            time_context = f" in {period_name}"
-        else:
-            time_context = ""
-        
-        # ITEM-SPECIFIC QUERIES - Check these FIRST before category matching
-        # This ensures "tea" matches the tea item, not the food category that contains "tea" as a keyword
-        if expenses_data:
-            item_result = self.find_specific_item(query_lower, expenses_data)
-            if item_result:
-                item_name = item_result['item_name'].title()
-                total = item_result['total_amount']
-                count = item_result['count']
-                
-                if count == 1:
-                    expense = item_result['expenses'][0]
-                    date_info = f" on {expense.get('date', 'unknown date')}" if expense.get('date') else ""
-                    paid_by = f" (paid by {expense.get('paid_by')})" if expense.get('paid_by') else ""
-                    return f"You spent Rs.{total} on {item_name}{date_info}{paid_by}{time_context}."
-                else:
-                    return f"You spent Rs.{total} on {item_name} across {count} transactions{time_context}."
-        
-        # Check for multiple categories in query (e.g., "food and grocery")
-        matched_categories = []
-        
-        # Check actual categories from data first
-        for actual_category in analysis['categories'].keys():
-            if actual_category in query_lower:
-                if actual_category not in matched_categories:
-                    matched_categories.append(actual_category)
-        
-        # Check predefined category keywords
-        for category, keywords in self.categories.items():
-            cat_lower = category.lower()
-            if cat_lower not in matched_categories:
-                # Check if category name or any keyword is in query
-                if cat_lower in query_lower or any(keyword in query_lower for keyword in keywords):
-                    matched_categories.append(cat_lower)
-        
-        # Handle multiple categories
-        if len(matched_categories) > 1:
-            total_amount = 0
-            total_count = 0
-            category_details = []
-            
-            for cat in matched_categories:
-                amount = analysis['categories'].get(cat, 0)
-                if amount > 0:
-                    count = len([exp for exp in expenses_data if exp.get('category', '').lower() == cat and exp.get('amount', 0) > 0])
-                    total_amount += amount
-                    total_count += count
-                    category_details.append(f"{cat.title()}: Rs.{amount} ({count} txn)")
-            
-            if category_details:
-                categories_str = " and ".join(matched_categories)
-                details_str = ", ".join(category_details)
-                return f"You've spent Rs.{total_amount} on {categories_str} across {total_count} transactions{time_context}. Breakdown: {details_str}."
-        
-        # Single category query
-        if len(matched_categories) == 1:
-            category = matched_categories[0]
-            amount = analysis['categories'].get(category, 0)
-            if amount > 0:
-                cat_count = len([exp for exp in expenses_data if exp.get('category', '').lower() == category and exp.get('amount', 0) > 0])
-                if cat_count > 1:
-                    return f"You've spent Rs.{amount} on {category} across {cat_count} transactions{time_context}."
-                else:
-                    return f"You've spent Rs.{amount} on {category}{time_context}."
-            else:
-                if analysis['total'] > 0:
-                    top_cat = analysis['top_categories'][0][0] if analysis['top_categories'] else 'other categories'
-                    return f"You haven't spent anything on {category}{time_context}. Your main spending has been on {top_cat} (Rs.{analysis['top_categories'][0][1] if analysis['top_categories'] else 0})."
-                else:
-                    return f"You haven't spent anything on {category}{time_context}."
-        
-        # Income queries
-        if any(word in query_lower for word in ['income', 'salary', 'earning', 'received', 'got']):
-            if analysis.get('total_income', 0) > 0:
-                return f"Your total income{time_context}: Rs.{analysis['total_income']} across {analysis['income_count']} transactions. Net balance: Rs.{analysis['net_balance']} ({'surplus' if analysis['net_balance'] >= 0 else 'deficit'})."
-            else:
-                return f"No income recorded{time_context}."
-
-        # Loan queries
-        if any(word in query_lower for word in ['loan', 'lend', 'lent', 'borrow', 'owe', 'debt', 'udhar', 'own', 'payable', 'receiveable']):
-            # Check for specific people matches first
-            mentioned_people = []
-            if expenses_data:
-                loan_people = set()
-                for exp in expenses_data:
-                    if exp.get('category', '').lower() == 'loan' and exp.get('paid_by'):
-                        loan_people.add(exp['paid_by'].lower())
-                
-                mentioned_people = [p for p in loan_people if p in query_lower]
-            
-            # If specific people are mentioned, return stats just for them
-            if mentioned_people:
-                f_given = 0
-                f_received = 0
-                f_people_stats = {}
-                
-                for exp in expenses_data:
-                    if exp.get('category', '').lower() == 'loan' and exp.get('paid_by', '').lower() in mentioned_people:
-                        person = exp['paid_by'].title()
-                        amount = exp.get('amount', 0)
-                        
-                        if person not in f_people_stats:
-                            f_people_stats[person] = 0
-                        
-                        if amount > 0:
-                            f_given += amount
-                            f_people_stats[person] += amount
-                        else:
-                            f_received += abs(amount)
-                            f_people_stats[person] -= abs(amount)
-                
-                f_net = f_given - f_received
-                
-                # Format detailed string for these people
-                people_status = []
-                for p, net in f_people_stats.items():
-                    if net > 0:
-                        people_status.append(f"{p}: owes you Rs.{net}")
-                    elif net < 0:
-                        people_status.append(f"{p}: you owe Rs.{abs(net)}")
-                    else:
-                        people_status.append(f"{p}: settled")
-                
-                return f"Loan status for {', '.join([p.title() for p in mentioned_people])}: {'; '.join(people_status)}."
-
-            given = analysis.get('total_loans_given', 0)
-            received = analysis.get('total_loans_received', 0)
-            net_loan = analysis.get('net_loan', 0)
-            
-            if given == 0 and received == 0:
-                return f"No loan transactions found{time_context}."
-            
-            # Check if user wants detailed breakdown
-            wants_details = any(word in query_lower for word in ['detail', 'breakdown', 'who', 'everyone', 'person', 'list', 'each'])
-            
-            if wants_details and expenses_data:
-                person_map = {}
-                for exp in expenses_data:
-                    if exp.get('category', '').lower() == 'loan':
-                        person = exp.get('paid_by')
-                        if not person:
-                            # Try to extract from remarks if paid_by is missing
-                            remarks = exp.get('remarks', '')
-                            if ' to ' in remarks:
-                                person = remarks.split(' to ')[1].split()[0]
-                            elif ' from ' in remarks:
-                                person = remarks.split(' from ')[1].split()[0]
-                            elif ' by ' in remarks:
-                                person = remarks.split(' by ')[1].split()[0]
-                            else:
-                                person = 'Unknown'
-                        
-                        person = person.title()
-                        if person not in person_map:
-                            person_map[person] = {'given': 0, 'received': 0}
-                        
-                        amount = exp.get('amount', 0)
-                        if amount > 0:
-                            person_map[person]['given'] += amount
-                        else:
-                            person_map[person]['received'] += abs(amount)
-                
-                details = []
-                for person, data in person_map.items():
-                    p_given = data['given']
-                    p_received = data['received']
-                    p_net = p_given - p_received
-                    
-                    status = ""
-                    if p_net > 0:
-                        status = f"owes you Rs.{p_net}"
-                    elif p_net < 0:
-                        status = f"you owe Rs.{abs(p_net)}"
-                    else:
-                        status = "settled"
-                        
-                    details.append(f"{person}: {status}")
-                
-                return f"Loan Details{time_context}:\n" + "\n".join(details)
-
-            parts = []
-            if given > 0:
-                parts.append(f"Given: Rs.{given} ({analysis.get('loan_given_count', 0)} txn)")
-            if received > 0:
-                parts.append(f"Received: Rs.{received} ({analysis.get('loan_received_count', 0)} txn)")
-            
-            parts.append(f"Net Position: Rs.{abs(net_loan)} ({'You are owed' if net_loan >= 0 else 'You owe'})")
-            
-            return f"Loan Update{time_context}: " + "; ".join(parts) + "."
-
-        # Total/Summary queries
-        if any(word in query_lower for word in ['total', 'all', 'overall', 'everything', 'entire', 'whole']):
-            income_summary = f" Income: Rs.{analysis.get('total_income', 0)}." if analysis.get('total_income', 0) > 0 else ""
-            loan_summary = ""
-            if analysis.get('total_loans_given', 0) > 0 or analysis.get('total_loans_received', 0) > 0:
-                loan_summary = f" Loans: Given Rs.{analysis.get('total_loans_given', 0)}, Received Rs.{analysis.get('total_loans_received', 0)}."
-            
-            base_response = f"You spent Rs.{analysis['total']} (excluding loans)"
-            
-            if period_name:
-                return f"{base_response} in {period_name} across {analysis['count']} transactions.{income_summary}{loan_summary}"
-            elif any(word in query_lower for word in ['till now', 'so far', 'upto now', 'up to now']):
-                return f"{base_response} across {analysis['count']} transactions.{income_summary}{loan_summary}"
-            else:
-                return f"{base_response} across {analysis['count']} transactions{time_context}.{income_summary}{loan_summary}"
-        
-        # General spending queries
-        if any(word in query_lower for word in ['spent', 'expense', 'much']):
-            income_info = f" Income: Rs.{analysis.get('total_income', 0)}." if analysis.get('total_income', 0) > 0 else ""
-            if period_name:
-                return f"You spent Rs.{analysis['total']} in {period_name} across {analysis['count']} transactions.{income_info}"
-            else:
-                return f"You spent Rs.{analysis['total']} across {analysis['count']} transactions{time_context}.{income_info}"
-
-        # Breakdown/Category analysis
-        if any(word in query_lower for word in ['category', 'breakdown', 'categories', 'distribution']):
-            if analysis['top_categories']:
-                breakdown = []
-                for cat, amount in analysis['top_categories']:
-                    percentage = (amount / analysis['total'] * 100) if analysis['total'] > 0 else 0
-                    breakdown.append(f"• {cat.title()}: Rs.{amount} ({percentage:.1f}%)")
-                return f"Your {context} expense breakdown:\n" + "\n".join(breakdown)
-
-        # Recent expenses
-        if any(word in query_lower for word in ['recent', 'last', 'latest']):
-            if analysis['recent_expenses']:
-                recent = []
-                for exp in analysis['recent_expenses'][:3]:
-                    date_str = f" on {exp.get('date', 'unknown date')}" if exp.get('date') else ""
-                    recent.append(f"• Rs.{exp.get('amount', 0)} on {exp.get('item', 'item')} ({exp.get('category', 'other')}){date_str}")
-                return f"Your recent {context} expenses:\n" + "\n".join(recent)
-
-        # Average/Daily spending
-        if any(word in query_lower for word in ['average', 'daily', 'per day']):
-            income_avg = analysis.get('total_income', 0) / analysis['days_tracked'] if analysis['days_tracked'] > 0 and analysis.get('total_income', 0) > 0 else 0
-            income_info = f" Daily income average: Rs.{round(income_avg, 2)}." if income_avg > 0 else ""
-            return f"Your average daily {context} spending is Rs.{analysis['average_per_day']} over {analysis['days_tracked']} days.{income_info}"
-
-        # Comparison queries
-        if 'most' in query_lower and ('spent' in query_lower or 'expensive' in query_lower):
-            if analysis['top_categories']:
-                top_cat, top_amount = analysis['top_categories'][0]
-                return f"You've spent the most on {top_cat.title()} with Rs.{top_amount} in your {context} expenses."
-
-        # Count queries
-        if any(word in query_lower for word in ['how many', 'count', 'number']):
-            income_info = f" and {analysis.get('income_count', 0)} income transactions (Rs.{analysis.get('total_income', 0)})" if analysis.get('total_income', 0) > 0 else ""
-            return f"You have {analysis['count']} expense transactions totaling Rs.{analysis['total']}{income_info} in your {context} records."
-
-        # Who paid queries
-        if any(word in query_lower for word in ['who paid', 'who payed', 'paid by', 'payed by']):
-            category_found = None
-            for category in self.categories.keys():
-                if category in query_lower:
-                    category_found = category
-                    break
-            
-            if category_found:
-                category_expenses = [exp for exp in analysis['recent_expenses'] 
-                                   if exp.get('category', '').lower() == category_found]
-                if category_expenses:
-                    recent_with_payer = [exp for exp in category_expenses if exp.get('paid_by')]
-                    if recent_with_payer:
-                        latest = recent_with_payer[0]
-                        return f"The last {category_found} expense was Rs.{latest.get('amount', 0)} for {latest.get('item', 'item')} paid by {latest.get('paid_by', 'unknown')}."
-                    else:
-                        return f"I found recent {category_found} expenses but no payment information is recorded."
-                else:
-                    return f"No recent {category_found} expenses found."
-            else:
-                recent_with_payer = [exp for exp in analysis['recent_expenses'] if exp.get('paid_by')]
-                if recent_with_payer:
-                    latest = recent_with_payer[0]
-                    return f"The most recent expense with payment info: Rs.{latest.get('amount', 0)} for {latest.get('item', 'item')} paid by {latest.get('paid_by', 'unknown')}."
-                else:
-                    return f"No recent expenses have payment information recorded."
-
-        # Help/What can I ask queries
-        if any(word in query_lower for word in ['help', 'what can', 'options']):
-            return f"You can ask me about:\n• Total expenses ('What are my expenses till now?')\n• Income tracking ('What's my total income?')\n• Net balance ('What's my balance?')\n• Category breakdowns ('Show me my food expenses')\n• Recent transactions ('What are my recent expenses?')\n• Daily averages ('What's my daily spending?')\n• Comparisons ('What did I spend the most on?')\n• Who paid ('Who paid for grocery last time?')"
-
-        # Balance/Net queries
-        if any(word in query_lower for word in ['balance', 'net', 'left', 'remaining', 'save', 'saved']):
-            if analysis.get('total_income', 0) > 0:
-                return f"Your net balance{time_context}: Rs.{analysis['net_balance']} ({'surplus' if analysis['net_balance'] >= 0 else 'deficit'}). Income: Rs.{analysis['total_income']}, Expenses: Rs.{analysis['total']}."
-            else:
-                return f"No income data available to calculate balance. Total expenses: Rs.{analysis['total']}."
-        
-        # Default comprehensive response with better analysis
-        if analysis['top_categories']:
-            top_category, top_amount = analysis['top_categories'][0]
-            percentage = (top_amount / analysis['total'] * 100) if analysis['total'] > 0 else 0
-            income_info = f" Income: Rs.{analysis.get('total_income', 0)} ({analysis.get('income_count', 0)} txn)." if analysis.get('total_income', 0) > 0 else ""
-            return f"You spent Rs.{analysis['total']}{time_context} across {analysis['count']} transactions. Top spending: {top_category.title()} (Rs.{top_amount}, {percentage:.1f}%).{income_info}"
-        else:
-            income_info = f" Income: Rs.{analysis.get('total_income', 0)} ({analysis.get('income_count', 0)} txn)." if analysis.get('total_income', 0) > 0 else ""
-            return f"You spent Rs.{analysis['total']}{time_context} across {analysis['count']} transactions.{income_info}"
\ No newline at end of file
+        return self.answer_query(query, analysis, context, expenses_data).text
@@ -0,0 +1,201 @@
+from typing import List, Dict, Any, Iterable
+from datetime import datetime
+import numpy as np
+
+from models.expense import Expense, parse_expenses
+
+
+def to_number(value):
+    """Convert a NumPy scalar back to int when it is integral, so amounts print as Rs.500 not Rs.500.0"""
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+class ExpenseFrame:
+    """Columnar, array-backed view of an expense dataset
+
+    Built once per dataset: amounts are a float64 array, categories and
+    paid_by are interned integer codes and dates are day ordinals, so totals,
+    group-bys and date filters become vectorized NumPy reductions instead of
+    repeated dict lookups and string lowering on every query.
+    """
+
+    def __init__(self, expenses_data: Iterable):
+        # Raw dict rows are decoded into typed Expense records exactly once
+        self.rows: List[Expense] = parse_expenses(expenses_data)
+        n = len(self.rows)
+
+        self.amounts = np.zeros(n, dtype=np.float64)
+        self.day_ordinals = np.zeros(n, dtype=np.int64)
+        self.category_codes = np.zeros(n, dtype=np.int32)
+        self.paid_by_codes = np.full(n, -1, dtype=np.int32)
+
+        # Raw category labels (as stored) and their lowercased keys
+        self.category_labels: List[str] = []
+        self.category_keys: List[str] = []
+        self.paid_by_labels: List[str] = []
+        self.item_lower: List[str] = []
+        self.remarks_lower: List[str] = []
+
+        category_index: Dict[str, int] = {}
+        key_index: Dict[str, int] = {}
+        key_of_label: List[int] = []
+        paid_by_index: Dict[str, int] = {}
+
+        for i, exp in enumerate(self.rows):
+            self.amounts[i] = exp.amount
+            self.day_ordinals[i] = exp.day_ordinal
+
+            code = category_index.get(exp.category)
+            if code is None:
+                code = category_index[exp.category] = len(self.category_labels)
+                self.category_labels.append(exp.category)
+                if exp.category_key not in key_index:
+                    key_index[exp.category_key] = len(self.category_keys)
+                    self.category_keys.append(exp.category_key)
+                key_of_label.append(key_index[exp.category_key])
+            self.category_codes[i] = code
+
+            if exp.paid_by:
+                p_code = paid_by_index.get(exp.paid_by)
+                if p_code is None:
+                    p_code = paid_by_index[exp.paid_by] = len(self.paid_by_labels)
+                    self.paid_by_labels.append(exp.paid_by)
+                self.paid_by_codes[i] = p_code
+
+            self.item_lower.append(exp.item.lower())
+            self.remarks_lower.append(exp.remarks.lower())
+
+        self.key_codes = np.asarray(key_of_label, dtype=np.int32)[self.category_codes] if n else np.zeros(0, dtype=np.int32)
+        self.is_loan = self._key_mask('loan')
+        self.is_income_category = self._key_mask('income')
+        self.has_date = self.day_ordinals > 0
+        self.fingerprint = None
+        self._derived: Dict[str, Any] = {}
+
+    @classmethod
+    def of(cls, expenses_data) -> 'ExpenseFrame':
+        """Return expenses_data if it is already a frame, otherwise build one"""
+        if isinstance(expenses_data, cls):
+            return expenses_data
+        return cls(expenses_data)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def memo(self, name: str, builder):
+        """Build a derived, query-independent value once per frame (dataset version)"""
+        if name not in self._derived:
+            self._derived[name] = builder()
+        return self._derived[name]
+
+    def estimated_bytes(self) -> int:
+        """Rough memory footprint used for cache budgeting"""
+        arrays = (self.amounts.nbytes + self.day_ordinals.nbytes + self.category_codes.nbytes
+                  + self.paid_by_codes.nbytes + self.key_codes.nbytes)
+        # Per row: the Expense record, lowered text and a share of derived indexes
+        return arrays + len(self.rows) * 1024
+
+    def _key_mask(self, key: str) -> np.ndarray:
+        try:
+            code = self.category_keys.index(key)
+        except ValueError:
+            return np.zeros(len(self.rows), dtype=bool)
+        return self.key_codes == code
+
+    # ---------- Masks ----------
+
+    def expense_mask(self) -> np.ndarray:
+        """Positive amounts that are neither income nor loans"""
+        return (self.amounts > 0) & ~self.is_income_category & ~self.is_loan
+
+    def category_mask(self, key: str) -> np.ndarray:
+        """Rows whose lowercased category equals key"""
+        return self._key_mask(key.lower())
+
+    def date_mask(self, start_date: datetime = None, end_date: datetime = None) -> np.ndarray:
+        """Rows whose date (at midnight) falls within [start_date, end_date], via the sorted date index"""
+        from services.date_index import DateIndex
+        return DateIndex.of(self).mask(start_date, end_date)
+
+    # ---------- Reductions ----------
+
+    def total(self, mask: np.ndarray = None, absolute: bool = False):
+        values = self.amounts if mask is None else self.amounts[mask]
+        if absolute:
+            values = np.abs(values)
+        return to_number(values.sum())
+
+    def count(self, mask: np.ndarray) -> int:
+        return int(np.count_nonzero(mask))
+
+    def _group(self, codes: np.ndarray, labels: List[str], mask: np.ndarray) -> Dict[str, Any]:
+        """Sum amounts per code over mask, keyed by label in first-appearance order"""
+        selected = codes[mask]
+        if not selected.size:
+            return {}
+        sums = np.bincount(selected, weights=self.amounts[mask], minlength=len(labels))
+        _, first = np.unique(selected, return_index=True)
+        ordered = selected[np.sort(first)]
+        return {labels[code]: to_number(sums[code]) for code in ordered}
+
+    def category_totals(self, mask: np.ndarray, lowercase: bool = True) -> Dict[str, Any]:
+        """Total amount per category over mask"""
+        if lowercase:
+            return self._group(self.key_codes, self.category_keys, mask)
+        return self._group(self.category_codes, self.category_labels, mask)
+
+    def category_counts(self, mask: np.ndarray, lowercase: bool = True) -> Dict[str, int]:
+        """Number of rows per category over mask"""
+        codes = self.key_codes if lowercase else self.category_codes
+        labels = self.category_keys if lowercase else self.category_labels
+        counts = np.bincount(codes[mask], minlength=len(labels))
+        return {labels[code]: int(c) for code, c in enumerate(counts) if c}
+
+    def distinct_days(self, mask: np.ndarray = None) -> int:
+        days = self.day_ordinals[self.has_date if mask is None else (mask & self.has_date)]
+        return int(np.unique(days).size)
+
+    def day_span(self, mask: np.ndarray = None) -> int:
+        """Calendar days from the first to the last dated row, inclusive (0 if none are dated)"""
+        days = self.day_ordinals[self.has_date if mask is None else (mask & self.has_date)]
+        return int(days.max() - days.min() + 1) if days.size else 0
+
+    # ---------- Selection ----------
+
+    def select(self, mask: np.ndarray, limit: int = None) -> List[Expense]:
+        """Original rows selected by mask, in dataset order"""
+        return [self.rows[i] for i in np.flatnonzero(mask)[:limit]]
+
+    def take(self, mask: np.ndarray) -> 'ExpenseFrame':
+        """Sub-frame over the masked rows, sharing interned codes (no re-parsing)"""
+        indices = np.flatnonzero(mask)
+        sub = ExpenseFrame.__new__(ExpenseFrame)
+        sub.rows = [self.rows[i] for i in indices]
+        sub.amounts = self.amounts[indices]
+        sub.day_ordinals = self.day_ordinals[indices]
+        sub.category_codes = self.category_codes[indices]
+        sub.paid_by_codes = self.paid_by_codes[indices]
+        sub.key_codes = self.key_codes[indices]
+        sub.category_labels = self.category_labels
+        sub.category_keys = self.category_keys
+        sub.paid_by_labels = self.paid_by_labels
+        sub.item_lower = [self.item_lower[i] for i in indices]
+        sub.remarks_lower = [self.remarks_lower[i] for i in indices]
+        sub.is_loan = self.is_loan[indices]
+        sub.is_income_category = self.is_income_category[indices]
+        sub.has_date = self.has_date[indices]
+        sub.fingerprint = None
+        sub._derived = {}
+        return sub
+
+    def match_keywords(self, keywords: List[str], include_remarks: bool = True) -> np.ndarray:
+        """Rows whose item (or remarks) contains any keyword as a substring"""
+        mask = np.zeros(len(self.rows), dtype=bool)
+        for i, item in enumerate(self.item_lower):
+            remarks = self.remarks_lower[i] if include_remarks else ''
+            for keyword in keywords:
+                if keyword in item or keyword in remarks:
+                    mask[i] = True
+                    break
+        return mask
@@ -0,0 +1,157 @@
+import calendar
+from datetime import date
+from typing import Dict, Any, Optional
+import numpy as np
+
+from services.expense_frame import ExpenseFrame, to_number
+from services.rollup_engine import RollupCube
+
+ORDINAL_EPOCH = np.datetime64('0001-01-01', 'D')
+TREND_MONTHS = 6
+# Full months kept as history; the forecasts read at most the last 12 + 3
+HISTORY_MONTHS = 120
+
+
+def month_index(day_ordinals: np.ndarray) -> np.ndarray:
+    """Months since 1970-01 for an array of date ordinals"""
+    return (ORDINAL_EPOCH + (day_ordinals - 1)).astype('datetime64[M]').astype(np.int64)
+
+
+def _month_date(index: int) -> date:
+    return date(1970 + index // 12, index % 12 + 1, 1)
+
+
+def linear_forecast(history: np.ndarray, steps: int = 1) -> tuple:
+    """(forecast, slope) of a least-squares trend per column of a months x series matrix, `steps` months past the last row"""
+    n = history.shape[0]
+    x = np.arange(n, dtype=np.float64)
+    x_mean = x.mean()
+    y_mean = history.mean(axis=0)
+    denom = ((x - x_mean) ** 2).sum()
+    slope = ((x - x_mean)[:, None] * (history - y_mean)).sum(axis=0) / denom if denom else np.zeros_like(y_mean)
+    return y_mean + slope * (n - 1 + steps - x_mean), slope
+
+
+def seasonal_forecast(history: np.ndarray, steps: int = 1, window: int = 3) -> Optional[np.ndarray]:
+    """Same month last year scaled by how the recent months compare with a year earlier
+
+    Needs at least 12 + window months; returns None otherwise.
+    """
+    n = history.shape[0]
+    target = n - 1 + steps
+    if target - 12 < 0 or n < 12 + window:
+        return None
+    last_year = history[target - 12]
+    recent = history[n - window:].sum(axis=0)
+    year_before = history[n - window - 12:n - 12].sum(axis=0)
+    ratio = np.divide(recent, year_before, out=np.ones_like(recent), where=year_before > 0)
+    return last_year * ratio
+
+
+class SpendingForecast:
+    """Month-to-date projection, run rates and a next-month forecast for one dataset version
+
+    Built from the rollup cube's day x category totals (the same expense rows
+    analyze_expenses counts): days are bucketed into months with one add.at,
+    and the trend for the total and every category is fitted in a single
+    vectorized least-squares pass over the month x category matrix.
+    """
+
+    def __init__(self, frame: ExpenseFrame, today: date = None):
+        today = today or date.today()
+        cube = RollupCube.of(frame)
+        self.today = today
+        self.categories = cube.category_labels
+
+        today_ord = today.toordinal()
+        month_start = date(today.year, today.month, 1)
+        days_in_month = calendar.monthrange(today.year, today.month)[1]
+        self.days_elapsed = today.day
+        self.days_in_month = days_in_month
+
+        # Month-to-date run rate and projection
+        mtd = cube.period_total(month_start.toordinal(), today_ord)
+        self.mtd_total = mtd['total']
+        self.mtd_count = mtd['count']
+        mtd_by_cat = np.array([mtd['categories'].get(c, 0) for c in self.categories], dtype=np.float64)
+        self.run_rate = mtd_by_cat / self.days_elapsed
+        self.projected = mtd_by_cat / self.days_elapsed * days_in_month
+
+        # Full months before the current one, as a months x categories matrix (empty months are zeros)
+        current_month = month_index(np.array([today_ord]))[0]
+        months = month_index(cube.days)
+        past = months < current_month
+        if cube.counts.sum() and past.any():
+            # Bounded so one row dated in year 1 cannot allocate thousands of empty months
+            first_month = max(months[past].min(), current_month - HISTORY_MONTHS)
+            past &= months >= first_month
+            self.first_month = int(first_month)
+            self.history = np.zeros((current_month - first_month, len(self.categories)), dtype=np.float64)
+            np.add.at(self.history, months[past] - first_month, cube.by_category[past])
+        else:
+            self.first_month = int(current_month)
+            self.history = np.zeros((0, len(self.categories)), dtype=np.float64)
+
+        self.next_month = _month_date(int(current_month) + 1)
+        self._forecast()
+
+    @classmethod
+    def of(cls, frame: ExpenseFrame) -> 'SpendingForecast':
+        """Forecast as of today for the frame, built on first use"""
+        today = date.today()
+        return frame.memo(f'forecast:{today.isoformat()}', lambda: cls(frame, today))
+
+    def _forecast(self):
+        next_days = calendar.monthrange(self.next_month.year, self.next_month.month)[1]
+        self.slope = np.zeros(len(self.categories))
+
+        # The current month counts as history once its projection is available
+        if self.days_elapsed > 1:
+            history, steps = np.vstack([self.history, self.projected[None, :]]), 1
+        else:
+            history, steps = self.history, 2
+        seasonal = seasonal_forecast(history, steps) if history.shape[0] else None
+        if seasonal is not None:
+            self.method = 'seasonal'
+            forecast = seasonal
+        elif history.shape[0] >= 3:
+            self.method = 'linear'
+            forecast, self.slope = linear_forecast(history[-TREND_MONTHS:], steps)
+        elif history.shape[0]:
+            self.method = 'average'
+            forecast = history.mean(axis=0)
+        else:
+            self.method = 'run_rate'
+            forecast = self.run_rate * next_days
+        self.forecast = np.maximum(forecast, 0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        def by_category(values: np.ndarray) -> Dict[str, Any]:
+            pairs = [(c, to_number(round(float(v), 2))) for c, v in zip(self.categories, values) if v]
+            return dict(sorted(pairs, key=lambda x: x[1], reverse=True))
+
+        monthly = self.history.sum(axis=1)
+        return {
+            'as_of': self.today.isoformat(),
+            'month_to_date': {
+                'total': self.mtd_total,
+                'count': self.mtd_count,
+                'days_elapsed': self.days_elapsed,
+                'days_in_month': self.days_in_month,
+                'daily_run_rate': to_number(round(float(self.run_rate.sum()), 2)),
+                'projected_total': to_number(round(float(self.projected.sum()), 2)),
+                'projected_by_category': by_category(self.projected),
+                'run_rate_by_category': by_category(self.run_rate)
+            },
+            'next_month': {
+                'month': f"{self.next_month.year:04d}-{self.next_month.month:02d}",
+                'method': self.method,
+                'forecast_total': to_number(round(float(self.forecast.sum()), 2)),
+                'forecast_by_category': by_category(self.forecast),
+                'trend_per_month': to_number(round(float(self.slope.sum()), 2))
+            },
+            'history': [
+                {'month': f"{d.year:04d}-{d.month:02d}", 'total': to_number(round(float(v), 2))}
+                for d, v in ((_month_date(self.first_month + i), v) for i, v in enumerate(monthly))
+            ]
+        }
@@ -0,0 +1,171 @@
+import os
+import time
+import threading
+from typing import Dict, Any, Optional
+
+from services.query_planner import QueryResult, QueryIntent, METRIC_TRIGGERS
+from utils.text_match import mentions, mentions_any
+
+# Base confidence that the local answer for a metric is what the user wanted
+METRIC_CONFIDENCE = {
+    'settle': 0.9,
+    'comparison': 0.9,
+    'item': 0.9,
+    'category': 0.9,
+    'income': 0.9,
+    'loan': 0.9,
+    'total': 0.9,
+    'spend': 0.85,
+    'count': 0.9,
+    'average': 0.9,
+    'balance': 0.85,
+    'top': 0.85,
+    'breakdown': 0.8,
+    'recent': 0.8,
+    'who_paid': 0.8,
+    'help': 0.8,
+    # The period had no rows; sure only if the question asked for something besides the period
+    'period_empty': 0.85,
+    # Nothing specific recognised; the generic summary is a guess
+    'summary': 0.2,
+}
+
+# Question words that refine any answer rather than asking for a different one
+# ("how much did I spend on food" is a category question)
+GENERIC_SIGNALS = {'spend', 'total'}
+# Each other metric the question's words asked for makes the answer less certain
+COMPETING_PENALTY = 0.15
+# Comparing things other than periods ("momo vs petrol") is left to the model
+COMPARISON_PENALTY = 0.3
+# A category found only through one of its keywords ("show" -> entertainment)
+KEYWORD_CATEGORY_PENALTY = 0.2
+PERIOD_ONLY_CONFIDENCE = 0.4
+# Things the question named that a whole-dataset answer ignored ("how much in total on weekends")
+UNUSED_ITEM_PENALTY = 0.3
+# Metrics whose answer does not depend on the items a question names
+ITEMLESS_METRICS = {'total', 'spend', 'count', 'average', 'top', 'breakdown', 'recent', 'balance', 'income',
+                    'help', 'summary'}
+TRIGGER_WORDS = {word for _, words in METRIC_TRIGGERS for word in words}
+
+# Questions that want reasoning or advice rather than a number
+OPEN_ENDED_WORDS = ['why', 'should', 'suggest', 'advice', 'advise', 'recommend', 'tips', 'how can i', 'how do i',
+                    'how to', 'explain', 'reduce', 'improve', 'plan', 'budget', 'pattern', 'trend', 'insight',
+                    'analyze', 'analyse', 'better', 'worse', 'habit', 'tell me about', 'what if',
+                    # ...or a number no local metric computes: extremes, comparisons, when, days of the week
+                    'biggest', 'largest', 'highest', 'smallest', 'lowest', 'cheapest', 'costliest', 'least',
+                    'maximum', 'minimum', 'more', 'less', 'fewer', 'higher', 'lower', 'cheaper', 'costlier',
+                    'than', 'too', 'when',
+                    'weekend', 'weekends', 'weekday', 'weekdays', 'monday', 'tuesday', 'wednesday', 'thursday',
+                    'friday', 'saturday', 'sunday', 'mondays', 'tuesdays', 'wednesdays', 'thursdays', 'fridays',
+                    'saturdays', 'sundays', 'interesting', 'something', 'unusual']
+NUMERIC_WORDS = ['how much', 'how many', 'total', 'spent', 'owe', 'balance', 'count', 'average', 'amount']
+
+
+class RouteDecision:
+    """Where a chat question is answered, and the local answer if one was computed"""
+
+    __slots__ = ('local', 'confidence', 'result', 'reason')
+
+    def __init__(self, local: bool, confidence: float, result: Optional[QueryResult], reason: str):
+        self.local = local
+        self.confidence = confidence
+        self.result = result
+        self.reason = reason
+
+
+class IntentRouter:
+    """Decides whether a chat question is answered locally or sent to Gemini
+
+    The question is planned and answered by the analyzer first (milliseconds,
+    from indexed data); the answered metric and the wording of the question
+    give a confidence score, and only low-confidence or open-ended questions
+    go on to the LLM. Keeps counters of where traffic ends up.
+    """
+
+    def __init__(self, threshold: float = None):
+        self.threshold = threshold if threshold is not None else float(os.getenv("LOCAL_ANSWER_THRESHOLD", 0.75))
+        self._lock = threading.Lock()
+        self._routes = {'local': 0, 'llm': 0, 'fallback': 0}
+        self._by_metric: Dict[str, Dict[str, int]] = {}
+        self._local_ms = 0.0
+        self._local_runs = 0
+
+    def confidence(self, query: str, result: QueryResult) -> float:
+        query_lower = query.lower()
+        intent = result.intent
+        metric = result.metric
+        score = METRIC_CONFIDENCE.get(metric, 0.5)
+
+        if metric == 'period_empty' and not (intent.signals or intent.categories or intent.items):
+            score = PERIOD_ONLY_CONFIDENCE
+        keyword_category = metric == 'category' and result.value.get('matched_by') == 'keyword'
+        if keyword_category:
+            score -= KEYWORD_CATEGORY_PENALTY
+        # Only go local when the question asked for one thing
+        for signal in intent.signals:
+            if signal == metric or (signal in GENERIC_SIGNALS and not keyword_category):
+                continue
+            score -= COMPARISON_PENALTY if signal == 'comparison' else COMPETING_PENALTY
+
+        if metric in ITEMLESS_METRICS and self._unused_items(intent):
+            score -= UNUSED_ITEM_PENALTY
+
+        if mentions_any(query_lower, OPEN_ENDED_WORDS):
+            score -= 0.4
+        if mentions_any(query_lower, NUMERIC_WORDS):
+            score += 0.05
+        # Long messages are usually conversational
+        if len(query_lower.split()) > 15:
+            score -= 0.2
+        return round(max(0.0, min(1.0, score)), 2)
+
+    @staticmethod
+    def _unused_items(intent: QueryIntent) -> list:
+        """Item words of the question that are not metric, period or counterparty words"""
+        period = (intent.period_name or '').lower()
+        return [k for k in intent.items
+                if k not in TRIGGER_WORDS and k not in intent.counterparties and not mentions(period, k)]
+
+    def route(self, query: str, analyzer, analysis: Dict[str, Any], context: str = "personal", frame=None) -> RouteDecision:
+        """Answer the question locally and decide whether that answer is good enough to return"""
+        start = time.perf_counter()
+        try:
+            result = analyzer.answer_query(query, analysis, context, frame)
+        except Exception as e:
+            print(f"[ROUTER] Local answer failed: {e}")
+            return RouteDecision(False, 0.0, None, 'local answer failed')
+        elapsed = (time.perf_counter() - start) * 1000
+
+        score = self.confidence(query, result)
+        local = score >= self.threshold
+        reason = f"{result.metric} ({score:.2f} {'>=' if local else '<'} {self.threshold})"
+        with self._lock:
+            self._local_ms += elapsed
+            self._local_runs += 1
+        print(f"[ROUTER] {'Local' if local else 'LLM'}: {reason} in {elapsed:.1f}ms")
+        return RouteDecision(local, score, result, reason)
+
+    def record(self, decision: RouteDecision, route: str):
+        """Count where a question was finally answered: local, llm or fallback (LLM unavailable/failed)"""
+        metric = decision.result.metric if decision.result else 'error'
+        with self._lock:
+            self._routes[route] += 1
+            counts = self._by_metric.setdefault(metric, {'local': 0, 'llm': 0, 'fallback': 0})
+            counts[route] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = sum(self._routes.values())
+            answered_locally = self._routes['local'] + self._routes['fallback']
+            return {
+                'threshold': self.threshold,
+                'total': total,
+                'routes': dict(self._routes),
+                'local_share': round(self._routes['local'] / total, 3) if total else 0.0,
+                'answered_without_llm_share': round(answered_locally / total, 3) if total else 0.0,
+                'avg_local_ms': round(self._local_ms / self._local_runs, 2) if self._local_runs else 0.0,
+                'by_metric': {k: dict(v) for k, v in self._by_metric.items()}
+            }
+
+
+intent_router = IntentRouter()
@@ -0,0 +1,259 @@
+import os
+import time
+import asyncio
+import threading
+import importlib.util
+from typing import Dict, Any, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _module_installed(name: str) -> bool:
+    """Whether a module can be imported, without importing it"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+# google.generativeai (and grpc/protobuf under it) takes a noticeable share of a
+# cold start, so it is only imported when the first model call needs it
+GENAI_AVAILABLE = _module_installed("google.generativeai")
+
+# gemini-2.5-flash found to be more stable on free tier than 2.0-flash
+CHAT_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+RAG_MODEL = os.getenv("GEMINI_RAG_MODEL", "gemini-2.0-flash-exp")
+
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", 30))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 4))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 3))
+# Calls a user is waiting on (chat, parse, categorize): one short retry instead of
+# 3 with 2/4/8s backoff, so a failing model costs ~2 attempts, not ~2 minutes
+INTERACTIVE_TIMEOUT_SECONDS = float(os.getenv("LLM_INTERACTIVE_TIMEOUT_SECONDS", 12))
+INTERACTIVE_MAX_RETRIES = int(os.getenv("LLM_INTERACTIVE_MAX_RETRIES", 1))
+RETRY_BASE_DELAY = 2
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+RATE_LIMIT_MARKERS = ('429', 'quota', 'resource exhausted', 'resource_exhausted')
+TRANSIENT_MARKERS = ('500', '502', '503', '504', 'unavailable', 'deadline', 'timeout', 'timed out', 'internal error')
+
+
+def _error_kind(error: Exception) -> str:
+    """'rate_limit', 'transient' (worth retrying) or 'error'"""
+    text = str(error).lower()
+    if any(marker in text for marker in RATE_LIMIT_MARKERS):
+        return 'rate_limit'
+    if isinstance(error, TimeoutError) or any(marker in text for marker in TRANSIENT_MARKERS):
+        return 'transient'
+    return 'error'
+
+
+class ModelMetrics:
+    """Call counts, latency histogram and token usage for one model"""
+
+    def __init__(self):
+        self.calls = 0
+        self.successes = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.transient_errors = 0
+        self.retries = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.total_ms = 0.0
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def observe(self, elapsed_ms: float):
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if elapsed_ms <= bound:
+                self.latency_buckets[i] += 1
+                return
+        self.latency_buckets[-1] += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        attempts = self.successes + self.errors + self.rate_limited + self.transient_errors
+        labels = [f"<={b}ms" for b in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}ms"]
+        return {
+            'calls': self.calls,
+            'successes': self.successes,
+            'errors': self.errors,
+            'rate_limited': self.rate_limited,
+            'transient_errors': self.transient_errors,
+            'retries': self.retries,
+            'error_rate': round((self.errors + self.transient_errors) / attempts, 3) if attempts else 0.0,
+            'rate_limit_rate': round(self.rate_limited / attempts, 3) if attempts else 0.0,
+            'avg_ms': round(self.total_ms / attempts, 1) if attempts else 0.0,
+            'latency_histogram': dict(zip(labels, self.latency_buckets)),
+            'prompt_tokens': self.prompt_tokens,
+            'output_tokens': self.output_tokens
+        }
+
+
+class LLMGateway:
+    """The one place LLM calls go through
+
+    Configures the Gemini client once and reuses one GenerativeModel per
+    model name, bounds concurrent requests with a semaphore, applies a
+    per-request timeout, retries rate limits and transient failures with
+    exponential backoff, and keeps per-model metrics. generate() blocks;
+    agenerate() runs it on a worker thread so the event loop keeps serving.
+
+    The client library is imported and configured on the first call (or by
+    warmup()), on a worker thread when called through agenerate(), so
+    requests that never reach the model never pay for it. `available` only
+    checks that the package is installed and a key is set.
+    """
+
+    def __init__(self, api_key: str = None, max_concurrency: int = None):
+        self._api_key = api_key
+        self._genai = None
+        self._client_failed = False
+        self._client_lock = threading.Lock()
+        self.client_init_ms: Optional[float] = None
+        self._models: Dict[str, Any] = {}
+        self.max_concurrency = max_concurrency or LLM_MAX_CONCURRENCY
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, ModelMetrics] = {}
+
+        if not GENAI_AVAILABLE:
+            print("[LLM] google-generativeai not installed")
+
+    @property
+    def api_key(self) -> Optional[str]:
+        api_key = self._api_key or os.getenv("GEMINI_API_KEY")
+        return api_key.strip() if api_key and api_key.strip() else None
+
+    @property
+    def available(self) -> bool:
+        return GENAI_AVAILABLE and not self._client_failed and self.api_key is not None
+
+    @property
+    def client_state(self) -> str:
+        if self._genai is not None:
+            return 'ready'
+        return 'failed' if self._client_failed else 'cold'
+
+    def _client(self):
+        """The configured genai module, imported on first use; None if setup failed"""
+        if self._genai is not None or not self.available:
+            return self._genai
+        with self._client_lock:
+            if self._genai is None and not self._client_failed:
+                start = time.perf_counter()
+                try:
+                    import google.generativeai as genai
+                    genai.configure(api_key=self.api_key)
+                    self._genai = genai
+                    self.client_init_ms = round((time.perf_counter() - start) * 1000, 1)
+                    print(f"[LLM] Gemini client configured in {self.client_init_ms}ms")
+                except Exception as e:
+                    self._client_failed = True
+                    print(f"[LLM] Gemini setup failed: {e}")
+        return self._genai
+
+    def warmup(self, models=(CHAT_MODEL, RAG_MODEL)) -> bool:
+        """Import and configure the client and build the models ahead of the first request"""
+        if self._client() is None:
+            return False
+        for name in models:
+            self.model(name)
+        return True
+
+    async def awarmup(self) -> bool:
+        return await asyncio.to_thread(self.warmup)
+
+    def model(self, name: str):
+        """Shared GenerativeModel for a model name, created on first use"""
+        genai = self._client()
+        with self._lock:
+            if name not in self._models:
+                self._models[name] = genai.GenerativeModel(name)
+            return self._models[name]
+
+    def _metrics_for(self, name: str) -> ModelMetrics:
+        metrics = self._metrics.get(name)
+        if metrics is None:
+            metrics = self._metrics.setdefault(name, ModelMetrics())
+        return metrics
+
+    def generate(self, prompt: str, model: str = CHAT_MODEL, timeout: float = None,
+                 retries: int = None) -> Optional[str]:
+        """Response text for a prompt, or None if unavailable or every attempt failed"""
+        if self._client() is None:
+            return None
+        timeout = timeout or LLM_TIMEOUT_SECONDS
+        retries = LLM_MAX_RETRIES if retries is None else retries
+        client = self.model(model)
+        with self._lock:
+            self._metrics_for(model).calls += 1
+
+        for attempt in range(retries + 1):
+            start = time.perf_counter()
+            kind = None
+            try:
+                with self._slots:
+                    response = client.generate_content(prompt, request_options={'timeout': timeout})
+                text = response.text if response else None
+            except Exception as e:
+                kind = _error_kind(e)
+                text = None
+                error = e
+            elapsed = (time.perf_counter() - start) * 1000
+
+            with self._lock:
+                metrics = self._metrics_for(model)
+                metrics.total_ms += elapsed
+                metrics.observe(elapsed)
+                if kind is None:
+                    metrics.successes += 1
+                    usage = getattr(response, 'usage_metadata', None)
+                    metrics.prompt_tokens += getattr(usage, 'prompt_token_count', 0) or 0
+                    metrics.output_tokens += getattr(usage, 'candidates_token_count', 0) or 0
+                elif kind == 'rate_limit':
+                    metrics.rate_limited += 1
+                elif kind == 'transient':
+                    metrics.transient_errors += 1
+                else:
+                    metrics.errors += 1
+
+            if kind is None:
+                return text.strip() if text else None
+            if kind == 'error':
+                print(f"[LLM] {model} error: {error}")
+                return None
+            if attempt < retries:
+                delay = RETRY_BASE_DELAY * (2 ** attempt)  # 2, 4, 8 seconds
+                print(f"[LLM] {model} {kind.replace('_', ' ')}; retrying in {delay}s (attempt {attempt + 1}/{retries})")
+                with self._lock:
+                    self._metrics_for(model).retries += 1
+                time.sleep(delay)
+            else:
+                print(f"[LLM] {model} failed after {retries} retries: {error}")
+        return None
+
+    async def agenerate(self, prompt: str, model: str = CHAT_MODEL, timeout: float = None,
+                        retries: int = None) -> Optional[str]:
+        """generate() without blocking the event loop"""
+        if not self.available:
+            return None
+        return await asyncio.to_thread(self.generate, prompt, model, timeout, retries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'available': self.available,
+                'client': self.client_state,
+                'client_init_ms': self.client_init_ms,
+                'max_concurrency': self.max_concurrency,
+                'timeout_seconds': LLM_TIMEOUT_SECONDS,
+                'interactive_timeout_seconds': INTERACTIVE_TIMEOUT_SECONDS,
+                'interactive_max_retries': INTERACTIVE_MAX_RETRIES,
+                'models': {name: metrics.to_dict() for name, metrics in self._metrics.items()}
+            }
+
+
+llm_gateway = LLMGateway()
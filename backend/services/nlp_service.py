@@ -1,15 +1,10 @@
 import re
 import json
-import os
 from typing import List, Dict, Any, Optional
 from dotenv import load_dotenv
 
-try:
-    import google.generativeai as genai
-    GENAI_AVAILABLE = True
-except ImportError:
-    GENAI_AVAILABLE = False
-    genai = None
+from services.llm_gateway import llm_gateway, CHAT_MODEL, INTERACTIVE_TIMEOUT_SECONDS, INTERACTIVE_MAX_RETRIES
+from services.category_lexicon import learned_lexicon
 
 load_dotenv()
 
@@ -1126,6 +1121,16 @@ class ExpenseParser:
     
     def _categorize(self, description):
         description_lower = description.lower()
+        category = self.keyword_category(description_lower)
+        if category != 'Other':
+            return category
+        
+        # Items the model has categorized before stay on the fast path, but never override a keyword rule
+        return learned_lexicon.category_for(description_lower) or category
+    
+    def keyword_category(self, description):
+        """Category from the keyword rules alone; 'Other' when none applies"""
+        description_lower = description.lower()
         
         # Check existing categories first
         for category, keywords in self.categories.items():
@@ -1205,67 +1210,46 @@ class NLPService:
     def __init__(self):
         self.parser = ExpenseParser()
         self._setup_gemini()
-        # Initialize RAG service
-        try:
-            from services.rag_service import RAGService
-            self.rag_service = RAGService()
-        except Exception as e:
-            print(f"RAG Service initialization failed: {e}")
-            self.rag_service = None
+        # RAG service is built on first use; the regex fast path never needs it
+        self._rag_service = None
+        self._rag_service_failed = False
     
     def _setup_gemini(self):
-        """Setup Gemini AI with error handling"""
-        self.gemini_available = False
-        self.model = None
-        
-        if not GENAI_AVAILABLE:
-            print("WARNING: google-generativeai not installed")
-            return
-        
-        gemini_api_key = os.getenv("GEMINI_API_KEY")
-        if gemini_api_key and gemini_api_key.strip():
+        """Gemini calls go through the shared LLM gateway (the client loads on first use)"""
+        self.llm = llm_gateway
+        self.model_name = CHAT_MODEL
+        if self.gemini_available:
+            print(f"SUCCESS: Gemini API enabled ({self.model_name})")
+        else:
+            print("WARNING: Gemini API not available")
+    
+    @property
+    def gemini_available(self) -> bool:
+        return self.llm.available
+    
+    @property
+    def rag_service(self):
+        if self._rag_service is None and not self._rag_service_failed:
             try:
-                genai.configure(api_key=gemini_api_key)
-                # gemini-2.5-flash found to be more stable on free tier than 2.0-flash
-                self.model = genai.GenerativeModel('gemini-2.5-flash')
-                self.gemini_available = True
-                print("SUCCESS: Gemini API configured (gemini-2.5-flash)")
+                from services.rag_service import RAGService
+                self._rag_service = RAGService(keyword_category=self.parser.keyword_category)
             except Exception as e:
-                print(f"ERROR: Gemini API setup failed: {e}")
+                print(f"RAG Service initialization failed: {e}")
+                self._rag_service_failed = True
+        return self._rag_service
     
     def get_gemini_response(self, prompt: str) -> Optional[str]:
-        """Get response from Gemini with error handling and retries"""
-        if not self.model or not self.gemini_available:
+        """Get response from Gemini (retries, timeouts and metrics are handled by the gateway)"""
+        if not self.gemini_available:
             return None
-        
-        # Retry configuration
-        max_retries = 3
-        base_delay = 2
-        
-        import time
-        
-        for attempt in range(max_retries + 1):
-            try:
-                response = self.model.generate_content(prompt)
-                if response and response.text:
-                    return response.text.strip()
-            except Exception as e:
-                error_str = str(e).lower()
-                # Check for rate limit errors (429 or quota exceeded)
-                if '429' in error_str or 'quota' in error_str:
-                    if attempt < max_retries:
-                        delay = base_delay * (2 ** attempt) # Exponential backoff: 2, 4, 8 sent
-                        print(f"Gemini Rate Limit (429). Retrying in {delay}s... (Attempt {attempt+1}/{max_retries})")
-                        time.sleep(delay)
-                        continue
-                    else:
-                        print(f"Gemini Rate Limit Exceeded after {max_retries} retries.")
-                else:
-                    print(f"Gemini API error: {e}")
-                    # Non-retryable error
-                    break
-        
-        return None
+        return self.llm.generate(prompt, model=self.model_name)
+    
+    async def get_gemini_response_async(self, prompt: str) -> Optional[str]:
+        """get_gemini_response() without blocking the event loop, bounded for a waiting request"""
+        if not self.gemini_available:
+            return None
+        return await self.llm.agenerate(prompt, model=self.model_name, timeout=INTERACTIVE_TIMEOUT_SECONDS,
+                                        retries=INTERACTIVE_MAX_RETRIES)
     
     async def _ai_enhanced_parse(self, text):
         """Use AI to intelligently parse expense text"""
@@ -1327,7 +1311,7 @@ Example 2 - Ambiguous case (gift FROM someone):
 """
 
             
-            response = self.get_gemini_response(prompt)
+            response = await self.get_gemini_response_async(prompt)
             if response:
                 # Clean response and extract JSON
                 response = response.strip()
@@ -1376,6 +1360,17 @@ Example 2 - Ambiguous case (gift FROM someone):
             print(f"[AI_PARSE] Error: {e}")
             return None
     
+    def _learn_categories(self, regex_expenses, ai_expenses):
+        """Remember the model's category for items the regex parser could only file under Other"""
+        if len(regex_expenses) != len(ai_expenses):
+            return
+        decisions = {}
+        for regex_exp, ai_exp in zip(regex_expenses, ai_expenses):
+            if regex_exp.get('category', '').lower() == 'other' and not ai_exp.get('needs_confirmation'):
+                decisions[regex_exp.get('item', '')] = ai_exp.get('category', '')
+        if decisions:
+            learned_lexicon.learn_many(decisions)
+    
     def _preprocess_text(self, text):
         """Pre-process text to handle units like k, lakh, crore"""
         if not text:
@@ -1445,6 +1440,7 @@ Example 2 - Ambiguous case (gift FROM someone):
                 ai_result = await self._ai_enhanced_parse(text)
                 if ai_result and ai_result.get('expenses'):
                     print(f"[PARSE] AI successfully parsed {len(ai_result['expenses'])} expenses")
+                    self._learn_categories(expenses, ai_result['expenses'])
                     return ai_result
                 else:
                     print(f"[PARSE] AI parsing failed")
@@ -1558,6 +1554,9 @@ Example 2 - Ambiguous case (gift FROM someone):
         """Handle chat requests about expenses using RAG with Gemini"""
         try:
             from services.expense_analyzer import ExpenseAnalyzer
+            from services.dataset_cache import dataset_cache, dataset_scope
+            from services.aggregate_store import aggregate_store
+            from services.intent_router import intent_router
             
             analyzer = ExpenseAnalyzer()
             
@@ -1578,29 +1577,47 @@ Example 2 - Ambiguous case (gift FROM someone):
                 response = f"Hi {user_name}! You don't have any {context_type} expenses recorded yet. Start by adding some expenses to get insights!"
                 return {"reply": response}
             
+            # Reuse the frame (and its memoized analysis/context) for this dataset version;
+            # group members share the group's entry
+            scope = dataset_scope(request.user_id, request.group_name if is_group_mode else None)
+            frame = dataset_cache.get_frame(scope, table_data)
+            
+            # Analysis read from running aggregates kept apart from the signed-in users' and
+            # groups' scopes, which this unauthenticated request must not overwrite
+            analysis = aggregate_store.analysis(f"chat:{scope}", frame)
+            
+            # Numeric questions with a confident local answer skip the LLM round trip
+            decision = intent_router.route(request.text, analyzer, analysis, context_type, frame)
+            if decision.local:
+                intent_router.record(decision, 'local')
+                return {"reply": f"Hi {user_name}! {decision.result.text}"}
+            
             # Try RAG service first (enhanced with better context)
             if self.rag_service and self.rag_service.gemini_available:
                 print(f"[CHAT] Using RAG service for query: {request.text}")
-                rag_response = await self.rag_service.query_expenses(request.text, table_data, user_name)
+                rag_response = await self.rag_service.query_expenses(request.text, frame, user_name)
                 if rag_response:
                     print(f"[CHAT] RAG service provided response")
+                    intent_router.record(decision, 'llm')
                     return {"reply": rag_response}
                 else:
                     print(f"[CHAT] RAG service failed, trying legacy Gemini")
             
-            # Analyze expenses for fallback
-            analysis = analyzer.analyze_expenses(table_data)
-            
             # Try legacy Gemini RAG if RAG service unavailable
             if self.gemini_available and not (self.rag_service and self.rag_service.gemini_available):
                 print(f"[CHAT] Using legacy Gemini RAG")
-                gemini_response = await self._gemini_rag_query(request.text, table_data, analysis, user_name)
+                gemini_response = await self._gemini_rag_query(request.text, frame.rows, analysis, user_name)
                 if gemini_response:
+                    intent_router.record(decision, 'llm')
                     return {"reply": gemini_response}
             
             # Fallback to rule-based processing
             print(f"[CHAT] Using rule-based analyzer")
-            processed_response = analyzer.process_query(request.text, analysis, context_type, table_data)
+            intent_router.record(decision, 'fallback')
+            if decision.result is not None:
+                processed_response = decision.result.text
+            else:
+                processed_response = analyzer.process_query(request.text, analysis, context_type, frame)
             final_response = f"Hi {user_name}! {processed_response}"
             return {"reply": final_response}
             
@@ -1621,7 +1638,7 @@ Example 2 - Ambiguous case (gift FROM someone):
             # Get recent transactions
             recent_txns = expenses_data[:10] if len(expenses_data) > 10 else expenses_data
             transactions_text = "\n".join([
-                f"  - Rs.{txn.get('amount', 0)} on {txn.get('item', 'item')} ({txn.get('category', 'Other')}) on {txn.get('date', 'N/A')}"
+                f"  - Rs.{txn.amount} on {txn.item or 'item'} ({txn.category}) on {txn.date or 'N/A'}"
                 for txn in recent_txns
             ])
             
@@ -1655,7 +1672,7 @@ INSTRUCTIONS:
 Provide a helpful, accurate response:
 """
             
-            response = self.get_gemini_response(prompt)
+            response = await self.get_gemini_response_async(prompt)
             if response:
                 return response.strip()
             
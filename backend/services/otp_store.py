@@ -0,0 +1,243 @@
+import os
+import time
+import heapq
+import sqlite3
+import asyncio
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Any, Optional
+
+OTP_TTL_SECONDS = 600  # 10 minutes
+SWEEP_INTERVAL_SECONDS = float(os.getenv("OTP_SWEEP_INTERVAL", 60))
+# 'sqlite' (durable, shared by all workers on the host) or 'memory' (single process)
+OTP_BACKEND = os.getenv("OTP_STORE", "sqlite")
+# Relative paths are resolved against the backend directory, not the working directory
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OTP_DB_PATH = os.path.join(BACKEND_DIR, os.getenv("OTP_DB_PATH", "otp_store.db"))
+
+# verify() outcomes
+OTP_OK = 'ok'
+OTP_MISSING = 'missing'
+OTP_EXPIRED = 'expired'
+OTP_INVALID = 'invalid'
+
+
+class OTPStore(ABC):
+    """One-time codes keyed by email, each with an expiry time
+
+    Every operation touches one key, so its cost does not depend on how many
+    codes are outstanding. Handlers use the async a* methods, which move
+    blocking backends off the event loop.
+    """
+
+    # True when operations do file I/O and should run on a worker thread
+    blocking = False
+
+    @abstractmethod
+    def put(self, key: str, otp: str, ttl: float = OTP_TTL_SECONDS) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def verify(self, key: str, otp: str, now: float = None) -> str:
+        """Check a code and consume it on success (or on expiry); one of the OTP_* outcomes"""
+
+    @abstractmethod
+    def sweep(self, now: float = None) -> int:
+        """Drop expired codes; returns how many were removed"""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+    async def _run(self, fn, *args):
+        if self.blocking:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    async def aput(self, key: str, otp: str, ttl: float = OTP_TTL_SECONDS) -> Dict[str, Any]:
+        return await self._run(self.put, key, otp, ttl)
+
+    async def averify(self, key: str, otp: str) -> str:
+        return await self._run(self.verify, key, otp)
+
+    async def asweep(self) -> int:
+        return await self._run(self.sweep)
+
+
+class MemoryOTPStore(OTPStore):
+    """Dict of codes plus a min-heap of (expires, key) for sweeping
+
+    A replaced code leaves a stale heap entry behind; it is skipped when
+    popped because its expiry no longer matches the live record. Expired
+    heads are also trimmed on every put, so memory stays bounded even
+    without the background sweeper.
+    """
+
+    def __init__(self):
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self._expiry_heap: list = []
+        self._lock = threading.Lock()
+
+    def put(self, key: str, otp: str, ttl: float = OTP_TTL_SECONDS) -> Dict[str, Any]:
+        now = time.time()
+        record = {"otp": otp, "expires": now + ttl}
+        with self._lock:
+            self._records[key] = record
+            heapq.heappush(self._expiry_heap, (record["expires"], key))
+            self._sweep_locked(now)
+        return record
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            record = self._records.get(key)
+            return dict(record) if record else None
+
+    def verify(self, key: str, otp: str, now: float = None) -> str:
+        now = now or time.time()
+        with self._lock:
+            record = self._records.get(key)
+            if record is None:
+                return OTP_MISSING
+            if now > record["expires"]:
+                del self._records[key]
+                return OTP_EXPIRED
+            if record["otp"] != otp:
+                return OTP_INVALID
+            del self._records[key]
+            return OTP_OK
+
+    def _sweep_locked(self, now: float) -> int:
+        removed = 0
+        heap = self._expiry_heap
+        while heap and heap[0][0] < now:
+            expires, key = heapq.heappop(heap)
+            record = self._records.get(key)
+            if record is not None and record["expires"] == expires:
+                del self._records[key]
+                removed += 1
+        return removed
+
+    def sweep(self, now: float = None) -> int:
+        with self._lock:
+            return self._sweep_locked(now or time.time())
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+
+class SQLiteOTPStore(OTPStore):
+    """Codes in a SQLite table in WAL mode, shared by every worker on the host
+
+    WAL lets readers proceed while one writer commits; verify runs as a
+    single IMMEDIATE transaction so two workers can never both accept the
+    same code. Lookups use the primary key and sweeps the expiry index.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str = None):
+        self.path = path or OTP_DB_PATH
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS otps (email TEXT PRIMARY KEY, otp TEXT NOT NULL, expires REAL NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS otps_expires ON otps (expires)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread; autocommit mode with explicit transactions where needed
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def put(self, key: str, otp: str, ttl: float = OTP_TTL_SECONDS) -> Dict[str, Any]:
+        record = {"otp": otp, "expires": time.time() + ttl}
+        self._conn().execute("INSERT OR REPLACE INTO otps (email, otp, expires) VALUES (?, ?, ?)",
+                             (key, otp, record["expires"]))
+        return record
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT otp, expires FROM otps WHERE email = ?", (key,)).fetchone()
+        return {"otp": row[0], "expires": row[1]} if row else None
+
+    def verify(self, key: str, otp: str, now: float = None) -> str:
+        now = now or time.time()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT otp, expires FROM otps WHERE email = ?", (key,)).fetchone()
+            if row is None:
+                outcome = OTP_MISSING
+            elif now > row[1]:
+                outcome = OTP_EXPIRED
+            elif row[0] != otp:
+                outcome = OTP_INVALID
+            else:
+                outcome = OTP_OK
+            if outcome in (OTP_EXPIRED, OTP_OK):
+                conn.execute("DELETE FROM otps WHERE email = ?", (key,))
+            conn.execute("COMMIT")
+            return outcome
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def sweep(self, now: float = None) -> int:
+        cursor = self._conn().execute("DELETE FROM otps WHERE expires < ?", (now or time.time(),))
+        return cursor.rowcount
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM otps").fetchone()[0]
+
+
+def create_otp_store(backend: str = None) -> OTPStore:
+    backend = (backend or OTP_BACKEND).lower()
+    if backend == 'sqlite':
+        try:
+            return SQLiteOTPStore()
+        except Exception as e:
+            # e.g. a read-only filesystem on serverless hosts
+            print(f"[OTP] SQLite store unavailable ({e}); using in-memory store")
+    return MemoryOTPStore()
+
+
+class OTPSweeper:
+    """Background task that drops expired codes every SWEEP_INTERVAL_SECONDS"""
+
+    def __init__(self, store: OTPStore, interval: float = None):
+        self.store = store
+        self.interval = interval or SWEEP_INTERVAL_SECONDS
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                removed = await self.store.asweep()
+                if removed:
+                    print(f"[OTP] Swept {removed} expired codes")
+            except Exception as e:
+                print(f"[OTP] Sweep failed: {e}")
+
+
+otp_store = create_otp_store()
+otp_sweeper = OTPSweeper(otp_store)
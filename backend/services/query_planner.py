@@ -0,0 +1,476 @@
+import re
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+from services.expense_frame import ExpenseFrame
+from services.date_index import DateIndex
+from services.rollup_engine import RollupCube
+from services.counterparty_ledger import CounterpartyLedger
+from services.settlement import GroupSettlement
+from utils.text_match import mentions, mentions_any
+
+# Words that select a metric, in the order they are tried
+METRIC_TRIGGERS = [
+    ('income', ['income', 'salary', 'earn', 'earned', 'earning', 'received', 'got']),
+    ('loan', ['loan', 'lend', 'lent', 'borrow', 'owe', 'debt', 'udhar', 'own', 'payable', 'receiveable']),
+    ('total', ['total', 'all', 'overall', 'everything', 'entire', 'whole']),
+    ('spend', ['spent', 'expense', 'much']),
+    ('breakdown', ['category', 'breakdown', 'categories', 'distribution']),
+    ('recent', ['recent', 'last', 'latest']),
+    ('average', ['average', 'daily', 'per day']),
+    ('top', []),
+    ('count', ['how many', 'count', 'number']),
+    ('who_paid', ['who paid', 'who payed', 'paid by', 'payed by']),
+    ('help', ['help', 'what can', 'options']),
+    ('balance', ['balance', 'net', 'left', 'remaining', 'save', 'saved']),
+]
+
+COMPARISON_WORDS = ['vs', 'versus', 'compare']
+# A comparison is answered locally only between periods ("this month vs last month")
+COMPARISON_PERIOD_WORDS = ['month', 'week', 'monthly', 'weekly']
+SETTLE_WORDS = ['settle', 'settlement', 'who should pay', 'who pays whom', 'who owes whom', 'split the bill', 'square up']
+DETAIL_WORDS = ['detail', 'breakdown', 'who', 'everyone', 'person', 'list', 'each']
+SO_FAR_WORDS = ['till now', 'so far', 'upto now', 'up to now']
+# "show me my food expenses" asks for food, not for the entertainment keyword "show"
+REQUEST_PHRASE_RE = re.compile(r'\b(?:show|tell|give|list)\s+(?:me|us|my|all)\b')
+
+
+class QueryIntent:
+    """A chat question parsed once: what to compute, over which slice, grouped how"""
+
+    __slots__ = ('query', 'metrics', 'start_date', 'end_date', 'period_name', 'categories',
+                 'category_source', 'items', 'item_fallback', 'counterparties', 'grouping',
+                 'comparison_grain', 'wants_details', 'so_far', 'signals')
+
+    def __init__(self, query: str):
+        self.query = query
+        self.metrics: List[str] = []
+        self.start_date: Optional[datetime] = None
+        self.end_date: Optional[datetime] = None
+        self.period_name: Optional[str] = None
+        self.categories: List[str] = []
+        # 'name' if a category was named, 'keyword' if only one of its keywords was
+        self.category_source: Optional[str] = None
+        self.items: List[str] = []
+        self.item_fallback: Optional[str] = None
+        self.counterparties: List[str] = []
+        self.grouping: Optional[str] = None
+        self.comparison_grain: Optional[str] = None
+        self.wants_details = False
+        self.so_far = False
+        # Metrics the question's own words asked for (how sure a local answer can be)
+        self.signals: List[str] = []
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {name: getattr(self, name) for name in self.__slots__}
+        for name in ('start_date', 'end_date'):
+            if data[name] is not None:
+                data[name] = data[name].isoformat()
+        return data
+
+    def __repr__(self):
+        return f"QueryIntent(metrics={self.metrics}, period={self.period_name!r}, categories={self.categories}, items={self.items})"
+
+
+class QueryResult:
+    """The metric that answered a question, its numbers and the reply sentence"""
+
+    __slots__ = ('intent', 'metric', 'value', 'text')
+
+    def __init__(self, intent: QueryIntent, metric: str, value: Dict[str, Any], text: str):
+        self.intent = intent
+        self.metric = metric
+        self.value = value
+        self.text = text
+
+    def to_dict(self) -> Dict[str, Any]:
+        value = {k: v for k, v in self.value.items() if k != 'expenses'}
+        return {'metric': self.metric, 'value': value, 'text': self.text, 'intent': self.intent.to_dict()}
+
+
+class _Scope:
+    """The rows a question is about: the whole dataset or its date-range slice
+
+    For a date range, totals come from the date index's prefix sums; the
+    slice and its analysis are only built when a handler needs the rows.
+    """
+
+    def __init__(self, frame: Optional[ExpenseFrame], analysis: Dict[str, Any], context: str,
+                 time_context: str = "", period: tuple = None, analyzer=None):
+        self.source_frame = frame
+        self.source_analysis = analysis
+        self.context = context
+        self.time_context = time_context
+        self.period = period
+        self.analyzer = analyzer
+        self._frame = frame if period is None else None
+        self._analysis = analysis if period is None else None
+
+    @property
+    def frame(self) -> Optional[ExpenseFrame]:
+        if self._frame is None and self.period is not None:
+            self._frame = self.source_frame.take(DateIndex.of(self.source_frame).mask(*self.period))
+        return self._frame
+
+    @property
+    def analysis(self) -> Dict[str, Any]:
+        if self._analysis is None:
+            self._analysis = self.analyzer.analyze_expenses(self.frame)
+        return self._analysis
+
+    @property
+    def totals(self) -> Dict[str, Any]:
+        """Expense, income and loan totals and counts"""
+        if self.period is None:
+            return self.analysis
+        return DateIndex.of(self.source_frame).totals(*self.period)
+
+
+class QueryPlanner:
+    """Parses chat questions into QueryIntents and answers them from indexed data
+
+    Planning reads only the query (plus the dataset's vocabulary of
+    counterparties). Execution slices the frame once through the date index
+    and then tries the intent's metrics in priority order against the
+    memoized analysis, trigram index and counterparty ledger, so a question
+    costs one indexed pass instead of a scan per matched branch.
+    """
+
+    def __init__(self, analyzer):
+        self.analyzer = analyzer
+        self.handlers = {
+            'settle': self._answer_settle,
+            'item': self._answer_item,
+            'category': self._answer_category,
+            'income': self._answer_income,
+            'loan': self._answer_loan,
+            'total': self._answer_total,
+            'spend': self._answer_spend,
+            'breakdown': self._answer_breakdown,
+            'recent': self._answer_recent,
+            'average': self._answer_average,
+            'top': self._answer_top,
+            'count': self._answer_count,
+            'who_paid': self._answer_who_paid,
+            'help': self._answer_help,
+            'balance': self._answer_balance,
+            'summary': self._answer_summary,
+        }
+
+    # ---------- Planning ----------
+
+    def plan(self, query: str, frame: Optional[ExpenseFrame] = None, context: str = "personal") -> QueryIntent:
+        """Parse a question into a QueryIntent"""
+        query_lower = query.lower()
+        intent = QueryIntent(query)
+
+        comparing = mentions_any(query_lower, COMPARISON_WORDS)
+        if frame is not None and comparing and mentions_any(query_lower, COMPARISON_PERIOD_WORDS):
+            intent.metrics = ['comparison']
+            intent.signals = ['comparison']
+            intent.comparison_grain = 'week' if mentions_any(query_lower, ['week', 'weekly']) else 'month'
+            intent.grouping = 'period'
+            return intent
+        if comparing:
+            # Comparing items or categories needs reasoning; recorded so the router defers
+            intent.signals.append('comparison')
+
+        intent.start_date, intent.end_date, intent.period_name = self.analyzer.extract_time_period(query_lower)
+
+        # Settling up is a group question; personal mode answers per counterparty instead
+        if frame is not None and context != 'personal' and mentions_any(query_lower, SETTLE_WORDS):
+            intent.metrics.append('settle')
+            intent.signals.append('settle')
+            intent.grouping = 'counterparty'
+
+        if frame is not None:
+            intent.items, intent.item_fallback = self.analyzer.extract_item_keywords(query_lower)
+            intent.metrics.append('item')
+            intent.counterparties = CounterpartyLedger.of(frame).mentioned_in(query_lower)
+
+        # Categories named in the query; the data's own category names are resolved at execution
+        named = [c for c in self.analyzer.categories if mentions(query_lower, c)]
+        keyword_text = REQUEST_PHRASE_RE.sub(' ', query_lower)
+        intent.categories = [c for c, keywords in self.analyzer.categories.items()
+                             if c in named or mentions_any(keyword_text, keywords)]
+        if intent.categories:
+            intent.category_source = 'name' if named else 'keyword'
+        intent.metrics.append('category')
+
+        for metric, words in METRIC_TRIGGERS:
+            if metric == 'top':
+                matched = mentions(query_lower, 'most') and mentions_any(query_lower, ['spent', 'expensive'])
+            else:
+                matched = mentions_any(query_lower, words)
+            if matched:
+                intent.metrics.append(metric)
+                intent.signals.append(metric)
+        intent.metrics.append('summary')
+
+        intent.wants_details = mentions_any(query_lower, DETAIL_WORDS)
+        intent.so_far = mentions_any(query_lower, SO_FAR_WORDS)
+        if 'breakdown' in intent.metrics:
+            intent.grouping = 'category'
+        elif 'loan' in intent.metrics and intent.wants_details and not intent.grouping:
+            intent.grouping = 'counterparty'
+        return intent
+
+    # ---------- Execution ----------
+
+    def execute(self, intent: QueryIntent, analysis: Dict[str, Any], context: str = "personal",
+                frame: Optional[ExpenseFrame] = None) -> QueryResult:
+        """Answer a planned question against the dataset"""
+        if intent.metrics == ['comparison']:
+            comparison = RollupCube.of(frame).compare(intent.comparison_grain)
+            return QueryResult(intent, 'comparison', comparison, self.analyzer._describe_comparison(comparison))
+
+        if intent.start_date and frame is not None:
+            if not DateIndex.of(frame).count(intent.start_date, intent.end_date):
+                return QueryResult(intent, 'period_empty', {'total': 0, 'count': 0},
+                                   f"You haven't spent anything in {intent.period_name}.")
+            scope = _Scope(frame, analysis, context, f" in {intent.period_name}",
+                           (intent.start_date, intent.end_date), self.analyzer)
+        else:
+            scope = _Scope(frame, analysis, context)
+        for metric in intent.metrics:
+            answer = self.handlers[metric](intent, scope)
+            if answer is not None:
+                value, text = answer
+                return QueryResult(intent, metric, value, text)
+
+    def answer(self, query: str, analysis: Dict[str, Any], context: str = "personal",
+               frame: Optional[ExpenseFrame] = None) -> QueryResult:
+        return self.execute(self.plan(query, frame, context), analysis, context, frame)
+
+    # ---------- Metric handlers: (value, text) or None to fall through ----------
+
+    def _answer_settle(self, intent: QueryIntent, scope: _Scope):
+        settlement = GroupSettlement.of(scope.frame)
+        return settlement.to_dict(), settlement.describe(f"{scope.context}{scope.time_context}")
+
+    def _answer_item(self, intent: QueryIntent, scope: _Scope):
+        keywords = intent.items
+        if not keywords:
+            # An item missing from the whole dataset is missing from any slice of it
+            if not intent.item_fallback or not self.analyzer.has_item_named(intent.item_fallback, scope.source_frame):
+                return None
+            if scope.period is not None and not self.analyzer.has_item_named(intent.item_fallback, scope.frame):
+                return None
+            keywords = [intent.item_fallback]
+
+        item_result = self.analyzer.match_items(keywords, scope.frame, whole_words=True)
+        # Some of the things asked about are not items ("groceries and rent"); the category answer may know them
+        if not item_result or len(item_result['keywords']) < len(keywords):
+            return None
+        item_name = item_result['item_name'].title()
+        total = item_result['total_amount']
+        count = item_result['count']
+
+        if count == 1:
+            expense = item_result['expenses'][0]
+            date_info = f" on {expense.date}" if expense.date else ""
+            paid_by = f" (paid by {expense.paid_by})" if expense.paid_by else ""
+            return item_result, f"You spent Rs.{total} on {item_name}{date_info}{paid_by}{scope.time_context}."
+        return item_result, f"You spent Rs.{total} on {item_name} across {count} transactions{scope.time_context}."
+
+    def _answer_category(self, intent: QueryIntent, scope: _Scope):
+        query_lower = intent.query.lower()
+        # A slice only holds categories the whole dataset has
+        if not intent.categories and not any(mentions(query_lower, c) for c in scope.source_analysis['categories']):
+            return None
+        analysis, time_context = scope.analysis, scope.time_context
+
+        # Actual categories from the data first, then the predefined keywords
+        matched_categories = [c for c in analysis['categories'] if mentions(query_lower, c)]
+        matched_by = 'name' if matched_categories else intent.category_source
+        matched_categories += [c for c in intent.categories if c not in matched_categories]
+        if not matched_categories:
+            return None
+
+        # Transaction counts per category (positive amounts only)
+        frame = scope.frame
+        category_counts = frame.category_counts(frame.amounts > 0) if frame is not None else {}
+
+        if len(matched_categories) > 1:
+            total_amount = 0
+            total_count = 0
+            category_details = []
+            breakdown = {}
+
+            for cat in matched_categories:
+                amount = analysis['categories'].get(cat, 0)
+                if amount > 0:
+                    count = category_counts.get(cat, 0)
+                    total_amount += amount
+                    total_count += count
+                    breakdown[cat] = {'total': amount, 'count': count}
+                    category_details.append(f"{cat.title()}: Rs.{amount} ({count} txn)")
+
+            if not category_details:
+                return None
+            categories_str = " and ".join(matched_categories)
+            details_str = ", ".join(category_details)
+            value = {'total': total_amount, 'count': total_count, 'categories': breakdown, 'matched_by': matched_by}
+            return value, f"You've spent Rs.{total_amount} on {categories_str} across {total_count} transactions{time_context}. Breakdown: {details_str}."
+
+        category = matched_categories[0]
+        amount = analysis['categories'].get(category, 0)
+        if amount > 0:
+            cat_count = category_counts.get(category, 0)
+            value = {'category': category, 'total': amount, 'count': cat_count, 'matched_by': matched_by}
+            if cat_count > 1:
+                return value, f"You've spent Rs.{amount} on {category} across {cat_count} transactions{time_context}."
+            return value, f"You've spent Rs.{amount} on {category}{time_context}."
+
+        value = {'category': category, 'total': 0, 'count': 0, 'matched_by': matched_by}
+        if analysis['total'] > 0:
+            top_cat = analysis['top_categories'][0][0] if analysis['top_categories'] else 'other categories'
+            return value, f"You haven't spent anything on {category}{time_context}. Your main spending has been on {top_cat} (Rs.{analysis['top_categories'][0][1] if analysis['top_categories'] else 0})."
+        return value, f"You haven't spent anything on {category}{time_context}."
+
+    def _answer_income(self, intent: QueryIntent, scope: _Scope):
+        analysis = scope.analysis
+        value = {'total_income': analysis.get('total_income', 0), 'income_count': analysis.get('income_count', 0),
+                 'net_balance': analysis.get('net_balance', 0)}
+        if analysis.get('total_income', 0) > 0:
+            return value, f"Your total income{scope.time_context}: Rs.{analysis['total_income']} across {analysis['income_count']} transactions. Net balance: Rs.{analysis['net_balance']} ({'surplus' if analysis['net_balance'] >= 0 else 'deficit'})."
+        return value, f"No income recorded{scope.time_context}."
+
+    def _answer_loan(self, intent: QueryIntent, scope: _Scope):
+        analysis, frame, time_context = scope.analysis, scope.frame, scope.time_context
+        ledger = CounterpartyLedger.of(frame) if frame is not None else CounterpartyLedger()
+
+        # Specific people first, limited to those with loans in this slice
+        mentioned = [ledger.get(key) for key in intent.counterparties if ledger.get(key)]
+        if mentioned:
+            people_stats = {entry['name'].title(): entry['given'] - entry['taken'] for entry in mentioned}
+            people_status = [f"{entry['name'].title()}: {ledger.status(entry['given'], entry['taken'])}" for entry in mentioned]
+            return {'counterparties': people_stats}, f"Loan status for {', '.join(people_stats)}: {'; '.join(people_status)}."
+
+        given = analysis.get('total_loans_given', 0)
+        received = analysis.get('total_loans_received', 0)
+        net_loan = analysis.get('net_loan', 0)
+        value = {'total_loans_given': given, 'total_loans_received': received, 'net_loan': net_loan}
+
+        if given == 0 and received == 0:
+            return value, f"No loan transactions found{time_context}."
+
+        if intent.wants_details and ledger.entries:
+            details = [f"{entry['name'].title()}: {ledger.status(entry['given'], entry['taken'])}" for entry in ledger.entries.values()]
+            value['counterparties'] = ledger.balances()
+            return value, f"Loan Details{time_context}:\n" + "\n".join(details)
+
+        parts = []
+        if given > 0:
+            parts.append(f"Given: Rs.{given} ({analysis.get('loan_given_count', 0)} txn)")
+        if received > 0:
+            parts.append(f"Received: Rs.{received} ({analysis.get('loan_received_count', 0)} txn)")
+        parts.append(f"Net Position: Rs.{abs(net_loan)} ({'You are owed' if net_loan >= 0 else 'You owe'})")
+        return value, f"Loan Update{time_context}: " + "; ".join(parts) + "."
+
+    def _totals(self, analysis: Dict[str, Any]) -> Dict[str, Any]:
+        return {'total': analysis['total'], 'count': analysis['count'], 'total_income': analysis.get('total_income', 0)}
+
+    def _answer_total(self, intent: QueryIntent, scope: _Scope):
+        analysis = scope.totals
+        income_summary = f" Income: Rs.{analysis.get('total_income', 0)}." if analysis.get('total_income', 0) > 0 else ""
+        loan_summary = ""
+        if analysis.get('total_loans_given', 0) > 0 or analysis.get('total_loans_received', 0) > 0:
+            loan_summary = f" Loans: Given Rs.{analysis.get('total_loans_given', 0)}, Received Rs.{analysis.get('total_loans_received', 0)}."
+
+        base_response = f"You spent Rs.{analysis['total']} (excluding loans)"
+        value = self._totals(analysis)
+        if intent.period_name:
+            return value, f"{base_response} in {intent.period_name} across {analysis['count']} transactions.{income_summary}{loan_summary}"
+        if intent.so_far:
+            return value, f"{base_response} across {analysis['count']} transactions.{income_summary}{loan_summary}"
+        return value, f"{base_response} across {analysis['count']} transactions{scope.time_context}.{income_summary}{loan_summary}"
+
+    def _answer_spend(self, intent: QueryIntent, scope: _Scope):
+        analysis = scope.totals
+        income_info = f" Income: Rs.{analysis.get('total_income', 0)}." if analysis.get('total_income', 0) > 0 else ""
+        value = self._totals(analysis)
+        if intent.period_name:
+            return value, f"You spent Rs.{analysis['total']} in {intent.period_name} across {analysis['count']} transactions.{income_info}"
+        return value, f"You spent Rs.{analysis['total']} across {analysis['count']} transactions{scope.time_context}.{income_info}"
+
+    def _answer_breakdown(self, intent: QueryIntent, scope: _Scope):
+        analysis = scope.analysis
+        if not analysis['top_categories']:
+            return None
+        breakdown = []
+        for cat, amount in analysis['top_categories']:
+            percentage = (amount / analysis['total'] * 100) if analysis['total'] > 0 else 0
+            breakdown.append(f"• {cat.title()}: Rs.{amount} ({percentage:.1f}%)")
+        return {'categories': dict(analysis['top_categories'])}, f"Your {scope.context} expense breakdown:\n" + "\n".join(breakdown)
+
+    def _answer_recent(self, intent: QueryIntent, scope: _Scope):
+        analysis = scope.analysis
+        if not analysis['recent_expenses']:
+            return None
+        recent = []
+        for exp in analysis['recent_expenses'][:3]:
+            date_str = f" on {exp.date}" if exp.date else ""
+            recent.append(f"• Rs.{exp.amount} on {exp.item or 'item'} ({exp.category}){date_str}")
+        return {'expenses': analysis['recent_expenses'][:3]}, f"Your recent {scope.context} expenses:\n" + "\n".join(recent)
+
+    def _answer_average(self, intent: QueryIntent, scope: _Scope):
+        analysis = scope.analysis
+        income_avg = analysis.get('total_income', 0) / analysis['days_tracked'] if analysis['days_tracked'] > 0 and analysis.get('total_income', 0) > 0 else 0
+        income_info = f" Daily income average: Rs.{round(income_avg, 2)}." if income_avg > 0 else ""
+        value = {'average_per_day': analysis['average_per_day'], 'days_tracked': analysis['days_tracked']}
+        return value, f"Your average daily {scope.context} spending is Rs.{analysis['average_per_day']} over {analysis['days_tracked']} days.{income_info}"
+
+    def _answer_top(self, intent: QueryIntent, scope: _Scope):
+        analysis = scope.analysis
+        if not analysis['top_categories']:
+            return None
+        top_cat, top_amount = analysis['top_categories'][0]
+        return {'category': top_cat, 'total': top_amount}, f"You've spent the most on {top_cat.title()} with Rs.{top_amount} in your {scope.context} expenses."
+
+    def _answer_count(self, intent: QueryIntent, scope: _Scope):
+        analysis = scope.analysis
+        income_info = f" and {analysis.get('income_count', 0)} income transactions (Rs.{analysis.get('total_income', 0)})" if analysis.get('total_income', 0) > 0 else ""
+        return self._totals(analysis), f"You have {analysis['count']} expense transactions totaling Rs.{analysis['total']}{income_info} in your {scope.context} records."
+
+    def _answer_who_paid(self, intent: QueryIntent, scope: _Scope):
+        recent_expenses = scope.analysis['recent_expenses']
+        query_lower = intent.query.lower()
+        category_found = next((c for c in self.analyzer.categories if mentions(query_lower, c)), None)
+
+        if category_found:
+            category_expenses = [exp for exp in recent_expenses if exp.category_key == category_found]
+            if not category_expenses:
+                return {'category': category_found}, f"No recent {category_found} expenses found."
+            recent_with_payer = [exp for exp in category_expenses if exp.paid_by]
+            if not recent_with_payer:
+                return {'category': category_found}, f"I found recent {category_found} expenses but no payment information is recorded."
+            latest = recent_with_payer[0]
+            return {'category': category_found, 'expense': latest}, f"The last {category_found} expense was Rs.{latest.amount} for {latest.item or 'item'} paid by {latest.paid_by}."
+
+        recent_with_payer = [exp for exp in recent_expenses if exp.paid_by]
+        if not recent_with_payer:
+            return {}, "No recent expenses have payment information recorded."
+        latest = recent_with_payer[0]
+        return {'expense': latest}, f"The most recent expense with payment info: Rs.{latest.amount} for {latest.item or 'item'} paid by {latest.paid_by}."
+
+    def _answer_help(self, intent: QueryIntent, scope: _Scope):
+        return {}, "You can ask me about:\n• Total expenses ('What are my expenses till now?')\n• Income tracking ('What's my total income?')\n• Net balance ('What's my balance?')\n• Category breakdowns ('Show me my food expenses')\n• Recent transactions ('What are my recent expenses?')\n• Daily averages ('What's my daily spending?')\n• Comparisons ('What did I spend the most on?')\n• Who paid ('Who paid for grocery last time?')"
+
+    def _answer_balance(self, intent: QueryIntent, scope: _Scope):
+        analysis = scope.analysis
+        value = {'net_balance': analysis.get('net_balance', 0), 'total_income': analysis.get('total_income', 0), 'total': analysis['total']}
+        if analysis.get('total_income', 0) > 0:
+            return value, f"Your net balance{scope.time_context}: Rs.{analysis['net_balance']} ({'surplus' if analysis['net_balance'] >= 0 else 'deficit'}). Income: Rs.{analysis['total_income']}, Expenses: Rs.{analysis['total']}."
+        return value, f"No income data available to calculate balance. Total expenses: Rs.{analysis['total']}."
+
+    def _answer_summary(self, intent: QueryIntent, scope: _Scope):
+        analysis, time_context = scope.analysis, scope.time_context
+        income_info = f" Income: Rs.{analysis.get('total_income', 0)} ({analysis.get('income_count', 0)} txn)." if analysis.get('total_income', 0) > 0 else ""
+        value = self._totals(analysis)
+        if analysis['top_categories']:
+            top_category, top_amount = analysis['top_categories'][0]
+            percentage = (top_amount / analysis['total'] * 100) if analysis['total'] > 0 else 0
+            value['top_category'] = top_category
+            return value, f"You spent Rs.{analysis['total']}{time_context} across {analysis['count']} transactions. Top spending: {top_category.title()} (Rs.{top_amount}, {percentage:.1f}%).{income_info}"
+        return value, f"You spent Rs.{analysis['total']}{time_context} across {analysis['count']} transactions.{income_info}"
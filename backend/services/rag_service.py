@@ -1,47 +1,65 @@
-import os
-from typing import List, Dict, Any, Optional
+import re
+import json
+import time
+from typing import List, Dict, Any, Optional, Callable
+import numpy as np
 from dotenv import load_dotenv
-
-try:
-    import google.generativeai as genai
-    GENAI_AVAILABLE = True
-except ImportError:
-    GENAI_AVAILABLE = False
-    genai = None
+from services.expense_frame import ExpenseFrame, to_number
+from services.search_index import InvertedIndex, TrigramIndex, BM25Index
+from services.semantic_index import SemanticIndex
+from services.counterparty_ledger import CounterpartyLedger
+from services.context_builder import (ContextBuilder, ContextSection, MAX_LISTED_ROWS, TOP_ROWS,
+                                      month_subtotals, category_subtotals, top_rows)
+from services.llm_gateway import llm_gateway, RAG_MODEL, INTERACTIVE_TIMEOUT_SECONDS, INTERACTIVE_MAX_RETRIES
+from services.category_lexicon import learned_lexicon, normalize_item, canonical_category, KNOWN_CATEGORIES
 
 load_dotenv()
 
+# Transactions retrieved per question for the prompt
+RELEVANT_ROWS = 10
+# Look-alike item names shown next to an item match (context only, never in its total)
+MAX_SIMILAR_ITEMS = 8
+# Items sent to the model in one categorization prompt
+CATEGORIZE_BATCH_SIZE = 50
+
 class RAGService:
     """RAG (Retrieval Augmented Generation) service for intelligent expense queries"""
     
-    def __init__(self):
+    def __init__(self, keyword_category: Callable[[str], str] = None):
+        # The parser's keyword rules; only items they file under Other are learned
+        self.keyword_category = keyword_category
         self._setup_gemini()
     
     def _setup_gemini(self):
-        """Setup Gemini AI"""
-        self.gemini_available = False
-        self.model = None
-        
-        if not GENAI_AVAILABLE:
-            print("[X] RAG Service: google-generativeai not installed")
-            return
-        
-        gemini_api_key = os.getenv("GEMINI_API_KEY")
-        if gemini_api_key and gemini_api_key.strip():
-            try:
-                genai.configure(api_key=gemini_api_key)
-                self.model = genai.GenerativeModel('gemini-2.0-flash-exp')
-                self.gemini_available = True
-                print("[OK] RAG Service: Gemini configured")
-            except Exception as e:
-                print(f"[X] RAG Service: Gemini setup failed: {e}")
+        """Gemini calls go through the shared LLM gateway"""
+        self.llm = llm_gateway
+        self.model_name = RAG_MODEL
+        if self.gemini_available:
+            print(f"[OK] RAG Service: Gemini enabled ({self.model_name})")
+        else:
+            print("[X] RAG Service: Gemini not available")
+    
+    @property
+    def gemini_available(self) -> bool:
+        return self.llm.available
     
-    def _find_item_matches(self, query: str, expenses_data: List[Dict]) -> Dict[str, Any]:
-        """Find expenses matching specific items mentioned in the query"""
+    def _find_item_matches(self, query: str, expenses_data, semantic: bool = True,
+                           whole_words: bool = False) -> Dict[str, Any]:
+        """Find expenses matching specific items mentioned in the query
+
+        With semantic, synonyms of the items are matched too ("coffee" ->
+        latte) and look-alike item names are listed for the model, outside
+        the matched rows and their total. With whole_words a keyword must be
+        a word of the item or remarks; items that only contain it ("price"
+        for "rice") become look-alikes as well.
+        """
         if not query:
             return None
             
         query_lower = query.lower()
+        frame = ExpenseFrame.of(expenses_data)
+        index = TrigramIndex.of(frame)
+        similar = SemanticIndex.of(frame) if semantic else None
         
         # Extract potential item keywords from query
         item_keywords = []
@@ -70,175 +88,200 @@ class RAGService:
             for word in words:
                 if word not in stop_words and word not in aggregate_keywords and len(word) > 2:
                     # Check if this word matches any item in the data
-                    for expense in expenses_data:
-                        item = expense.get('item')
-                        if item and word in item.lower() and word not in item_keywords:
-                            item_keywords.append(word)
-                            break
+                    if word not in item_keywords and (index.item_contains(word) or (similar and similar.related_rows([word]).size)):
+                        item_keywords.append(word)
         
         if not item_keywords:
             return None
         
-        # Find matching expenses
-        matching_expenses = []
-        total_amount = 0
-        
-        for expense in expenses_data:
-            item_name = expense.get('item') or ''
-            remarks = expense.get('remarks') or ''
-            
-            # Check if any keyword matches item or remarks
-            for keyword in item_keywords:
-                if keyword in item_name.lower() or keyword in remarks.lower():
-                    matching_expenses.append(expense)
-                    total_amount += expense.get('amount', 0)
-                    break
+        # Find matching expenses (any keyword in item or remarks)
+        matches = InvertedIndex.of(frame).word_summary(item_keywords) if whole_words else index.keyword_summary(item_keywords)
+        rows = matches['rows']
+        total_amount = matches['total_amount']
+        if similar:
+            related = similar.related_rows(item_keywords)
+            if np.setdiff1d(related, rows).size:
+                rows = np.union1d(rows, related)
+                total_amount = to_number(frame.amounts[rows].sum())
         
-        if matching_expenses:
+        if rows.size:
+            matched = {frame.item_lower[i].strip() for i in rows}
+            look_alikes = []
+            if whole_words:
+                look_alikes = [frame.item_lower[i].strip() for i in np.setdiff1d(index.match_keywords(item_keywords), rows)
+                               if frame.item_lower[i].strip() not in matched]
+            if similar:
+                look_alikes += [item for keyword in item_keywords for item, _ in similar.search(keyword)
+                                if item not in matched]
             return {
                 'item_name': item_keywords[0],
                 'keywords': item_keywords,
+                'similar_items': list(dict.fromkeys(look_alikes))[:MAX_SIMILAR_ITEMS],
                 'total_amount': total_amount,
-                'count': len(matching_expenses),
-                'expenses': matching_expenses
+                'count': int(rows.size),
+                'rows': rows,
+                'expenses': [frame.rows[i] for i in rows]
             }
         
         return None
 
-    def _prepare_expense_context(self, expenses_data: List[Dict], query: str = None) -> str:
-        """Prepare structured expense data for RAG"""
+    def _prepare_expense_context(self, expenses_data, query: str = None, budget: int = None) -> str:
+        """Prepare structured expense data for RAG, within a token budget"""
         if not expenses_data:
             return "No expense data available."
         
-        # Check for item-specific query first
-        item_match = None
-        if query:
-            item_match = self._find_item_matches(query, expenses_data)
+        frame = ExpenseFrame.of(expenses_data)
+        builder = ContextBuilder(budget)
+        
+        # Query-independent sections are built once per dataset version
+        static_sections, recent_section = frame.memo('rag_static_context', lambda: self._static_context_sections(frame))
+        for section in static_sections:
+            builder.add(section)
         
+        # ITEM-SPECIFIC MATCHING (Critical for accurate item queries)
+        item_match = self._find_item_matches(query, frame, whole_words=True) if query else None
+        if item_match:
+            builder.add(self._item_match_section(frame, item_match))
+        
+        # Rows relevant to the question, or the most recent ones when nothing matches
+        exclude = item_match['rows'] if item_match else None
+        relevant_parts = self._relevant_transactions(frame, query, exclude) if query else None
+        if relevant_parts is not None:
+            builder.add(ContextSection('relevant', 4, [('full', relevant_parts), ('collapsed', relevant_parts[:6])]))
+        else:
+            builder.add(recent_section)
+        
+        context = builder.build()
+        print(f"[RAG] Context: {context.describe()}")
+        return context.text
+    
+    def _item_match_section(self, frame: ExpenseFrame, item_match: Dict[str, Any]) -> ContextSection:
+        """Every matching row when there are few, otherwise monthly/category subtotals and the largest rows"""
+        item_name = item_match['item_name'].title()
+        total_amt = item_match['total_amount']
+        count = item_match['count']
+        keywords = item_match.get('keywords', [item_match['item_name']])
+        rows = item_match['rows']
+        
+        header = [f"\n*** ITEM-SPECIFIC MATCH (IMPORTANT - USE THIS FOR ITEM QUERIES) ***",
+                  f"Query matches item keyword(s): {', '.join(keywords)}",
+                  f"Total spent on '{item_name}': Rs.{total_amt} across {count} transactions"]
+        if item_match.get('similar_items'):
+            header.append(f"Similar item names (NOT included in this total): {', '.join(item_match['similar_items'])}")
+        footer = [f"\n*** END ITEM-SPECIFIC MATCH ***"]
+        
+        def line(exp):
+            return f"  - Rs.{exp.amount} on {exp.item or 'item'} [{exp.category}] ({exp.date or 'N/A'})"
+        
+        full = None
+        if count <= MAX_LISTED_ROWS:
+            full = header + [f"\nAll matching transactions for '{item_name}':"] + [line(exp) for exp in item_match['expenses']] + footer
+        largest = top_rows(frame, rows)
+        collapsed = (header
+                     + [f"\nBy month:"] + month_subtotals(frame, rows)
+                     + [f"By category:"] + category_subtotals(frame, rows)
+                     + [f"\nLargest {largest.size} of {count} matching transactions:"] + [line(frame.rows[i]) for i in largest]
+                     + footer)
+        return ContextSection('item_match', 1, [('full', full), ('collapsed', collapsed), ('minimal', header + footer)],
+                              required=True)
+    
+    def _relevant_transactions(self, frame: ExpenseFrame, query: str, exclude=None) -> Optional[List[str]]:
+        """Top BM25 matches for the query outside the excluded rows as context lines (None if no row matches)"""
+        start = time.perf_counter()
+        rows = BM25Index.of(frame).top_k(query, RELEVANT_ROWS, exclude)
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"[RAG] BM25 retrieval: {len(rows)} rows in {elapsed:.1f}ms")
+        if not rows:
+            # Rows already listed in the item match count as matches
+            return [] if exclude is not None and exclude.size else None
+        
+        parts = ["\nRelevant Transactions (best matches for the question):"]
+        for i in rows:
+            exp = frame.rows[i]
+            paid_info = f" (paid by {exp.paid_by})" if exp.paid_by else ""
+            parts.append(f"  Rs.{exp.amount} - {exp.item or 'item'} [{exp.category}] on {exp.date or 'N/A'}{paid_info}")
+        return parts
+    
+    def _static_context_sections(self, frame: ExpenseFrame) -> tuple:
+        """Summary, category and loan sections plus recent transactions (query-independent)"""
         # Separate expenses, income, and loans
-        expenses = [e for e in expenses_data if e.get('amount', 0) > 0 and (e.get('category') or '').lower() not in ['income', 'loan']]
-        income = [e for e in expenses_data if (e.get('category') or '').lower() == 'income' or (e.get('amount', 0) < 0 and (e.get('category') or '').lower() != 'loan')]
-        loans = [e for e in expenses_data if (e.get('category') or '').lower() == 'loan']
+        expenses = frame.expense_mask()
+        income = frame.is_income_category | ((frame.amounts < 0) & ~frame.is_loan)
         
-        # Build context
-        context_parts = []
+        sections = []
         
         # Summary stats (excluding loans from expenses/income)
-        total_expense = sum(e.get('amount', 0) for e in expenses)
-        total_income = sum(abs(e.get('amount', 0)) for e in income)
+        total_expense = frame.total(expenses)
+        total_income = frame.total(income, absolute=True)
         net_balance = total_income - total_expense
         
-        context_parts.append(f"Total Expenses (excluding loans): Rs.{total_expense}")
-        context_parts.append(f"Total Income: Rs.{total_income}")
-        context_parts.append(f"Net Balance (Income - Expenses): Rs.{net_balance}")
-        context_parts.append(f"Savings Rate: {int((net_balance/total_income*100) if total_income > 0 else 0)}%")
+        summary = [f"Total Expenses (excluding loans): Rs.{total_expense}",
+                   f"Total Income: Rs.{total_income}",
+                   f"Net Balance (Income - Expenses): Rs.{net_balance}",
+                   f"Savings Rate: {int((net_balance/total_income*100) if total_income > 0 else 0)}%"]
+        sections.append(ContextSection('summary', 0, [('full', summary)], required=True))
         
         # Category breakdown
-        categories = {}
-        for exp in expenses:
-            cat = exp.get('category', 'Other')
-            categories[cat] = categories.get(cat, 0) + exp.get('amount', 0)
+        categories = frame.category_totals(expenses, lowercase=False)
+        category_counts = frame.category_counts(expenses, lowercase=False)
         
         if categories:
-            context_parts.append("\nCategory Breakdown:")
-            for cat, amt in sorted(categories.items(), key=lambda x: x[1], reverse=True):
-                count = len([e for e in expenses if e.get('category') == cat])
-                context_parts.append(f"  {cat}: Rs.{amt} ({count} transactions)")
+            lines = [f"  {cat}: Rs.{amt} ({category_counts[cat]} transactions)"
+                     for cat, amt in sorted(categories.items(), key=lambda x: x[1], reverse=True)]
+            collapsed = None
+            if len(lines) > TOP_ROWS:
+                rest = sorted(categories.items(), key=lambda x: x[1], reverse=True)[TOP_ROWS:]
+                rest_total = to_number(round(sum(amt for _, amt in rest), 2))
+                rest_count = sum(category_counts[cat] for cat, _ in rest)
+                collapsed = ["\nCategory Breakdown:"] + lines[:TOP_ROWS] + [f"  {len(rest)} other categories: Rs.{rest_total} ({rest_count} transactions)"]
+            sections.append(ContextSection('categories', 3, [('full', ["\nCategory Breakdown:"] + lines),
+                                                             ('collapsed', collapsed)]))
         
-        # Loan breakdown by person (already filtered above)
-        if loans:
-            context_parts.append("\nLoan Details by Person:")
-            person_loans = {}
-            for loan in loans:
-                person = loan.get('paid_by', '').lower().strip()
-                amt = loan.get('amount', 0)
-                print(f"[RAG DEBUG] Loan: person={person}, amount={amt}, item={loan.get('item')}")
-                
-                if person:
-                    # Normalize: remove common variations and use fuzzy matching
-                    person_clean = person.replace('s', '').replace('n', '')[:3]
-                    
-                    # Find existing similar person
-                    person_normalized = None
-                    for existing_key in person_loans.keys():
-                        existing_clean = existing_key.replace('s', '').replace('n', '')[:3]
-                        if person_clean == existing_clean:
-                            person_normalized = existing_key
-                            break
-                    
-                    if not person_normalized:
-                        person_normalized = person
-                    
-                    if person_normalized not in person_loans:
-                        person_loans[person_normalized] = {'given': 0, 'taken': 0, 'original_name': person}
-                    else:
-                        # Update original name to most recent
-                        person_loans[person_normalized]['original_name'] = person
-                    
-                    if amt > 0:
-                        person_loans[person_normalized]['given'] += amt
-                    else:
-                        person_loans[person_normalized]['taken'] += abs(amt)
-            
-            for person_key, amounts in person_loans.items():
-                person_name = amounts['original_name'].title()
-                given = amounts['given']
-                taken = amounts['taken']
-                
-                print(f"[RAG CALC] Person: {person_name} (key={person_key}), Given: {given}, Taken: {taken}, Net: {taken-given if taken>given else given-taken}")
+        # Loan breakdown by person from the counterparty ledger
+        ledger = CounterpartyLedger.of(frame)
+        if ledger.entries:
+            def loan_line(entry):
+                person_name = entry['name'].title()
+                given = entry['given']
+                taken = entry['taken']
                 
                 if taken > given:
                     # You took more than you gave back = You owe them
                     net_owed = taken - given
-                    context_parts.append(f"  {person_name}: Borrowed Rs.{taken} from them, Repaid Rs.{given} = YOU OWE Rs.{net_owed}")
+                    return f"  {person_name}: Borrowed Rs.{taken} from them, Repaid Rs.{given} = YOU OWE Rs.{net_owed}"
                 elif given > taken:
                     # You gave more than you took = They owe you
                     net_owed = given - taken
-                    context_parts.append(f"  {person_name}: Lent Rs.{given} to them, Received back Rs.{taken} = THEY OWE Rs.{net_owed}")
-                else:
-                    context_parts.append(f"  {person_name}: Settled (borrowed Rs.{taken}, repaid Rs.{given})")
-        
-        # ITEM-SPECIFIC MATCHING (Critical for accurate item queries)
-        if item_match:
-            item_name = item_match['item_name'].title()
-            total_amt = item_match['total_amount']
-            count = item_match['count']
-            keywords = item_match.get('keywords', [item_match['item_name']])
-            
-            context_parts.append(f"\n*** ITEM-SPECIFIC MATCH (IMPORTANT - USE THIS FOR ITEM QUERIES) ***")
-            context_parts.append(f"Query matches item keyword(s): {', '.join(keywords)}")
-            context_parts.append(f"Total spent on '{item_name}': Rs.{total_amt} across {count} transactions")
-            context_parts.append(f"\nAll matching transactions for '{item_name}':")
+                    return f"  {person_name}: Lent Rs.{given} to them, Received back Rs.{taken} = THEY OWE Rs.{net_owed}"
+                return f"  {person_name}: Settled (borrowed Rs.{taken}, repaid Rs.{given})"
             
-            for exp in item_match['expenses']:
-                amt = exp.get('amount', 0)
-                item = exp.get('item', 'item')
-                cat = exp.get('category', 'Other')
-                date = exp.get('date', 'N/A')
-                context_parts.append(f"  - Rs.{amt} on {item} [{cat}] ({date})")
+            entries = list(ledger.entries.values())
+            owed_to_you = sum(e['given'] - e['taken'] for e in entries if e['given'] > e['taken'])
+            you_owe = sum(e['taken'] - e['given'] for e in entries if e['taken'] > e['given'])
+            totals = f"  Across {len(entries)} people: THEY OWE Rs.{owed_to_you} in total, YOU OWE Rs.{you_owe} in total"
             
-            context_parts.append(f"\n*** END ITEM-SPECIFIC MATCH ***")
+            full = ["\nLoan Details by Person:"] + [loan_line(e) for e in entries] if len(entries) <= MAX_LISTED_ROWS else None
+            largest = sorted(entries, key=lambda e: abs(e['given'] - e['taken']), reverse=True)[:TOP_ROWS]
+            collapsed = (["\nLoan Details by Person (largest balances):"] + [loan_line(e) for e in largest] + [totals]
+                         if len(entries) > len(largest) else None)
+            sections.append(ContextSection('loans', 2, [('full', full), ('collapsed', collapsed),
+                                                        ('minimal', ["\nLoan Details by Person:", totals])]))
         
         # Recent transactions (last 15)
-        recent = expenses_data[:15]
+        recent = frame.rows[:15]
+        recent_parts = []
         if recent:
-            context_parts.append("\nRecent Transactions:")
+            recent_parts.append("\nRecent Transactions:")
             for exp in recent:
-                amt = exp.get('amount', 0)
-                item = exp.get('item', 'item')
-                cat = exp.get('category', 'Other')
-                date = exp.get('date', 'N/A')
-                paid_by = exp.get('paid_by', '')
-                
-                paid_info = f" (paid by {paid_by})" if paid_by else ""
-                context_parts.append(f"  Rs.{amt} - {item} [{cat}] on {date}{paid_info}")
+                paid_info = f" (paid by {exp.paid_by})" if exp.paid_by else ""
+                recent_parts.append(f"  Rs.{exp.amount} - {exp.item or 'item'} [{exp.category}] on {exp.date or 'N/A'}{paid_info}")
+        recent_section = ContextSection('recent', 5, [('full', recent_parts), ('collapsed', recent_parts[:6])])
         
-        context_str = "\n".join(context_parts)
-        return context_str
+        return sections, recent_section
     
-    async def query_expenses(self, query: str, expenses_data: List[Dict], user_name: str = "there") -> Optional[str]:
+    async def query_expenses(self, query: str, expenses_data, user_name: str = "there") -> Optional[str]:
         """Query expenses using RAG with Gemini"""
-        if not self.gemini_available or not self.model:
+        if not self.gemini_available:
             return None
         
         try:
@@ -262,7 +305,7 @@ INSTRUCTIONS:
    use ONLY that section to answer questions about that specific item. It contains:
    - The exact total amount spent on that item
    - The exact number of transactions
-   - All matching transactions
+   - The matching transactions (or, when there are many, subtotals by month and category plus the largest ones)
    Report both the total amount AND the transaction count from this section.
 5. If asked about multiple categories (e.g., "food and grocery"), combine totals
 6. For LOAN queries:
@@ -282,11 +325,8 @@ INSTRUCTIONS:
 Provide a helpful response:"""
             
             # Get Gemini response
-            response = self.model.generate_content(prompt)
-            if response and response.text:
-                return response.text.strip()
-            
-            return None
+            return await self.llm.agenerate(prompt, model=self.model_name, timeout=INTERACTIVE_TIMEOUT_SECONDS,
+                                            retries=INTERACTIVE_MAX_RETRIES)
             
         except Exception as e:
             print(f"[RAG] Query error: {e}")
@@ -294,25 +334,53 @@ Provide a helpful response:"""
     
     async def smart_categorize(self, item_description: str) -> Optional[str]:
         """Use Gemini to intelligently categorize an expense"""
-        if not self.gemini_available or not self.model:
-            return None
+        categories = await self.categorize_batch([item_description])
+        return categories.get(normalize_item(item_description))
+    
+    async def categorize_batch(self, items: List[str]) -> Dict[str, str]:
+        """Categories for many items with one Gemini call; answers are kept in the learned lexicon
+
+        Items the lexicon already knows are answered without the model. Returns
+        normalized item -> category for every item that could be categorized.
+        """
+        result = {}
+        for item in items:
+            known = learned_lexicon.get(item)
+            if known:
+                result[normalize_item(item)] = known
+        unknown = learned_lexicon.unknown(items)[:CATEGORIZE_BATCH_SIZE]
+        if not unknown or not self.gemini_available:
+            return result
         
         try:
-            prompt = f"""Categorize this expense item into ONE category:
+            listed = "\n".join(f'{n}. "{item}"' for n, item in enumerate(unknown, 1))
+            prompt = f"""Categorize each expense item into ONE category:
 
-Item: "{item_description}"
+{listed}
 
-Categories: Food, Transport, Groceries, Shopping, Utilities, Entertainment, Rent, Loan, Income, Medical, Education, Travel, Electronics, Personal Care, Fitness, Other
+Categories: {', '.join(KNOWN_CATEGORIES)}
 
-Return ONLY the category name, nothing else."""
+Return ONLY a JSON object mapping each item exactly as written to its category name, nothing else."""
             
-            response = self.model.generate_content(prompt)
-            if response and response.text:
-                category = response.text.strip()
-                return category
+            response = await self.llm.agenerate(prompt, model=self.model_name, timeout=INTERACTIVE_TIMEOUT_SECONDS,
+                                                retries=INTERACTIVE_MAX_RETRIES)
+            json_match = re.search(r'\{.*\}', response or '', re.DOTALL)
+            if not json_match:
+                return result
             
-            return None
+            decisions = {}
+            for item, category in json.loads(json_match.group(0)).items():
+                item = normalize_item(item)
+                category = canonical_category(str(category))
+                if item in unknown and category:
+                    decisions[item] = category
+            # A shared lexicon must not be able to override the keyword rules
+            learned_lexicon.learn_many({item: category for item, category in decisions.items()
+                                        if self.keyword_category is None or self.keyword_category(item) == 'Other'})
+            result.update(decisions)
+            print(f"[RAG] Categorized {len(decisions)} of {len(unknown)} items in one call")
+            return result
             
         except Exception as e:
             print(f"[RAG] Categorize error: {e}")
-            return None
+            return result
@@ -0,0 +1,192 @@
+import os
+import math
+import time
+import sqlite3
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+from starlette.requests import HTTPConnection
+
+MAX_TRACKED_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", 10000))
+# 'memory' (per process) or 'sqlite' (shared by all workers on the host)
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_STORE", "memory")
+# Relative paths are resolved against the backend directory, not the working directory
+RATE_LIMIT_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                  os.getenv("RATE_LIMIT_DB_PATH", "rate_limits.db"))
+# Proxies in front of the app that append to X-Forwarded-For (Vercel: 1); 0 ignores the header
+TRUSTED_PROXY_COUNT = int(os.getenv("TRUSTED_PROXY_COUNT", 1))
+# Counters are logged at most this often (seconds) while a limiter is refusing requests
+STATS_LOG_INTERVAL = float(os.getenv("RATE_LIMIT_LOG_INTERVAL", 60))
+
+
+def parse_rate(spec: str) -> Tuple[int, float]:
+    """'5/600' -> (5 requests, per 600 seconds)"""
+    count, period = spec.split('/')
+    return int(count), float(period)
+
+
+def client_ip(conn: HTTPConnection, trusted_proxies: int = None) -> str:
+    """Client address of a request or websocket as seen by the outermost trusted proxy
+
+    Each proxy appends the address it received the connection from, so the
+    hop added by the last trusted proxy is the N-th from the right; anything
+    to its left was sent by the client and can be forged.
+    """
+    trusted_proxies = TRUSTED_PROXY_COUNT if trusted_proxies is None else trusted_proxies
+    forwarded = conn.headers.get("x-forwarded-for") if trusted_proxies > 0 else None
+    if forwarded:
+        hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+        if len(hops) >= trusted_proxies:
+            return hops[-trusted_proxies]
+    return conn.client.host if conn.client else "unknown"
+
+
+def gcra(tat: Optional[float], now: float, emission: float, limit: float) -> Tuple[bool, float, float]:
+    """Generic cell rate algorithm step: (allowed, new theoretical arrival time, retry after seconds)
+
+    Each request pushes the key's theoretical arrival time (TAT) one emission
+    interval into the future; a request is refused when that would put it
+    more than `limit` (the whole burst) ahead of now. One float per key.
+    """
+    new_tat = max(tat or now, now) + emission
+    excess = new_tat - now - limit
+    if excess > 0:
+        return False, tat or now, excess
+    return True, new_tat, 0.0
+
+
+class MemoryRateState:
+    """TATs per key in LRU order, capped at max_keys"""
+
+    blocking = False
+
+    def __init__(self, max_keys: int = None):
+        self.max_keys = max_keys or MAX_TRACKED_KEYS
+        self._tats: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def acquire(self, key: str, now: float, emission: float, limit: float) -> Tuple[bool, float]:
+        with self._lock:
+            allowed, new_tat, retry_after = gcra(self._tats.get(key), now, emission, limit)
+            self._tats[key] = new_tat
+            self._tats.move_to_end(key)
+            while len(self._tats) > self.max_keys:
+                # The least recently seen key; usually long since back to a full allowance
+                self._tats.popitem(last=False)
+                self.evictions += 1
+            return allowed, retry_after
+
+    def __len__(self) -> int:
+        return len(self._tats)
+
+
+class SQLiteRateState:
+    """TATs in a SQLite table (WAL) so every worker on the host shares one budget per key"""
+
+    blocking = True
+
+    def __init__(self, path: str = None):
+        self.path = path or RATE_LIMIT_DB_PATH
+        self._local = threading.local()
+        self.evictions = 0
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS rate_limits (key TEXT PRIMARY KEY, tat REAL NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS rate_limits_tat ON rate_limits (tat)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def acquire(self, key: str, now: float, emission: float, limit: float) -> Tuple[bool, float]:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tat FROM rate_limits WHERE key = ?", (key,)).fetchone()
+            allowed, new_tat, retry_after = gcra(row[0] if row else None, now, emission, limit)
+            if allowed:
+                conn.execute("INSERT OR REPLACE INTO rate_limits (key, tat) VALUES (?, ?)", (key, new_tat))
+            # Keys whose TAT has passed hold no state worth keeping
+            conn.execute("DELETE FROM rate_limits WHERE tat < ?", (now,))
+            conn.execute("COMMIT")
+            return allowed, retry_after
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM rate_limits").fetchone()[0]
+
+
+def create_rate_state(backend: str = None):
+    backend = (backend or RATE_LIMIT_BACKEND).lower()
+    if backend == 'sqlite':
+        try:
+            return SQLiteRateState()
+        except Exception as e:
+            print(f"[RATE] SQLite state unavailable ({e}); using in-memory state")
+    return MemoryRateState()
+
+
+class RateLimiter:
+    """GCRA limiter: at most `count` requests per `period` seconds per key, evenly replenished
+
+    Equivalent to a sliding window without storing timestamps: a key that
+    stays under the rate is never refused, and a burst of up to `count`
+    requests is allowed after a quiet period.
+    """
+
+    def __init__(self, name: str, count: int, period: float, state=None):
+        self.name = name
+        self.count = count
+        self.period = period
+        self.emission = period / count
+        self.limit = period
+        self.state = state if state is not None else create_rate_state()
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.limited = 0
+        self._logged_at = None
+
+    def check(self, key: str, now: float = None) -> Tuple[bool, float]:
+        """(allowed, seconds until the next request would be allowed)"""
+        allowed, retry_after = self.state.acquire(key, now or time.time(), self.emission, self.limit)
+        with self._lock:
+            if allowed:
+                self.allowed += 1
+                return allowed, retry_after
+            self.limited += 1
+            log = self._logged_at is None or time.monotonic() - self._logged_at >= STATS_LOG_INTERVAL
+            if log:
+                self._logged_at = time.monotonic()
+        if log:
+            # Counters go to the server log, not to an endpoint a throttled client could read
+            print(f"[RATE] {self.name} refusing requests: {self.stats()}")
+        return allowed, retry_after
+
+    async def acheck(self, key: str) -> Tuple[bool, float]:
+        if self.state.blocking:
+            return await asyncio.to_thread(self.check, key)
+        return self.check(key)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.allowed + self.limited
+            return {
+                'rate': f"{self.count}/{int(self.period)}s",
+                'allowed': self.allowed,
+                'limited': self.limited,
+                'limited_share': round(self.limited / total, 3) if total else 0.0,
+                'tracked_keys': len(self.state),
+                'evictions': self.state.evictions
+            }
+
+
+def retry_after_header(seconds: float) -> Dict[str, str]:
+    return {"Retry-After": str(max(1, math.ceil(seconds)))}
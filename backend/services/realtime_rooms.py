@@ -0,0 +1,167 @@
+import os
+import json
+import zlib
+import asyncio
+from typing import Dict, Any, List, Optional, TYPE_CHECKING
+
+from models.expense import Expense
+from services.connection_manager import ConnectionManager, connection_manager
+
+if TYPE_CHECKING:
+    from services.supabase_auth import Identity
+
+# Deltas published to a room within this window go out as one frame
+COALESCE_WINDOW_SECONDS = float(os.getenv("WS_COALESCE_MS", 50)) / 1000
+# Rows held per room per window; beyond this the frame says so and clients refetch
+MAX_ROWS_PER_FRAME = int(os.getenv("WS_MAX_ROWS_PER_FRAME", 200))
+
+ENCODINGS = ('json', 'binary')
+
+
+def user_room(user_id: str) -> str:
+    return f"user:{user_id}"
+
+
+def group_room(group_id: str) -> str:
+    return f"group:{group_id}"
+
+
+def identity_rooms(identity: 'Identity', group_name: str = None, group_id: str = None) -> List[str]:
+    """Rooms an authenticated caller may publish to: a group of theirs when one is named, else their own"""
+    if group_name or group_id:
+        return [group_room(gid) for gid in identity.group_ids(group_name, group_id)]
+    return [user_room(identity.user_id)]
+
+
+def compact_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalized expense row without empty fields"""
+    try:
+        full = Expense.from_dict(row).to_dict()
+    except ValueError:
+        full = dict(row)
+    return {k: v for k, v in full.items() if v not in (None, '')}
+
+
+def encode_frame(frame: Dict[str, Any], encoding: str):
+    """Compact JSON text, or the same JSON zlib-compressed in a binary frame"""
+    text = json.dumps(frame, separators=(',', ':'), default=str)
+    if encoding == 'binary':
+        return zlib.compress(text.encode('utf-8'))
+    return text
+
+
+def decode_frame(data) -> Dict[str, Any]:
+    if isinstance(data, bytes):
+        data = zlib.decompress(data).decode('utf-8')
+    return json.loads(data)
+
+
+class PendingDelta:
+    """Rows and latest aggregate values collected for one room during a window"""
+
+    __slots__ = ('rows', 'totals', 'categories', 'months', 'counterparties', 'truncated')
+
+    def __init__(self):
+        self.rows: List[Dict[str, Any]] = []
+        self.totals: Optional[Dict[str, Any]] = None
+        # key -> latest value; a later event for the same key replaces the earlier one
+        self.categories: Dict[str, Dict[str, Any]] = {}
+        self.months: Dict[str, Dict[str, Any]] = {}
+        self.counterparties: Dict[str, Dict[str, Any]] = {}
+        self.truncated = False
+
+    def add(self, rows: List[Dict[str, Any]], changed: Optional[Dict[str, Any]]):
+        room_left = MAX_ROWS_PER_FRAME - len(self.rows)
+        if len(rows) > room_left:
+            self.truncated = True
+        self.rows.extend(rows[:max(room_left, 0)])
+        if not changed:
+            return
+        if 'totals' in changed:
+            self.totals = changed['totals']
+        for name in ('categories', 'months', 'counterparties'):
+            table = getattr(self, name)
+            for entry in changed.get(name, ()):
+                table[entry['key']] = entry
+
+    def frame(self, room: str, seq: int) -> Dict[str, Any]:
+        frame: Dict[str, Any] = {'type': 'delta', 'room': room, 'seq': seq, 'rows': self.rows}
+        aggregates: Dict[str, Any] = {}
+        if self.totals is not None:
+            aggregates['totals'] = self.totals
+        for name in ('categories', 'months', 'counterparties'):
+            table = getattr(self, name)
+            if table:
+                aggregates[name] = list(table.values())
+        if aggregates:
+            frame['aggregates'] = aggregates
+        if self.truncated:
+            frame['truncated'] = True
+        return frame
+
+
+class RoomPublisher:
+    """Pushes expense and aggregate deltas to the sockets watching a scope
+
+    Rooms are a verified user ("user:<id>") or a group they belong to
+    ("group:<group id>"), so a group's members all receive each change as
+    it is saved instead of re-fetching the whole dataset. Deltas for a room are held for a short window and
+    merged, so a burst of saves becomes one frame carrying every new row
+    and only the latest value of each changed aggregate. Nothing is
+    collected for rooms nobody is watching.
+    """
+
+    def __init__(self, manager: ConnectionManager, window: float = None):
+        self.manager = manager
+        self.window = COALESCE_WINDOW_SECONDS if window is None else window
+        self._pending: Dict[str, PendingDelta] = {}
+        self._seq: Dict[str, int] = {}
+        self.published = 0
+        self.frames = 0
+        self.skipped = 0
+
+    def publish(self, room: str, op: str, rows: List[Dict[str, Any]], changed: Dict[str, Any] = None) -> bool:
+        """Queue a delta for a room; False if nobody is in the room"""
+        if not self.manager.room_size(room):
+            self.skipped += 1
+            return False
+        entries = [{'op': op, 'expense': compact_row(row) if op != 'delete' else {'id': row.get('id')}} for row in rows]
+        pending = self._pending.get(room)
+        if pending is None:
+            pending = self._pending[room] = PendingDelta()
+            try:
+                asyncio.get_running_loop().call_later(self.window, self.flush, room)
+            except RuntimeError:
+                # No event loop (called from a worker thread or a script): send right away
+                pending.add(entries, changed)
+                self.published += 1
+                self.flush(room)
+                return True
+        pending.add(entries, changed)
+        self.published += 1
+        return True
+
+    def flush(self, room: str) -> int:
+        pending = self._pending.pop(room, None)
+        if pending is None:
+            return 0
+        if not self.manager.room_size(room):
+            self._seq.pop(room, None)
+            return 0
+        seq = self._seq[room] = self._seq.get(room, 0) + 1
+        frame = pending.frame(room, seq)
+        self.frames += 1
+        return self.manager.publish(room, lambda encoding: encode_frame(frame, encoding))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'coalesce_window_ms': round(self.window * 1000),
+            'deltas_published': self.published,
+            'frames_sent': self.frames,
+            'deltas_per_frame': round(self.published / self.frames, 2) if self.frames else 0.0,
+            'skipped_no_listeners': self.skipped,
+            'pending_rooms': len(self._pending)
+        }
+
+
+room_publisher = RoomPublisher(connection_manager)
@@ -0,0 +1,170 @@
+from datetime import date, datetime
+from typing import List, Dict, Any, Optional
+import numpy as np
+
+from services.expense_frame import ExpenseFrame, to_number
+from services.date_index import ordinal_bounds
+
+GRAINS = ('day', 'week', 'month')
+PERIOD_MIN_DAYS = {'day': 1, 'week': 7, 'month': 28}
+# Longest series listed with its empty periods (about ten years of days)
+MAX_SERIES_PERIODS = 3660
+
+
+def _period_start(day_ordinal: int, grain: str) -> int:
+    """Ordinal of the first day of the day/week (Monday)/month containing day_ordinal"""
+    if grain == 'day':
+        return day_ordinal
+    if grain == 'week':
+        return day_ordinal - (day_ordinal - 1) % 7
+    d = date.fromordinal(day_ordinal)
+    return date(d.year, d.month, 1).toordinal()
+
+
+def _period_label(start_ordinal: int, grain: str) -> str:
+    d = date.fromordinal(start_ordinal)
+    if grain == 'month':
+        return f"{d.year:04d}-{d.month:02d}"
+    if grain == 'week':
+        year, week, _ = d.isocalendar()
+        return f"{year:04d}-W{week:02d}"
+    return d.isoformat()
+
+
+class RollupCube:
+    """Day x category and day x counterparty expense totals for one dataset version
+
+    Rows are indexed by the distinct days that have expenses (np.unique), so
+    memory follows the number of rows, not the span between the earliest
+    and latest client-supplied dates. Weekly and monthly rollups map each
+    day to its period and sum with one scatter-add.
+    """
+
+    def __init__(self, frame: ExpenseFrame):
+        rows = np.flatnonzero(frame.expense_mask() & frame.has_date)
+        self.category_labels = frame.category_keys
+        self.counterparty_labels = frame.paid_by_labels
+
+        # Sorted distinct days, and each row's position among them
+        self.days, day_idx = np.unique(frame.day_ordinals[rows], return_inverse=True)
+        if self.days.size:
+            self.first_day = int(self.days[0])
+            self.last_day = int(self.days[-1])
+        else:
+            self.first_day = self.last_day = date.today().toordinal()
+        n_days = self.days.size
+        amounts = frame.amounts[rows]
+
+        self.by_category = np.zeros((n_days, len(self.category_labels)), dtype=np.float64)
+        np.add.at(self.by_category, (day_idx, frame.key_codes[rows]), amounts)
+        self.counts = np.bincount(day_idx, minlength=n_days)
+
+        paid = frame.paid_by_codes[rows] >= 0
+        self.by_counterparty = np.zeros((n_days, len(self.counterparty_labels)), dtype=np.float64)
+        np.add.at(self.by_counterparty, (day_idx[paid], frame.paid_by_codes[rows][paid]), amounts[paid])
+
+    @classmethod
+    def of(cls, frame: ExpenseFrame) -> 'RollupCube':
+        """The frame's cube, built on first use"""
+        return frame.memo('rollup_cube', lambda: cls(frame))
+
+    def _window(self, start: int, end: int) -> slice:
+        """Positions of the stored days within the inclusive ordinal range [start, end]"""
+        return slice(int(np.searchsorted(self.days, start, 'left')), int(np.searchsorted(self.days, end, 'right')))
+
+    @staticmethod
+    def _period_starts(grain: str, start: int, end: int) -> List[int]:
+        """Start ordinal of every period overlapping [start, end]"""
+        starts = [_period_start(start, grain)]
+        while True:
+            period = starts[-1]
+            if grain == 'day':
+                period += 1
+            elif grain == 'week':
+                period += 7
+            else:
+                d = date.fromordinal(period)
+                period = date(d.year + d.month // 12, d.month % 12 + 1, 1).toordinal()
+            if period > end:
+                return starts
+            starts.append(period)
+
+    def series(self, grain: str = 'day', by: str = 'category',
+               start_date: datetime = None, end_date: datetime = None) -> List[Dict[str, Any]]:
+        """Totals per period with a breakdown by category or counterparty
+
+        Every period in the range is listed, including empty ones, unless that
+        would exceed MAX_SERIES_PERIODS; then only periods with expenses are.
+        """
+        if grain not in GRAINS:
+            raise ValueError(f"grain must be one of {', '.join(GRAINS)}")
+        matrix = self.by_category if by == 'category' else self.by_counterparty
+        labels = self.category_labels if by == 'category' else self.counterparty_labels
+
+        lo, hi = ordinal_bounds(start_date, end_date)
+        start = max(lo if lo is not None else self.first_day, self.first_day)
+        end = min(hi if hi is not None else self.last_day, self.last_day)
+        if start > end or not self.counts.sum():
+            return []
+
+        window = self._window(start, end)
+        day_periods = np.array([_period_start(int(d), grain) for d in self.days[window]], dtype=np.int64)
+        span = (end - _period_start(start, grain)) // PERIOD_MIN_DAYS[grain] + 1
+        if span <= MAX_SERIES_PERIODS:
+            starts = np.array(self._period_starts(grain, start, end), dtype=np.int64)
+        else:
+            starts = np.unique(day_periods)
+        period_idx = np.searchsorted(starts, day_periods, 'right') - 1
+
+        sums = np.zeros((starts.size, matrix.shape[1]), dtype=np.float64)
+        np.add.at(sums, period_idx, matrix[window])
+        totals = np.bincount(period_idx, weights=self.by_category[window].sum(axis=1), minlength=starts.size)
+        counts = np.bincount(period_idx, weights=self.counts[window], minlength=starts.size)
+
+        series = []
+        for i, period_start in enumerate(starts.tolist()):
+            breakdown = {labels[j]: to_number(v) for j, v in enumerate(sums[i]) if v}
+            series.append({
+                'period': _period_label(period_start, grain),
+                'start': date.fromordinal(max(period_start, start)).isoformat(),
+                'total': to_number(totals[i]),
+                'count': int(counts[i]),
+                'breakdown': dict(sorted(breakdown.items(), key=lambda x: x[1], reverse=True))
+            })
+        return series
+
+    def period_total(self, start_ordinal: int, end_ordinal: int) -> Dict[str, Any]:
+        """Total, count and category breakdown between two inclusive day ordinals"""
+        window = self._window(start_ordinal, end_ordinal)
+        if window.stop <= window.start:
+            return {'total': 0, 'count': 0, 'categories': {}}
+        sums = self.by_category[window].sum(axis=0)
+        return {
+            'total': to_number(sums.sum()),
+            'count': int(self.counts[window].sum()),
+            'categories': {self.category_labels[j]: to_number(v) for j, v in enumerate(sums) if v}
+        }
+
+    def compare(self, grain: str = 'month', today: date = None) -> Dict[str, Any]:
+        """Current period to date against the whole previous period"""
+        today = (today or date.today()).toordinal()
+        current_start = _period_start(today, grain)
+        previous_start = _period_start(current_start - 1, grain)
+        current = self.period_total(current_start, today)
+        previous = self.period_total(previous_start, current_start - 1)
+
+        change = current['total'] - previous['total']
+        categories = {}
+        for cat in set(current['categories']) | set(previous['categories']):
+            now_amt = current['categories'].get(cat, 0)
+            before_amt = previous['categories'].get(cat, 0)
+            categories[cat] = {'current': now_amt, 'previous': before_amt, 'change': now_amt - before_amt}
+
+        return {
+            'grain': grain,
+            'current': {'period': _period_label(current_start, grain), **current},
+            'previous': {'period': _period_label(previous_start, grain), **previous},
+            'change': change,
+            'change_percent': round(change / previous['total'] * 100, 1) if previous['total'] else None,
+            'categories': dict(sorted(categories.items(), key=lambda x: abs(x[1]['change']), reverse=True))
+        }
@@ -0,0 +1,322 @@
+import re
+from typing import List, Dict, Any
+import numpy as np
+
+from services.expense_frame import ExpenseFrame, to_number
+
+
+def _word_pattern(keyword: str) -> re.Pattern:
+    return re.compile(rf'(?<![a-z0-9]){re.escape(keyword)}(?:e?s)?(?![a-z0-9])')
+
+
+class InvertedIndex:
+    """Token-level inverted index over item and remarks for one dataset version
+
+    Postings are sorted row ids per whitespace token, with precomputed amount
+    sums per term. Because query keywords never contain whitespace, "keyword
+    is a substring of the text" is the same as "keyword is a substring of
+    one of its tokens", so finding the vocabulary terms that contain it plus
+    a postings union reproduces the existing substring semantics exactly.
+    Those terms are found through an index of the vocabulary's character
+    grams, so a lookup costs time proportional to the matches, not the
+    history or the vocabulary.
+    """
+
+    def __init__(self, frame: ExpenseFrame):
+        self.frame = frame
+        item_postings: Dict[str, List[int]] = {}
+        text_postings: Dict[str, List[int]] = {}
+
+        for i, (item, remarks) in enumerate(zip(frame.item_lower, frame.remarks_lower)):
+            item_tokens = set(item.split())
+            for token in item_tokens:
+                item_postings.setdefault(token, []).append(i)
+            for token in item_tokens | set(remarks.split()):
+                text_postings.setdefault(token, []).append(i)
+
+        self.item_postings = {t: np.asarray(rows, dtype=np.int64) for t, rows in item_postings.items()}
+        self.text_postings = {t: np.asarray(rows, dtype=np.int64) for t, rows in text_postings.items()}
+        self.term_totals = {t: to_number(frame.amounts[rows].sum()) for t, rows in self.text_postings.items()}
+        self._term_grams: Dict[bool, Dict[str, List[str]]] = {}
+
+    @classmethod
+    def of(cls, frame: ExpenseFrame) -> 'InvertedIndex':
+        """The frame's inverted index, built on first use"""
+        return frame.memo('inverted_index', lambda: cls(frame))
+
+    def _postings(self, include_remarks: bool) -> Dict[str, np.ndarray]:
+        return self.text_postings if include_remarks else self.item_postings
+
+    def _grams(self, include_remarks: bool) -> Dict[str, List[str]]:
+        """Every 1-, 2- and 3-character substring of the vocabulary -> the terms containing it, built on first use"""
+        grams = self._term_grams.get(include_remarks)
+        if grams is None:
+            grams = {}
+            for term in self._postings(include_remarks):
+                for gram in {term[i:i + n] for n in (1, 2, 3) for i in range(len(term) - n + 1)}:
+                    grams.setdefault(gram, []).append(term)
+            self._term_grams[include_remarks] = grams
+        return grams
+
+    def terms_containing(self, keyword: str, include_remarks: bool = True) -> List[str]:
+        """Vocabulary terms that contain keyword (keyword must not contain whitespace)"""
+        grams = self._grams(include_remarks)
+        if len(keyword) <= 3:
+            return list(grams.get(keyword, ()))
+        # A term containing keyword contains each of its trigrams; check the rarest one's terms
+        rarest = min((grams.get(keyword[i:i + 3], ()) for i in range(len(keyword) - 2)), key=len)
+        return [term for term in rarest if keyword in term]
+
+    def _union(self, terms: List[str], postings: Dict[str, np.ndarray]) -> np.ndarray:
+        if not terms:
+            return np.zeros(0, dtype=np.int64)
+        if len(terms) == 1:
+            return postings[terms[0]]
+        return np.unique(np.concatenate([postings[t] for t in terms]))
+
+    def substring_rows(self, keyword: str, include_remarks: bool = True) -> np.ndarray:
+        """Sorted row ids whose item (or remarks) contains keyword as a substring"""
+        postings = self._postings(include_remarks)
+        pieces = keyword.split()
+        if len(pieces) == 1 and pieces[0] == keyword:
+            return self._union(self.terms_containing(keyword, include_remarks), postings)
+
+        # Keyword spans whitespace: every inner piece must be a whole token, so
+        # intersect those postings and verify the exact substring on candidates
+        candidates = None if pieces else np.arange(len(self.frame), dtype=np.int64)
+        for piece in pieces:
+            rows = self._union(self.terms_containing(piece, include_remarks), postings)
+            candidates = rows if candidates is None else np.intersect1d(candidates, rows, assume_unique=True)
+            if not candidates.size:
+                break
+        item_lower, remarks_lower = self.frame.item_lower, self.frame.remarks_lower
+        return np.asarray([i for i in candidates
+                           if keyword in item_lower[i] or (include_remarks and keyword in remarks_lower[i])], dtype=np.int64)
+
+    def item_contains(self, keyword: str) -> bool:
+        """True if any item contains keyword as a substring"""
+        if not keyword.split() or keyword.split()[0] != keyword:
+            return bool(self.substring_rows(keyword, include_remarks=False).size)
+        return bool(self.terms_containing(keyword, include_remarks=False))
+
+    def match_keywords(self, keywords: List[str]) -> np.ndarray:
+        """Sorted row ids whose item or remarks contains any keyword"""
+        matches = [self.substring_rows(keyword) for keyword in keywords]
+        if len(matches) == 1:
+            return matches[0]
+        return np.unique(np.concatenate(matches)) if matches else np.zeros(0, dtype=np.int64)
+
+    def word_rows(self, keyword: str, include_remarks: bool = True) -> np.ndarray:
+        """Sorted row ids whose item (or remarks) has keyword as whole words, optionally pluralized
+
+        "rice" finds "fried rice" and "rices" but not "price"; "table" does not find "tablet".
+        """
+        pattern = _word_pattern(keyword)
+        if keyword.split() == [keyword]:
+            terms = [term for term in self.terms_containing(keyword, include_remarks) if pattern.search(term)]
+            return self._union(terms, self._postings(include_remarks))
+        item_lower, remarks_lower = self.frame.item_lower, self.frame.remarks_lower
+        return np.asarray([i for i in self.substring_rows(keyword, include_remarks)
+                           if pattern.search(item_lower[i]) or (include_remarks and pattern.search(remarks_lower[i]))],
+                          dtype=np.int64)
+
+    def word_summary(self, keywords: List[str]) -> Dict[str, Any]:
+        """Rows having any keyword as whole words and their total amount"""
+        matches = [self.word_rows(keyword) for keyword in keywords]
+        rows = matches[0] if len(matches) == 1 else np.unique(np.concatenate(matches))
+        return {'rows': rows, 'total_amount': to_number(self.frame.amounts[rows].sum())}
+
+    def term_total(self, term: str):
+        """Precomputed amount sum of rows containing the exact token"""
+        return self.term_totals.get(term, 0)
+
+    def keyword_summary(self, keywords: List[str]) -> Dict[str, Any]:
+        """Total amount and count of rows matching any keyword"""
+        if len(keywords) == 1:
+            terms = self.terms_containing(keywords[0]) if keywords[0].split() == [keywords[0]] else None
+            if terms is not None and len(terms) == 1:
+                # One exact term: served entirely from precomputed sums
+                return {'rows': self.text_postings[terms[0]], 'total_amount': self.term_totals[terms[0]]}
+        rows = self.match_keywords(keywords)
+        return {'rows': rows, 'total_amount': to_number(self.frame.amounts[rows].sum())}
+
+
+def _trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    """Character-trigram index over item and remarks for substring search
+
+    Any keyword of 3+ characters (spaces included) can only occur in a row
+    that contains all of its trigrams, so intersecting the trigram postings
+    yields a small candidate set that is then checked with the exact same
+    `keyword in text` test as before. Results are identical to a full scan;
+    shorter keywords fall back to the token index.
+    """
+
+    def __init__(self, frame: ExpenseFrame):
+        self.frame = frame
+        item_postings: Dict[str, List[int]] = {}
+        text_postings: Dict[str, List[int]] = {}
+
+        for i, (item, remarks) in enumerate(zip(frame.item_lower, frame.remarks_lower)):
+            item_grams = _trigrams(item)
+            for gram in item_grams:
+                item_postings.setdefault(gram, []).append(i)
+            for gram in item_grams | _trigrams(remarks):
+                text_postings.setdefault(gram, []).append(i)
+
+        self.item_postings = {g: np.asarray(rows, dtype=np.int64) for g, rows in item_postings.items()}
+        self.text_postings = {g: np.asarray(rows, dtype=np.int64) for g, rows in text_postings.items()}
+
+    @classmethod
+    def of(cls, frame: ExpenseFrame) -> 'TrigramIndex':
+        """The frame's trigram index, built on first use"""
+        return frame.memo('trigram_index', lambda: cls(frame))
+
+    def candidates(self, keyword: str, include_remarks: bool = True) -> np.ndarray:
+        """Rows containing every trigram of keyword (a superset of the true matches)"""
+        postings = self.text_postings if include_remarks else self.item_postings
+        lists = []
+        for gram in _trigrams(keyword):
+            rows = postings.get(gram)
+            if rows is None:
+                return np.zeros(0, dtype=np.int64)
+            lists.append(rows)
+        # Intersect smallest-first so the candidate set shrinks fastest
+        lists.sort(key=len)
+        result = lists[0]
+        for rows in lists[1:]:
+            result = np.intersect1d(result, rows, assume_unique=True)
+            if not result.size:
+                break
+        return result
+
+    def substring_rows(self, keyword: str, include_remarks: bool = True) -> np.ndarray:
+        """Sorted row ids whose item (or remarks) contains keyword as a substring"""
+        if len(keyword) < 3:
+            return InvertedIndex.of(self.frame).substring_rows(keyword, include_remarks)
+        item_lower, remarks_lower = self.frame.item_lower, self.frame.remarks_lower
+        return np.asarray([i for i in self.candidates(keyword, include_remarks)
+                           if keyword in item_lower[i] or (include_remarks and keyword in remarks_lower[i])], dtype=np.int64)
+
+    def item_contains(self, keyword: str) -> bool:
+        """True if any item contains keyword as a substring"""
+        if len(keyword) < 3:
+            return InvertedIndex.of(self.frame).item_contains(keyword)
+        item_lower = self.frame.item_lower
+        return any(keyword in item_lower[i] for i in self.candidates(keyword, include_remarks=False))
+
+    def match_keywords(self, keywords: List[str]) -> np.ndarray:
+        """Sorted row ids whose item or remarks contains any keyword"""
+        matches = [self.substring_rows(keyword) for keyword in keywords]
+        if len(matches) == 1:
+            return matches[0]
+        return np.unique(np.concatenate(matches)) if matches else np.zeros(0, dtype=np.int64)
+
+    def keyword_summary(self, keywords: List[str]) -> Dict[str, Any]:
+        """Matching rows and their total amount"""
+        rows = self.match_keywords(keywords)
+        return {'rows': rows, 'total_amount': to_number(self.frame.amounts[rows].sum())}
+
+
+MONTH_NAMES = ['january', 'february', 'march', 'april', 'may', 'june', 'july',
+               'august', 'september', 'october', 'november', 'december']
+
+# Question words that say nothing about which rows are relevant
+QUERY_STOP_WORDS = {'i', 'my', 'me', 'how', 'much', 'many', 'did', 'do', 'does', 'spend', 'spent', 'on', 'for',
+                    'the', 'a', 'an', 'what', 'is', 'are', 'was', 'were', 'in', 'of', 'to', 'from', 'and', 'or',
+                    'with', 'at', 'this', 'that', 'it', 'you', 'we', 'have', 'has', 'show', 'tell', 'about',
+                    'give', 'list', 'all', 'any', 'some', 'when', 'where', 'which', 'who', 'total', 'expenses',
+                    'expense', 'money', 'rs', 'pay', 'paid'}
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def _stem(token: str) -> str:
+    # "momos" -> "momo", "bills" -> "bill"; enough for short expense descriptions
+    return token[:-1] if len(token) > 3 and token.endswith('s') and not token.endswith('ss') else token
+
+
+def text_tokens(text: str) -> List[str]:
+    return [_stem(t) for t in _TOKEN_RE.findall(text.lower())]
+
+
+def date_tokens(date_str: str) -> List[str]:
+    """'2025-03-14' -> ['2025', 'march', 'mar', '14']
+
+    Only tokens the query tokenizer can produce, so "march 14 2025" matches.
+    """
+    if not date_str or len(date_str) < 7:
+        return []
+    year, month, day = date_str[:4], date_str[5:7], date_str[8:10]
+    tokens = [year]
+    if month.isdigit() and 1 <= int(month) <= 12:
+        name = MONTH_NAMES[int(month) - 1]
+        tokens += [name, name[:3]]
+    if day.isdigit() and 1 <= int(day) <= 31:
+        tokens.append(str(int(day)))
+    return tokens
+
+
+class BM25Index:
+    """Okapi BM25 over item, remarks, category, paid_by and date tokens of one dataset version
+
+    Postings hold (row ids, term frequencies) as arrays, so scoring a query is
+    a handful of vectorized scatter-adds and an argpartition for the top k.
+    """
+
+    def __init__(self, frame: ExpenseFrame, k1: float = 1.2, b: float = 0.75):
+        self.frame = frame
+        self.k1 = k1
+        self.b = b
+        postings: Dict[str, Dict[int, int]] = {}
+        lengths = np.zeros(len(frame), dtype=np.float64)
+
+        for i, exp in enumerate(frame.rows):
+            tokens = (text_tokens(exp.item or '') + text_tokens(exp.remarks) + text_tokens(exp.category) +
+                      text_tokens(exp.paid_by or '') + date_tokens(exp.date))
+            lengths[i] = len(tokens)
+            for token in tokens:
+                row_counts = postings.setdefault(token, {})
+                row_counts[i] = row_counts.get(i, 0) + 1
+
+        n = len(frame)
+        self.avg_length = lengths.mean() if n else 0.0
+        self.length_norm = k1 * (1 - b + b * lengths / self.avg_length) if n and self.avg_length else lengths
+        self.postings = {}
+        self.idf = {}
+        for token, row_counts in postings.items():
+            rows = np.fromiter(row_counts.keys(), dtype=np.int64, count=len(row_counts))
+            tf = np.fromiter(row_counts.values(), dtype=np.float64, count=len(row_counts))
+            self.postings[token] = (rows, tf)
+            df = len(row_counts)
+            self.idf[token] = np.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    @classmethod
+    def of(cls, frame: ExpenseFrame) -> 'BM25Index':
+        """The frame's BM25 index, built on first use"""
+        return frame.memo('bm25_index', lambda: cls(frame))
+
+    def query_terms(self, query: str) -> List[str]:
+        terms = []
+        for token in text_tokens(query):
+            if token not in QUERY_STOP_WORDS and token in self.postings and token not in terms:
+                terms.append(token)
+        return terms
+
+    def scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(len(self.frame), dtype=np.float64)
+        for term in self.query_terms(query):
+            rows, tf = self.postings[term]
+            scores[rows] += self.idf[term] * tf * (self.k1 + 1) / (tf + self.length_norm[rows])
+        return scores
+
+    def top_k(self, query: str, k: int = 10, exclude: np.ndarray = None) -> List[int]:
+        """Row ids of the k best matches (score > 0) outside exclude, best first; earlier rows win ties"""
+        scores = self.scores(query)
+        if exclude is not None:
+            scores[exclude] = 0
+        hits = np.flatnonzero(scores > 0)
+        return hits[np.lexsort((hits, -scores[hits]))[:k]].tolist()
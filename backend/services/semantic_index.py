@@ -0,0 +1,208 @@
+import zlib
+from functools import lru_cache
+from typing import List, Dict, Tuple
+import numpy as np
+
+from services.expense_frame import ExpenseFrame
+from services.search_index import text_tokens
+
+VECTOR_DIM = 512
+NGRAM_SIZES = (3, 4)
+TOP_K = 20
+MIN_SIMILARITY = 0.45
+
+# Weights of the concept features relative to the (unit) character n-gram part
+SYNONYM_WEIGHT = 1.0
+CATEGORY_WEIGHT = 0.35
+
+# Items that are a kind of the same thing, with the category they belong to.
+# Kept narrow on purpose: "coffee" should find a latte, "lunch" should not find dinner.
+SYNONYM_GROUPS = {
+    'coffee': ('food', ['coffee', 'latte', 'cappuccino', 'espresso', 'americano', 'mocha', 'macchiato',
+                        'frappe', 'cold brew', 'nescafe']),
+    'tea': ('food', ['tea', 'chiya', 'chai', 'milk tea', 'masala tea', 'green tea', 'black tea']),
+    'snack': ('food', ['snack', 'samosa', 'pakoda', 'pakora', 'chips', 'biscuit', 'cookies', 'namkeen',
+                       'bhujia', 'chaat', 'panipuri', 'pani puri', 'chatpate', 'popcorn', 'kurkure', 'wai wai',
+                       'sel roti']),
+    'dessert': ('food', ['dessert', 'sweets', 'mithai', 'ice cream', 'cake', 'pastry', 'chocolate', 'kulfi']),
+    'juice': ('food', ['juice', 'lassi', 'smoothie', 'shake', 'milkshake']),
+    'ride': ('transport', ['taxi', 'cab', 'uber', 'pathao', 'indrive', 'ride', 'rickshaw', 'auto']),
+    'fuel': ('transport', ['fuel', 'petrol', 'diesel']),
+    'recharge': ('utilities', ['recharge', 'topup', 'top up', 'data pack', 'ncell', 'ntc']),
+    'internet': ('utilities', ['internet', 'wifi', 'broadband']),
+    'medicine': ('medical', ['medicine', 'pill', 'tablet', 'syrup', 'capsule', 'pharmacy'])
+}
+
+_concepts: Dict[str, Dict[str, float]] = None
+
+
+def _phrase(text: str) -> str:
+    return ' '.join(text_tokens(text))
+
+
+def concept_table() -> Dict[str, Dict[str, float]]:
+    """Stemmed word or two-word phrase -> {concept feature: weight}
+
+    Combines SYNONYM_GROUPS with the keyword lists ExpenseParser categorizes
+    by, so an item shares a (weaker) category feature with everything else
+    the parser would file under the same category. Built on first use.
+    """
+    global _concepts
+    if _concepts is None:
+        from services.nlp_service import ExpenseParser
+
+        table: Dict[str, Dict[str, float]] = {}
+        for category, keywords in ExpenseParser().categories.items():
+            for keyword in keywords:
+                table.setdefault(_phrase(keyword), {})[f'cat:{category}'] = CATEGORY_WEIGHT
+        for group, (category, members) in SYNONYM_GROUPS.items():
+            for member in members:
+                features = table.setdefault(_phrase(member), {})
+                features[f'syn:{group}'] = SYNONYM_WEIGHT
+                features[f'cat:{category}'] = CATEGORY_WEIGHT
+        table.pop('', None)
+        _concepts = table
+    return _concepts
+
+
+def _bucket(feature: str, dim: int) -> int:
+    # crc32 rather than hash(): stable across processes and PYTHONHASHSEED
+    return zlib.crc32(feature.encode('utf-8')) % dim
+
+
+@lru_cache(maxsize=65536)
+def _ngram_buckets(token: str, dim: int) -> np.ndarray:
+    padded = f' {token} '
+    grams = [padded[i:i + n] for n in NGRAM_SIZES for i in range(len(padded) - n + 1)]
+    return np.fromiter((_bucket(g, dim) for g in grams), dtype=np.int64, count=len(grams))
+
+
+def _concept_features(tokens: List[str]):
+    """(concept feature, weight) of every word and two-word phrase found in the concept table"""
+    table = concept_table()
+    for i, token in enumerate(tokens):
+        for phrase in (token, f'{token} {tokens[i + 1]}' if i + 1 < len(tokens) else None):
+            yield from table.get(phrase, {}).items()
+
+
+def synonym_groups(text: str) -> frozenset:
+    """Names of the SYNONYM_GROUPS a text mentions a member of"""
+    return frozenset(feature[4:] for feature, _ in _concept_features(text_tokens(text)) if feature.startswith('syn:'))
+
+
+def _features(text: str, dim: int) -> tuple:
+    """(n-gram buckets, {concept bucket: weight}) of a text"""
+    tokens = text_tokens(text)
+    buckets = [_ngram_buckets(token, dim) for token in tokens]
+    buckets = np.concatenate(buckets) if buckets else np.zeros(0, dtype=np.int64)
+
+    concepts: Dict[int, float] = {}
+    for feature, weight in _concept_features(tokens):
+        bucket = _bucket(feature, dim)
+        concepts[bucket] = max(concepts.get(bucket, 0.0), weight)
+    return buckets, concepts
+
+
+def embed_all(texts: List[str], dim: int = VECTOR_DIM) -> np.ndarray:
+    """Unit-length hashed vectors (one row per text) of character n-grams plus synonym and category concepts
+
+    The n-gram part of each row is scaled to unit length first so the concept
+    weights mean the same for long and short texts.
+    """
+    matrix = np.zeros((len(texts), dim), dtype=np.float32)
+    features = [_features(text, dim) for text in texts]
+    lengths = [buckets.size for buckets, _ in features]
+    if sum(lengths):
+        rows = np.repeat(np.arange(len(texts)), lengths)
+        np.add.at(matrix, (rows, np.concatenate([buckets for buckets, _ in features])), 1.0)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+
+    for row, (_, concepts) in enumerate(features):
+        for bucket, weight in concepts.items():
+            matrix[row, bucket] += weight
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+def embed(text: str, dim: int = VECTOR_DIM) -> np.ndarray:
+    return embed_all([text], dim)[0]
+
+
+class SemanticIndex:
+    """Hashed-vector similarity search over the distinct item names of one dataset version
+
+    Each distinct item is embedded once (character n-grams for spelling
+    variants, synonym/category concepts for related items) into one float32
+    matrix, so a query is a single matrix-vector product plus a partial sort.
+    Runs offline on CPU; the matrix is only as large as the item vocabulary.
+
+    Cosine neighbours can be unrelated items that merely share letters
+    ("rice" -> "price difference refund", "card" -> "car"), so they are
+    only ever shown as context. Rows that may be added to an item's total
+    come from related_rows, which requires a shared synonym group.
+    """
+
+    def __init__(self, frame: ExpenseFrame, dim: int = VECTOR_DIM):
+        self.frame = frame
+        self.dim = dim
+        # A category name asks about the category, which the category totals answer
+        self.category_keys = set(frame.category_keys)
+        item_codes: Dict[str, int] = {}
+        codes = np.full(len(frame), -1, dtype=np.int64)
+        for i, item in enumerate(frame.item_lower):
+            item = item.strip()
+            if item:
+                codes[i] = item_codes.setdefault(item, len(item_codes))
+        self.items: List[str] = list(item_codes)
+        self.codes = codes
+        self.matrix = embed_all(self.items, dim)
+        self._groups = None
+
+    @classmethod
+    def of(cls, frame: ExpenseFrame) -> 'SemanticIndex':
+        """The frame's semantic index, built on first use"""
+        return frame.memo('semantic_index', lambda: cls(frame))
+
+    def _item_groups(self) -> Dict[str, np.ndarray]:
+        """Synonym group -> codes of the items that are a member of it, built on first use"""
+        if self._groups is None:
+            groups: Dict[str, List[int]] = {}
+            for code, item in enumerate(self.items):
+                for group in synonym_groups(item):
+                    groups.setdefault(group, []).append(code)
+            self._groups = {group: np.array(codes, dtype=np.int64) for group, codes in groups.items()}
+        return self._groups
+
+    def _top(self, text: str, k: int, threshold: float) -> tuple:
+        query = embed(text, self.dim) if text.strip() not in self.category_keys else None
+        if not self.items or query is None or not query.any():
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        scores = self.matrix @ query
+        top = np.argpartition(-scores, k)[:k] if k < len(scores) else np.arange(len(scores))
+        top = top[scores[top] >= threshold]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return top, scores[top]
+
+    def search(self, text: str, k: int = TOP_K, threshold: float = MIN_SIMILARITY) -> List[Tuple[str, float]]:
+        """Up to k (item, cosine similarity) pairs at or above threshold, most similar first"""
+        codes, scores = self._top(text, k, threshold)
+        return [(self.items[c], float(s)) for c, s in zip(codes, scores)]
+
+    def similar_rows(self, keywords: List[str], k: int = TOP_K, threshold: float = MIN_SIMILARITY) -> np.ndarray:
+        """Sorted row ids whose item is similar to any keyword"""
+        codes = [self._top(keyword, k, threshold)[0] for keyword in keywords]
+        codes = np.concatenate(codes) if codes else np.zeros(0, dtype=np.int64)
+        if not codes.size:
+            return codes
+        return np.isin(self.codes, codes).nonzero()[0]
+
+    def related_rows(self, keywords: List[str]) -> np.ndarray:
+        """Sorted row ids whose item is in the same synonym group as a keyword ("coffee" -> latte)"""
+        item_groups = self._item_groups()
+        codes = [item_groups[group] for keyword in keywords if keyword.strip() not in self.category_keys
+                 for group in synonym_groups(keyword) if group in item_groups]
+        if not codes:
+            return np.zeros(0, dtype=np.int64)
+        return np.isin(self.codes, np.concatenate(codes)).nonzero()[0]
@@ -0,0 +1,110 @@
+import heapq
+import numpy as np
+from typing import List, Dict, Any, Optional
+
+from services.expense_frame import ExpenseFrame, to_number
+from services.counterparty_ledger import canonical_key, display_name
+
+
+def _payer(exp) -> Optional[str]:
+    """Who paid a shared group expense: paid_by, else the member who added it"""
+    return exp.paid_by or exp.added_by
+
+
+def minimal_transfers(balances: Dict[str, int]) -> List[tuple]:
+    """Greedy settlement of integer balances (positive: is owed) as (debtor, creditor, amount)
+
+    The largest debtor always pays the largest creditor, so each transfer
+    zeroes at least one of them: at most n-1 transfers, O(n log n) with two heaps.
+    """
+    creditors = [(-amount, key) for key, amount in balances.items() if amount > 0]
+    debtors = [(amount, key) for key, amount in balances.items() if amount < 0]
+    heapq.heapify(creditors)
+    heapq.heapify(debtors)
+
+    transfers = []
+    while creditors and debtors:
+        credit, creditor = heapq.heappop(creditors)
+        debt, debtor = heapq.heappop(debtors)
+        amount = min(-credit, -debt)
+        transfers.append((debtor, creditor, amount))
+        if -credit > amount:
+            heapq.heappush(creditors, (credit + amount, creditor))
+        if -debt > amount:
+            heapq.heappush(debtors, (debt + amount, debtor))
+    return transfers
+
+
+class GroupSettlement:
+    """Who should pay whom so that a group's shared expenses are split equally
+
+    One pass over the frame's expenses nets each member's balance (what they
+    paid minus their equal share) in paise, so rounding never leaves a stray
+    remainder; minimal_transfers() then settles the balances. Name
+    normalization runs once per distinct payer, not per row.
+    """
+
+    def __init__(self, frame: ExpenseFrame, members: List[str] = None):
+        self.names: Dict[str, str] = {}
+        paid: Dict[str, int] = {}
+        for name in members or []:
+            key = canonical_key(name)
+            self.names.setdefault(key, display_name(name).title())
+            paid.setdefault(key, 0)
+
+        # Sum paise per distinct payer string, then merge spellings by canonical key
+        rows = frame.expense_mask().nonzero()[0]
+        payer_codes: Dict[str, int] = {}
+        codes = np.fromiter((payer_codes.setdefault(_payer(frame.rows[i]) or '', len(payer_codes)) for i in rows),
+                            dtype=np.int64, count=rows.size)
+        cents = np.rint(frame.amounts[rows] * 100)
+        sums = np.bincount(codes, weights=cents, minlength=len(payer_codes))
+
+        total = 0
+        for payer, code in payer_codes.items():
+            if not payer:
+                continue
+            key = canonical_key(payer)
+            if key not in self.names:
+                self.names[key] = display_name(payer).title()
+            paid[key] = paid.get(key, 0) + int(sums[code])
+            total += int(sums[code])
+
+        # Equal shares; the first few members absorb the indivisible paise
+        self.balances: Dict[str, int] = {}
+        if paid:
+            share, remainder = divmod(total, len(paid))
+            for n, key in enumerate(paid):
+                self.balances[key] = paid[key] - share - (1 if n < remainder else 0)
+        self.total = total
+        self.paid = paid
+        self.transfers = minimal_transfers(self.balances)
+
+    @classmethod
+    def of(cls, frame: ExpenseFrame) -> 'GroupSettlement':
+        """Settlement among the frame's payers, built on first use"""
+        return frame.memo('group_settlement', lambda: cls(frame))
+
+    def to_dict(self) -> Dict[str, Any]:
+        members = len(self.paid)
+        return {
+            'total': to_number(self.total / 100),
+            'members': members,
+            'share': to_number(round(self.total / members / 100, 2)) if members else 0,
+            'balances': [
+                {'name': self.names[key], 'paid': to_number(self.paid[key] / 100), 'balance': to_number(balance / 100)}
+                for key, balance in sorted(self.balances.items(), key=lambda x: x[1], reverse=True)
+            ],
+            'transfers': [
+                {'from': self.names[debtor], 'to': self.names[creditor], 'amount': to_number(amount / 100)}
+                for debtor, creditor, amount in self.transfers
+            ]
+        }
+
+    def describe(self, group_label: str = "the group") -> str:
+        if not self.paid:
+            return f"No shared expenses with a payer recorded in {group_label}."
+        if not self.transfers:
+            return f"Everyone in {group_label} is settled up (Rs.{to_number(self.total / 100)} shared equally)."
+        steps = "; ".join(f"{self.names[d]} pays {self.names[c]} Rs.{to_number(a / 100)}" for d, c, a in self.transfers)
+        return f"To settle up {group_label} ({len(self.paid)} members, Rs.{to_number(self.total / 100)} shared): {steps}."
@@ -0,0 +1,204 @@
+import os
+import hmac
+import json
+import time
+import base64
+import asyncio
+import hashlib
+import threading
+import importlib.util
+from typing import Dict, Any, Optional
+from dotenv import load_dotenv
+from fastapi import HTTPException, Request
+from starlette.requests import HTTPConnection
+
+from utils.lru_cache import MemoryBoundedLRU
+
+load_dotenv()
+
+SUPABASE_AVAILABLE = importlib.util.find_spec("supabase") is not None
+# With the project's JWT secret, access tokens are verified locally; without it
+# every new token costs one call to the Supabase auth server
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
+TOKEN_AUDIENCE = "authenticated"
+# How long a verified token and a user's group memberships are trusted before re-checking
+AUTH_CACHE_SECONDS = float(os.getenv("AUTH_CACHE_SECONDS", 60))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", 10000))
+
+
+def _b64decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + '=' * (-len(segment) % 4))
+
+
+def verify_hs256(token: str, secret: str, now: float = None) -> Optional[Dict[str, Any]]:
+    """Claims of a Supabase access token signed with the project secret, or None if it is not valid"""
+    try:
+        header_b64, payload_b64, signature_b64 = token.split('.')
+        header = json.loads(_b64decode(header_b64))
+        if header.get('alg') != 'HS256':
+            return None
+        expected = hmac.new(secret.encode(), f"{header_b64}.{payload_b64}".encode(), hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, _b64decode(signature_b64)):
+            return None
+        claims = json.loads(_b64decode(payload_b64))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(claims, dict) or not claims.get('sub'):
+        return None
+    audience = claims.get('aud')
+    if TOKEN_AUDIENCE not in (audience if isinstance(audience, list) else [audience]):
+        return None
+    expires = claims.get('exp')
+    if not isinstance(expires, (int, float)) or expires <= (now or time.time()):
+        return None
+    return claims
+
+
+class Identity:
+    """A verified Supabase user and the groups they belong to (group id -> name)"""
+
+    __slots__ = ('user_id', 'email', 'groups')
+
+    def __init__(self, user_id: str, email: Optional[str], groups: Dict[str, str]):
+        self.user_id = user_id
+        self.email = email
+        self.groups = groups
+
+    def group_ids(self, group_name: str = None, group_id: str = None) -> list:
+        """The caller's groups matching an id or a name (names are not unique)"""
+        if group_id:
+            return [group_id] if group_id in self.groups else []
+        return [gid for gid, name in self.groups.items() if name == group_name]
+
+
+class SupabaseAuth:
+    """Resolves a Supabase access token to an Identity
+
+    Tokens are checked against the JWT secret when it is configured, or by
+    asking the Supabase auth server otherwise; group memberships come from
+    group_members with the service key. Both are cached for
+    AUTH_CACHE_SECONDS so a socket reconnecting or a burst of saves does
+    not hit Supabase each time. The client library is imported on first
+    use, like the Gemini client.
+    """
+
+    def __init__(self, url: str = None, service_key: str = None, jwt_secret: str = None):
+        self.url = url or os.getenv("SUPABASE_URL")
+        self.service_key = service_key or os.getenv("SUPABASE_SERVICE_KEY")
+        self.jwt_secret = jwt_secret or SUPABASE_JWT_SECRET
+        self._supabase = None
+        self._client_lock = threading.Lock()
+        self._tokens = MemoryBoundedLRU(max_entries=AUTH_CACHE_MAX_ENTRIES)
+        self._memberships = MemoryBoundedLRU(max_entries=AUTH_CACHE_MAX_ENTRIES)
+        self.verified = 0
+        self.rejected = 0
+        self.errors = 0
+
+    @property
+    def available(self) -> bool:
+        """Whether tokens can be verified (memberships also need the service key)"""
+        return bool(self.jwt_secret) or self.client_configured
+
+    @property
+    def client_configured(self) -> bool:
+        return SUPABASE_AVAILABLE and bool(self.url and self.service_key)
+
+    def _client(self):
+        if self._supabase is None:
+            with self._client_lock:
+                if self._supabase is None:
+                    from supabase import create_client
+                    self._supabase = create_client(self.url, self.service_key)
+        return self._supabase
+
+    def _verify(self, token: str) -> Optional[Dict[str, Any]]:
+        """Claims (at least sub and exp) of a valid token; blocks when the auth server is asked"""
+        if self.jwt_secret:
+            return verify_hs256(token, self.jwt_secret)
+        response = self._client().auth.get_user(token)
+        user = getattr(response, 'user', None)
+        if user is None:
+            return None
+        return {'sub': user.id, 'email': getattr(user, 'email', None), 'exp': time.time() + AUTH_CACHE_SECONDS}
+
+    def _fetch_memberships(self, user_id: str) -> Dict[str, str]:
+        if not self.client_configured:
+            return {}
+        rows = (self._client().table("group_members").select("group_id, groups(name)")
+                .eq("user_id", user_id).execute().data) or []
+        return {str(row['group_id']): (row.get('groups') or {}).get('name') for row in rows}
+
+    async def memberships(self, user_id: str, refresh: bool = False) -> Dict[str, str]:
+        now = time.time()
+        cached = None if refresh else self._memberships.get(user_id)
+        if cached is not None and cached[1] > now:
+            return cached[0]
+        groups = await asyncio.to_thread(self._fetch_memberships, user_id)
+        self._memberships.put(user_id, (groups, now + AUTH_CACHE_SECONDS))
+        return groups
+
+    async def identify(self, token: Optional[str]) -> Optional[Identity]:
+        """The Identity for an access token; None if it is missing, invalid, expired or cannot be checked"""
+        if not token or not self.available:
+            return None
+        now = time.time()
+        key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+        cached = self._tokens.get(key)
+        if cached is not None and cached[1] > now:
+            claims = cached[0]
+        else:
+            try:
+                claims = self._verify(token) if self.jwt_secret else await asyncio.to_thread(self._verify, token)
+            except Exception as e:
+                self.errors += 1
+                print(f"[AUTH] Token check failed: {e}")
+                return None
+            if claims is None:
+                self.rejected += 1
+                return None
+            self.verified += 1
+            self._tokens.put(key, (claims, min(claims['exp'], now + AUTH_CACHE_SECONDS)))
+        try:
+            groups = await self.memberships(claims['sub'])
+        except Exception as e:
+            self.errors += 1
+            print(f"[AUTH] Membership lookup failed: {e}")
+            groups = {}
+        return Identity(claims['sub'], claims.get('email'), groups)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'available': self.available,
+            'membership_lookup': self.client_configured,
+            'local_verification': bool(self.jwt_secret),
+            'verified': self.verified,
+            'rejected': self.rejected,
+            'errors': self.errors,
+            'cached_tokens': len(self._tokens),
+            'cached_memberships': len(self._memberships)
+        }
+
+
+supabase_auth = SupabaseAuth()
+
+
+def bearer_token(conn: HTTPConnection) -> Optional[str]:
+    """Access token from an Authorization: Bearer header, or ?access_token= (browsers cannot set websocket headers)"""
+    authorization = conn.headers.get("authorization", "")
+    if authorization[:7].lower() == "bearer ":
+        return authorization[7:].strip() or None
+    return conn.query_params.get("access_token") or None
+
+
+async def optional_identity(request: Request) -> Optional[Identity]:
+    """Dependency: the caller's Identity, or None for anonymous callers"""
+    return await supabase_auth.identify(bearer_token(request))
+
+
+async def require_identity(request: Request) -> Identity:
+    """Dependency: the caller's Identity; 401 without a valid token"""
+    identity = await supabase_auth.identify(bearer_token(request))
+    if identity is None:
+        raise HTTPException(status_code=401, detail="Sign in required",
+                            headers={"WWW-Authenticate": "Bearer"})
+    return identity
@@ -0,0 +1,130 @@
+import time
+import asyncio
+from typing import Dict, Any, Callable, List
+
+# Representative inputs: each exercises a different branch of the regex parser,
+# so its patterns are compiled before the first real request
+WARMUP_TEXTS = (
+    "momo 150",
+    "tea 40 and petrol 1,200",
+    "gave 500 to Ram",
+    "Hari paid 800 for dinner",
+    "salary 50000 credited",
+    "rent 15000 yesterday",
+)
+
+WARMUP_QUESTIONS = (
+    "how much did I spend on food",
+    "total spending this month",
+    "how much does Ram owe me",
+    "top categories",
+)
+
+WARMUP_ROWS = [
+    {'id': 1, 'amount': 150, 'item': 'momo', 'category': 'Food', 'date': '2025-01-02'},
+    {'id': 2, 'amount': 40, 'item': 'tea', 'category': 'Food', 'date': '2025-01-02'},
+    {'id': 3, 'amount': 1200, 'item': 'petrol', 'category': 'Transport', 'date': '2025-01-03'},
+    {'id': 4, 'amount': 500, 'item': 'loan', 'category': 'Loan', 'remarks': 'Given to Ram', 'date': '2025-01-04'},
+    {'id': 5, 'amount': -50000, 'item': 'salary', 'category': 'Income', 'date': '2025-01-05'},
+]
+
+
+class WarmupStep:
+    __slots__ = ('name', 'fn', 'required', 'state', 'ms', 'error')
+
+    def __init__(self, name: str, fn: Callable[[], Any], required: bool):
+        self.name = name
+        self.fn = fn
+        self.required = required
+        self.state = 'pending'
+        self.ms = None
+        self.error = None
+
+    def run(self):
+        self.state = 'running'
+        start = time.perf_counter()
+        try:
+            self.fn()
+            self.state = 'done'
+        except Exception as e:
+            self.state = 'failed'
+            self.error = str(e)
+            print(f"[WARMUP] {self.name} failed: {e}")
+        self.ms = round((time.perf_counter() - start) * 1000, 1)
+
+
+class Warmup:
+    """One-off work a cold instance would otherwise do inside its first requests
+
+    Steps run in order on a worker thread once the app has started, so
+    liveness checks answer immediately; the instance reports ready when
+    every required step has succeeded, and stays not ready if one failed.
+    Optional steps (loading the LLM client) run afterwards; their failure
+    only costs the first request that needs them the same work later.
+    """
+
+    def __init__(self):
+        self.steps: List[WarmupStep] = []
+        self.started_at = None
+        self.ready_at = None
+
+    def add(self, name: str, fn: Callable[[], Any], required: bool = True) -> 'Warmup':
+        self.steps.append(WarmupStep(name, fn, required))
+        return self
+
+    @property
+    def ready(self) -> bool:
+        return self.ready_at is not None
+
+    @property
+    def failed(self) -> List[str]:
+        """Required steps that failed"""
+        return [s.name for s in self.steps if s.required and s.state == 'failed']
+
+    async def run(self):
+        self.started_at = time.monotonic()
+        for step in [s for s in self.steps if s.required]:
+            await asyncio.to_thread(step.run)
+        if self.failed:
+            print(f"[WARMUP] Not ready: {', '.join(self.failed)} failed")
+        else:
+            self._mark_ready()
+        for step in [s for s in self.steps if not s.required]:
+            await asyncio.to_thread(step.run)
+
+    def _mark_ready(self):
+        self.ready_at = time.monotonic()
+        print(f"[WARMUP] Ready in {(self.ready_at - self.started_at) * 1000:.0f}ms")
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            'ready': self.ready,
+            'warmup_ms': round((self.ready_at - self.started_at) * 1000, 1) if self.ready else None,
+            'failed': self.failed,
+            'steps': {s.name: {'state': s.state, 'ms': s.ms, 'required': s.required,
+                               **({'error': s.error} if s.error else {})} for s in self.steps}
+        }
+
+
+def build_warmup(nlp_service, expense_analyzer, llm_gateway, warm_llm: bool = True) -> Warmup:
+    """The app's warmup steps: parser patterns, analyzer and search indexes, then the LLM client"""
+    from services.expense_frame import ExpenseFrame
+
+    def parser():
+        for text in WARMUP_TEXTS:
+            nlp_service.parser.parse(text)
+
+    def analyzer():
+        frame = ExpenseFrame(WARMUP_ROWS)
+        analysis = expense_analyzer.analyze_expenses(frame)
+        for question in WARMUP_QUESTIONS:
+            expense_analyzer.answer_query(question, analysis, "personal", frame)
+
+    def search():
+        # Trigram and semantic indexes, including the shared concept table
+        expense_analyzer.find_specific_item("chiya", ExpenseFrame(WARMUP_ROWS))
+
+    warmup = Warmup().add('parser', parser).add('analyzer', analyzer).add('search', search)
+    if warm_llm and llm_gateway.available:
+        warmup.add('llm_client', llm_gateway.warmup, required=False)
+    return warmup
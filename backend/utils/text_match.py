@@ -0,0 +1,18 @@
+import re
+from functools import lru_cache
+from typing import Iterable
+
+
+@lru_cache(maxsize=4096)
+def _phrase_pattern(phrase: str):
+    # Whole words only, allowing a plural ending: 'bus' matches "buses" but not "business"
+    return re.compile(r'(?<![a-z0-9])' + re.escape(phrase.strip()) + r'(?:e?s)?(?![a-z0-9])')
+
+
+def mentions(text: str, phrase: str) -> bool:
+    """True if lowercase text contains phrase as whole words"""
+    return phrase.strip() != '' and _phrase_pattern(phrase).search(text) is not None
+
+
+def mentions_any(text: str, phrases: Iterable[str]) -> bool:
+    return any(mentions(text, phrase) for phrase in phrases)
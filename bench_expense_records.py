@@ -0,0 +1,59 @@
+
+import os
+import sys
+import json
+import time
+import random
+import tracemalloc
+
+sys.path.append(os.path.join(os.getcwd(), 'backend'))
+
+from models.expense import parse_expenses
+
+ROWS = 1000
+ITEMS = [('momo', 'Food'), ('biryani', 'Food'), ('tea', 'Food'), ('petrol', 'Transport'),
+         ('taxi', 'Transport'), ('rent', 'Rent'), ('grocery', 'Groceries'), ('salary', 'Income')]
+PEOPLE = [None, None, 'Hari', 'Sonu', 'Ram']
+
+
+def make_payload(n):
+    random.seed(1)
+    rows = []
+    for i in range(n):
+        item, category = random.choice(ITEMS)
+        rows.append({
+            'id': i,
+            'amount': random.randint(50, 3000),
+            'item': item,
+            'category': category,
+            'remarks': f"Spent on {item.title()}",
+            'paid_by': random.choice(PEOPLE),
+            'date': f"2025-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}",
+            'created_at': '2025-01-01T10:00:00+00:00',
+            'user_id': 'b6f0c1d2-0000-4000-8000-000000000001',
+            'group_id': None,
+            'added_by': 'Asha'
+        })
+    return json.dumps(rows)
+
+
+def measure(label, build, repeat=20):
+    # Time without tracing, then measure retained memory of one build
+    start = time.perf_counter()
+    for _ in range(repeat):
+        build()
+    elapsed = (time.perf_counter() - start) * 1000 / repeat
+
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28} {current / 1024:8.1f} KiB   {elapsed:7.2f} ms")
+    return result
+
+
+payload = make_payload(ROWS)
+print(f"Decoding {ROWS} rows ({len(payload) / 1024:.1f} KiB JSON)")
+print(f"{'':<28} {'memory':>12}   {'time':>10}")
+measure("json -> dicts", lambda: json.loads(payload))
+measure("json -> Expense records", lambda: parse_expenses(json.loads(payload)))
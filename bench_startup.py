@@ -0,0 +1,59 @@
+import os
+import sys
+import json
+import subprocess
+import statistics
+
+# Cold starts measured in fresh interpreters: import main -> app startup -> first /parse
+# (regex fast path) and first /health. --eager loads the Gemini client before the first
+# request, which is what every cold start paid before the client became lazy.
+RUNS = 5
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend')
+
+CHILD = r'''
+import sys, time, json
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+from fastapi.testclient import TestClient
+from services.llm_gateway import llm_gateway
+eager = sys.argv[1] == 'eager'
+with TestClient(main.app) as client:
+    if eager:
+        llm_gateway.warmup()
+    t2 = time.perf_counter()
+    parsed = client.post('/api/expenses/parse', json={'text': 'momo 150'})
+    t3 = time.perf_counter()
+    client.get('/health')
+    t4 = time.perf_counter()
+    print(json.dumps({
+        'import_ms': (t1 - t0) * 1000,
+        'ready_ms': (t2 - t0) * 1000,
+        'first_parse_ms': (t3 - t2) * 1000,
+        'import_to_first_response_ms': (t3 - t0) * 1000,
+        'health_ms': (t4 - t3) * 1000,
+        'status': parsed.status_code,
+        'genai_imported': 'google.generativeai' in sys.modules
+    }))
+'''
+
+
+def run(mode):
+    env = dict(os.environ, LLM_WARMUP='0', OTP_STORE='memory', PYTHONDONTWRITEBYTECODE='1')
+    out = subprocess.run([sys.executable, '-c', CHILD, mode], cwd=BACKEND, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    for mode in ('lazy', 'eager'):
+        samples = [run(mode) for _ in range(RUNS)]
+        print(f"{mode}: genai imported before first response: {samples[-1]['genai_imported']}, "
+              f"status {samples[-1]['status']}")
+        for key in ('import_ms', 'ready_ms', 'first_parse_ms', 'import_to_first_response_ms', 'health_ms'):
+            values = [s[key] for s in samples]
+            print(f"  {key:<30} median {statistics.median(values):8.1f}  min {min(values):8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+import os
+import sys
+import time
+import random
+
+sys.path.append(os.path.join(os.getcwd(), 'backend'))
+
+from services.expense_frame import ExpenseFrame
+from services.expense_analyzer import ExpenseAnalyzer
+from services.rag_service import RAGService
+from services.search_index import TrigramIndex
+
+# Differential test: item search through the trigram index must return exactly
+# what the original linear scans returned. Semantic expansion deliberately widens
+# the match, so it is switched off here.
+
+ITEMS = ['momo', 'chicken momo', 'veg momo', 'biryani', 'tea', 'milk tea', 'coffee', 'lunch', 'dinner',
+         'grocery', 'petrol', 'taxi', 'rent', 'lassi', 'dahi', 'ghee', 'chiya', 'rice', 'soap', 'water',
+         'salary', 'loan to hari', 'Momo Platter', 'tea  cup', '', None]
+REMARKS = ['', None, 'with friends', 'office lunch', 'for momo party', 'bought tea leaves', 'paid late',
+           'rice and dal', 'at  the mall']
+QUERIES = ['how much on momo', 'spent on tea', 'momo', 'chicken', 'tea', 'rice', 'how much did i spend for lunch',
+           'total expenses', 'what about biryani', 'spending on coffee and tea', 'friends', 'veg momo', 'chicken momo',
+           'momo platter', 'on petrol', 'for all', 'leaves', 'water bill', 'spent on the', 'how much',
+           'on ab', 'tea  cup', 'salary', 'loan', 'late', 'mall', 'xyz', 'lassi dahi', 'on dal']
+
+
+def make_rows(n, seed):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        rows.append({
+            'id': i,
+            'amount': rng.choice([rng.randint(10, 3000), -rng.randint(10, 500), round(rng.uniform(1, 99), 2)]),
+            'item': rng.choice(ITEMS),
+            'category': rng.choice(['Food', 'Transport', 'Income', 'Loan', None]),
+            'remarks': rng.choice(REMARKS),
+            'paid_by': rng.choice([None, 'Hari', 'Sonu']),
+            'date': f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            'created_at': '2025-01-01T10:00:00+00:00'
+        })
+    return rows
+
+
+def legacy_match(item_keywords, expenses_data):
+    """The original per-row scan used by both services"""
+    matching_expenses = []
+    total_amount = 0
+    for expense in expenses_data:
+        item_name = expense.get('item') or ''
+        remarks = expense.get('remarks') or ''
+        for keyword in item_keywords:
+            if keyword in item_name.lower() or keyword in remarks.lower():
+                matching_expenses.append(expense)
+                total_amount += expense.get('amount', 0)
+                break
+    return matching_expenses, total_amount
+
+
+def summary(result):
+    if result is None:
+        return None
+    ids = [exp.id if hasattr(exp, 'id') else exp['id'] for exp in result['expenses']]
+    return result['item_name'], result['count'], round(result['total_amount'], 6), ids
+
+
+def check(label, expected, actual, failures):
+    if expected != actual:
+        failures.append(label)
+        print(f"[X] {label}\n    expected: {expected}\n    actual:   {actual}")
+
+
+def main():
+    analyzer = ExpenseAnalyzer()
+    rag = RAGService()
+    failures = []
+    checked = 0
+
+    for seed in range(20):
+        rows = make_rows(random.Random(seed).randint(0, 400), seed)
+        frame = ExpenseFrame(rows)
+        index = TrigramIndex.of(frame)
+
+        # Keyword level: every substring of every item/remark, plus misses
+        keywords = {'zz', 'a', ' ', '  ', 'momo ', ' tea', 'xyzzy'}
+        for text in ITEMS + REMARKS:
+            text = (text or '').lower()
+            for i in range(len(text)):
+                keywords.add(text[i:i + random.Random(i).randint(1, 6)])
+        for keyword in sorted(keywords):
+            expected, _ = legacy_match([keyword], rows)
+            check(f"seed {seed} keyword {keyword!r}", [e['id'] for e in expected],
+                  index.substring_rows(keyword).tolist(), failures)
+            expected_item = any(keyword in (r.get('item') or '').lower() for r in rows)
+            check(f"seed {seed} item_contains {keyword!r}", expected_item, index.item_contains(keyword), failures)
+            checked += 2
+
+        # Query level: both services against the legacy scan
+        for query in QUERIES:
+            for name, result in (('analyzer', analyzer.find_specific_item(query, frame, related=False)),
+                                 ('rag', rag._find_item_matches(query, frame, semantic=False))):
+                if result is not None:
+                    keywords = result['keywords'] if name == 'rag' else _analyzer_keywords(query)
+                    expected, total = legacy_match(keywords, rows)
+                    check(f"seed {seed} {name} {query!r}",
+                          (len(expected), round(total, 6), [e['id'] for e in expected]),
+                          summary(result)[1:], failures)
+                checked += 1
+
+    print(f"Checked {checked} cases, {len(failures)} mismatches")
+    benchmark()
+    return 1 if failures else 0
+
+
+def _analyzer_keywords(query):
+    """Keyword extraction of the original find_specific_item (needed to rebuild its expected result)"""
+    query_lower = query.lower()
+    words = query_lower.split()
+    aggregate_keywords = ['total', 'all', 'everything', 'overall', 'sum', 'entire', 'whole', 'complete']
+    stop_words = ['i', 'my', 'how', 'much', 'spend', 'spent', 'on', 'for', 'the', 'a', 'an',
+                  'did', 'do', 'have', 'has', 'what', 'is', 'are', 'was', 'were', 'money',
+                  'expenses', 'expense', 'to', 'from', 'with', 'at', 'in', 'of', 'and', 'or',
+                  'this', 'that', 'it', 'me', 'you', 'we', 'they', 'he', 'she', 'am', 'be']
+    item_keywords = []
+    for i, word in enumerate(words):
+        if word in ['on', 'for'] and i + 1 < len(words):
+            next_word = words[i + 1]
+            if next_word not in aggregate_keywords and next_word not in stop_words and len(next_word) > 2:
+                item_keywords.append(next_word)
+    common_items = ['momo', 'biryani', 'tea', 'coffee', 'lunch', 'dinner', 'grocery', 'petrol', 'taxi', 'rent',
+                    'chicken', 'lassi', 'dahi', 'ghee', 'chiya', 'rice', 'soap', 'water']
+    for item in common_items:
+        if item in query_lower and item not in item_keywords:
+            item_keywords.append(item)
+    return item_keywords or [query_lower.strip()]
+
+
+def benchmark(n=50000, repeat=50):
+    rows = make_rows(n, 99)
+    frame = ExpenseFrame(rows)
+    start = time.perf_counter()
+    index = TrigramIndex.of(frame)
+    build = (time.perf_counter() - start) * 1000
+
+    for keyword in ('chicken momo', 'leaves', 'xyzzy'):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            legacy_match([keyword], rows)
+        scan = (time.perf_counter() - start) * 1000 / repeat
+        start = time.perf_counter()
+        for _ in range(repeat):
+            index.substring_rows(keyword)
+        indexed = (time.perf_counter() - start) * 1000 / repeat
+        print(f"{keyword!r:<16} scan {scan:7.2f} ms   trigram {indexed:7.2f} ms")
+    print(f"Index build for {n} rows: {build:.0f} ms (once per dataset version)")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+import os
+import sys
+from datetime import date, timedelta
+
+sys.path.append(os.path.join(os.getcwd(), 'backend'))
+
+from services.expense_frame import ExpenseFrame
+from services.expense_analyzer import ExpenseAnalyzer
+from services.intent_router import IntentRouter
+
+# Routing table: questions a local metric answers correctly must stay local (with
+# that metric); questions it would answer with the wrong number must go to the LLM.
+# Dates are relative to today because "this month" is.
+
+LLM = 'llm'
+CASES = [
+    # Asks for something no local metric computes
+    ('what is the biggest expense I had', LLM),
+    ('did I spend more on food this month than last month?', LLM),
+    ('how much did I spend in total on weekends', LLM),
+    ('what did I spend on saturday', LLM),
+    ('when did I last buy petrol', LLM),
+    ('is my rent too high', LLM),
+    ('tell me something interesting about my expenses', LLM),
+    ('why is my spending so high', LLM),
+    ('how can i reduce my food expenses', LLM),
+    ('which is cheaper, momo or coffee', LLM),
+    ('momo vs petrol', LLM),
+    # Answered locally
+    ('how much did I spend on groceries and rent', 'category'),
+    ('show me my food expenses', 'category'),
+    ('how much did I spend on food', 'category'),
+    ('how much did I spend on rent this month', 'item'),
+    ('how much on coffee', 'item'),
+    ('how much on petrol', 'item'),
+    ('total expenses', 'total'),
+    ('how much did I spend this month', 'spend'),
+    ('how many transactions', 'count'),
+    ('what did I spend on average', 'average'),
+    ('average daily spending', 'average'),
+    ('what is my balance', 'balance'),
+    ('how much did I earn', 'income'),
+    ('compare this month vs last month', 'comparison'),
+]
+
+
+def make_rows(today=None):
+    today = today or date.today()
+    items = [('momo', 'Food', 180), ('coffee', 'Food', 150), ('latte', 'Food', 250), ('rice', 'Groceries', 900),
+             ('vegetables', 'Groceries', 400), ('rent', 'Rent', 15000), ('petrol', 'Transport', 1200),
+             ('taxi', 'Transport', 350), ('movie ticket', 'Entertainment', 600), ('internet', 'Utilities', 1000)]
+    rows = []
+    for day in range(90):
+        item, category, amount = items[day % len(items)]
+        rows.append({'id': day, 'item': item, 'category': category, 'amount': amount + day,
+                     'date': (today - timedelta(days=day)).isoformat(), 'remarks': '', 'paid_by': None})
+    rows.append({'id': 90, 'item': 'salary', 'category': 'Income', 'amount': -50000,
+                 'date': (today - timedelta(days=3)).isoformat(), 'remarks': '', 'paid_by': None})
+    return rows
+
+
+def main():
+    analyzer = ExpenseAnalyzer()
+    router = IntentRouter(threshold=0.75)
+    frame = ExpenseFrame(make_rows())
+    analysis = analyzer.analyze_expenses(frame)
+
+    failures = []
+    for query, expected in CASES:
+        decision = router.route(query, analyzer, analysis, 'personal', frame)
+        actual = decision.result.metric if decision.local else LLM
+        if actual != expected:
+            failures.append(query)
+            print(f"[X] {query!r}\n    expected: {expected}\n    actual:   {actual} ({decision.reason}) "
+                  f"{decision.result.text[:100] if decision.result else ''}")
+    print(f"Checked {len(CASES)} questions, {len(failures)} misrouted")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())